@@ -44,6 +44,10 @@ NODE_MODULES = [
     "curved_tile_preprocessor",
     "multi_layer_mask_editor",
     "multi_controlnet_curve_coordinator",
+    "curve_parameter_sweep",
+    "schedule_io",
+    "keyframe_merge",
+    "keyframe_resample",
 ]
 
 # Initialize mappings
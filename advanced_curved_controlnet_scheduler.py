@@ -1,15 +1,38 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import io
-from PIL import Image
 import torch
 import json
 import os
-import csv
 import re
 
+try:
+    from .curve_kernels import evaluate_curve, EASING_TYPES
+    from .curve_cache import sample_curve
+    from .formula_engine import evaluate_formula_fused
+    from .keyframe_utils import (
+        error_bounded_keyframes, held_strengths, compress_plateaus,
+        SAMPLER_SCHEDULERS, step_percents, step_aligned_percents,
+    )
+    from .keyframe_group import ArrayKeyframeGroup, ChainedKeyframeGroup
+    from .schedule_io import (
+        SCHEDULE_FORMATS, curve_output_dir, schedule_path,
+        save_keyframe_group, save_curve_csv, submit_export,
+    )
+    from .preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+except Exception:
+    from curve_kernels import evaluate_curve, EASING_TYPES
+    from curve_cache import sample_curve
+    from formula_engine import evaluate_formula_fused
+    from keyframe_utils import (
+        error_bounded_keyframes, held_strengths, compress_plateaus,
+        SAMPLER_SCHEDULERS, step_percents, step_aligned_percents,
+    )
+    from keyframe_group import ArrayKeyframeGroup, ChainedKeyframeGroup
+    from schedule_io import (
+        SCHEDULE_FORMATS, curve_output_dir, schedule_path,
+        save_keyframe_group, save_curve_csv, submit_export,
+    )
+    from preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+
 # Import Advanced ControlNet classes
 try:
     from .control import ControlWeights
@@ -34,6 +57,9 @@ except Exception:
         print(f"Failed to import Advanced ControlNet: {e}")
         ACN_AVAILABLE = False
 
+# Dense samples used when placing keyframes by error tolerance
+ADAPTIVE_DENSE_SAMPLES = 1000
+
 # Preset configurations
 CURVE_PRESETS = {
     "Custom": None,
@@ -47,19 +73,6 @@ CURVE_PRESETS = {
     "Smooth Transition": {"start_strength": 1.0, "end_strength": 0.0, "curve_type": "ease_in_out", "curve_param": 2.0},
 }
 
-# Animation easing functions
-EASING_FUNCTIONS = {
-    "ease_in_quad": lambda t: t ** 2,
-    "ease_out_quad": lambda t: 1 - (1 - t) ** 2,
-    "ease_in_out_quad": lambda t: 2 * t ** 2 if t < 0.5 else 1 - (-2 * t + 2) ** 2 / 2,
-    "ease_in_cubic": lambda t: t ** 3,
-    "ease_out_cubic": lambda t: 1 - (1 - t) ** 3,
-    "ease_in_out_cubic": lambda t: 4 * t ** 3 if t < 0.5 else 1 - (-2 * t + 2) ** 3 / 2,
-    "ease_in_quart": lambda t: t ** 4,
-    "ease_out_quart": lambda t: 1 - (1 - t) ** 4,
-    "ease_in_out_quart": lambda t: 8 * t ** 4 if t < 0.5 else 1 - (-2 * t + 2) ** 4 / 2,
-}
-
 class AdvancedCurvedControlNetScheduler:
     """
     Advanced version with presets, formulas, blending, and more features.
@@ -74,9 +87,9 @@ class AdvancedCurvedControlNetScheduler:
                     "default": "Custom",
                     "tooltip": "Pre-configured curves (OVERRIDES strength/curve settings below when selected)"
                 }),
-                "mode": (["percent", "steps"], {
+                "mode": (["percent", "steps", "step_aligned"], {
                     "default": "percent",
-                    "tooltip": "Use percentage (0-1) or absolute steps"
+                    "tooltip": "Use percentage (0-1) or absolute steps. step_aligned places one keyframe on every sampling step in range (num_keyframes is ignored)"
                 }),
                 "num_keyframes": ("INT", {
                     "default": 10,
@@ -116,9 +129,7 @@ class AdvancedCurvedControlNetScheduler:
                 "curve_type": ([
                     "linear",
                     "ease_in", "ease_out", "ease_in_out",
-                    "ease_in_quad", "ease_out_quad", "ease_in_out_quad",
-                    "ease_in_cubic", "ease_out_cubic", "ease_in_out_cubic",
-                    "ease_in_quart", "ease_out_quart", "ease_in_out_quart",
+                    *EASING_TYPES,
                     "sine_wave", "bell_curve", "reverse_bell",
                     "exponential", "bounce", "custom_bezier",
                     "custom_formula"
@@ -138,7 +149,14 @@ class AdvancedCurvedControlNetScheduler:
                     "default": 20,
                     "min": 1,
                     "max": 10000,
-                    "tooltip": "Total number of sampling steps (only used in 'steps' mode)"
+                    "tooltip": "Total number of sampling steps (used in 'steps' and 'step_aligned' modes)"
+                }),
+                "sampler_scheduler": (list(SAMPLER_SCHEDULERS), {
+                    "default": "normal",
+                    "tooltip": "Sampler scheduler whose step timing 'step_aligned' mode follows"
+                }),
+                "sigmas": ("SIGMAS", {
+                    "tooltip": "Optional: exact sigmas from a scheduler node; overrides total_steps and sampler_scheduler in 'step_aligned' mode"
                 }),
                 "custom_formula": ("STRING", {
                     "default": "t",
@@ -167,6 +185,13 @@ class AdvancedCurvedControlNetScheduler:
                     "default": False,
                     "tooltip": "Automatically place more keyframes where curve changes rapidly"
                 }),
+                "adaptive_tolerance": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "Max strength error for adaptive keyframes. 0 = redistribute num_keyframes; >0 = fewest keyframes that stay within this error of the full curve"
+                }),
                 "blend_curve_type": (["none"] + [
                     "linear", "ease_in", "ease_out", "ease_in_out",
                     "sine_wave", "bell_curve", "exponential"
@@ -185,6 +210,13 @@ class AdvancedCurvedControlNetScheduler:
                     "default": True,
                     "tooltip": "Clamp strength values to valid range (0-10)"
                 }),
+                "plateau_epsilon": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "Drop keyframes whose strength differs from the previous kept keyframe by less than this (0 = keep all)"
+                }),
                 "print_keyframes": ("BOOLEAN", {
                     "default": False,
                     "tooltip": "Print generated keyframes for debugging"
@@ -202,7 +234,11 @@ class AdvancedCurvedControlNetScheduler:
                 }),
                 "save_curve": ("BOOLEAN", {
                     "default": False,
-                    "tooltip": "Save curve data to CSV file"
+                    "tooltip": "Save curve data to a file in output/curves"
+                }),
+                "export_format": (["csv", *SCHEDULE_FORMATS], {
+                    "default": "csv",
+                    "tooltip": "csv = readable text; raw = memory-mappable binary (.sched) for the Load Curve Schedule node; npz = numpy archive"
                 }),
                 "curve_filename": ("STRING", {
                     "default": "curve_export",
@@ -216,10 +252,6 @@ class AdvancedCurvedControlNetScheduler:
     FUNCTION = "generate_keyframes"
     CATEGORY = "conditioning/controlnet"
 
-    @classmethod
-    def IS_CHANGED(cls, **kwargs):
-        return float("nan")
-
     def apply_preset(self, preset, start_strength, end_strength, curve_type, curve_param):
         """Apply preset values if preset is not Custom"""
         if preset != "Custom" and preset in CURVE_PRESETS:
@@ -263,20 +295,9 @@ class AdvancedCurvedControlNetScheduler:
         return errors, warnings
 
     def safe_eval_formula(self, formula, t):
-        """Safely evaluate a mathematical formula"""
+        """Safely evaluate a mathematical formula (whitelisted AST, fused and chunked over t)"""
         try:
-            safe_dict = {
-                "sin": np.sin, "cos": np.cos, "tan": np.tan,
-                "exp": np.exp, "log": np.log, "log10": np.log10,
-                "sqrt": np.sqrt, "abs": np.abs,
-                "pi": np.pi, "e": np.e,
-                "t": t, "np": np,
-            }
-
-            if any(word in formula.lower() for word in ["import", "exec", "eval", "compile", "__"]):
-                raise ValueError("Formula contains forbidden operations")
-
-            result = eval(formula, {"__builtins__": {}}, safe_dict)
+            result = evaluate_formula_fused(formula, t)
 
             if not isinstance(result, np.ndarray):
                 result = np.full_like(t, float(result))
@@ -293,56 +314,35 @@ class AdvancedCurvedControlNetScheduler:
     def calculate_curve(self, t, curve_type, curve_param, custom_formula="t"):
         """Calculate curve values based on type"""
         try:
-            if curve_type in EASING_FUNCTIONS:
-                curve = EASING_FUNCTIONS[curve_type](t)
-            elif curve_type == "linear":
-                curve = t
-            elif curve_type == "ease_in":
-                curve = t ** curve_param
-            elif curve_type == "ease_out":
-                curve = 1 - (1 - t) ** curve_param
-            elif curve_type == "ease_in_out":
-                curve = np.where(
-                    t < 0.5,
-                    2 ** (curve_param - 1) * t ** curve_param,
-                    1 - (-2 * t + 2) ** curve_param / 2
-                )
-            elif curve_type == "sine_wave":
-                curve = (np.sin(t * curve_param * 2 * np.pi) + 1) / 2
-            elif curve_type == "bell_curve":
-                center = 0.5
-                width = 0.15 / max(curve_param, 0.1)
-                curve = np.exp(-((t - center) ** 2) / (2 * width ** 2))
-            elif curve_type == "reverse_bell":
-                center = 0.5
-                width = 0.15 / max(curve_param, 0.1)
-                bell = np.exp(-((t - center) ** 2) / (2 * width ** 2))
-                curve = 1 - bell
-            elif curve_type == "exponential":
-                safe_param = min(curve_param, 10.0)
-                denom = np.exp(safe_param) - 1
-                if denom < 1e-10:
-                    print("[Warning] Exponential parameter too small, using linear")
-                    curve = t
-                else:
-                    curve = (np.exp(safe_param * t) - 1) / denom
-            elif curve_type == "bounce":
-                curve = np.abs(np.sin(t * curve_param * np.pi))
-            elif curve_type == "custom_bezier":
-                p1 = curve_param / 10
-                p2 = 1 - curve_param / 10
-                curve = 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3
-            elif curve_type == "custom_formula":
+            if curve_type == "custom_formula":
                 curve = self.safe_eval_formula(custom_formula, t)
             else:
-                print(f"[Warning] Unknown curve type '{curve_type}', using linear")
-                curve = t
+                curve = evaluate_curve(curve_type, t, curve_param)
 
             return curve
         except Exception as e:
             print(f"[Error] Curve calculation failed: {e}")
             return t
 
+    def curve_to_strengths(self, curve, curve_type, start_strength, end_strength, clamp_strengths):
+        """Map a normalized curve onto the strength range"""
+        if curve_type in ["bell_curve", "reverse_bell", "sine_wave"] and abs(start_strength - end_strength) < 0.01:
+            # Center around start_strength
+            curve_min = np.min(curve)
+            curve_max = np.max(curve)
+            if curve_max > curve_min:
+                normalized = (curve - curve_min) / (curve_max - curve_min) - 0.5
+                strengths = start_strength + normalized * start_strength * 2
+            else:
+                strengths = np.full_like(curve, start_strength)
+        else:
+            # Simple interpolation
+            strengths = start_strength + (end_strength - start_strength) * curve
+
+        if clamp_strengths:
+            strengths = np.clip(strengths, 0.0, 10.0)
+        return strengths
+
     def apply_adaptive_keyframes(self, percents, strengths, num_keyframes):
         """Redistribute keyframes based on curve rate of change"""
         try:
@@ -395,37 +395,37 @@ Total Keyframes: {len(strengths)}
             return f"Statistics calculation failed: {e}"
 
     def save_curve_to_csv(self, percents, strengths, filename):
-        """Save curve data to CSV file"""
+        """Queue the curve data for CSV export (written in the background)"""
         try:
-            output_dir = os.path.join(
-                os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
-                "output", "curves"
-            )
-
-            os.makedirs(output_dir, exist_ok=True)
-            filepath = os.path.join(output_dir, f"{filename}.csv")
-
-            with open(filepath, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(["percent", "strength", "step"])
-                for i, (p, s) in enumerate(zip(percents, strengths)):
-                    writer.writerow([f"{p:.6f}", f"{s:.6f}", i])
-
-            print(f"[Advanced Curved] Curve saved to: {filepath}")
-            return filepath
+            filepath = os.path.join(curve_output_dir(), f"{filename}.csv")
+            percents, strengths = np.array(percents), np.array(strengths)
+            return submit_export(filepath, lambda: save_curve_csv(filepath, percents, strengths), "Curve")
         except Exception as e:
             print(f"[Error] Failed to save curve: {e}")
             return None
 
+    def save_curve_binary(self, keyframe_group, filename, export_format):
+        """Queue the whole keyframe group for binary export (raw .sched or .npz)"""
+        try:
+            filepath = schedule_path(filename, export_format)
+            # Snapshot the arrays so later edits to the group can't race the writer
+            snapshot = keyframe_group.clone()
+            return submit_export(
+                filepath, lambda: save_keyframe_group(filepath, snapshot, export_format), "Schedule"
+            )
+        except Exception as e:
+            print(f"[Error] Failed to save schedule: {e}")
+            return None
+
     def generate_keyframes(
         self, preset, mode, num_keyframes, start_percent, end_percent,
         start_strength, end_strength, curve_type, curve_param,
-        total_steps=20, custom_formula="t",
+        total_steps=20, sampler_scheduler="normal", sigmas=None, custom_formula="t",
         prev_timestep_kf=None, invert_curve=False, mirror_curve=False,
-        repeat_curve=1, adaptive_keyframes=False,
+        repeat_curve=1, adaptive_keyframes=False, adaptive_tolerance=0.0,
         blend_curve_type="none", blend_amount=0.0,
-        clamp_strengths=True, print_keyframes=False, show_graph=True,
-        comparison_curve="none", save_curve=False, curve_filename="curve_export", batch_images=None
+        clamp_strengths=True, plateau_epsilon=0.0, print_keyframes=False, show_graph=True,
+        comparison_curve="none", save_curve=False, export_format="csv", curve_filename="curve_export", batch_images=None
     ):
         """Generate curved timestep keyframes for ControlNet strength scheduling"""
 
@@ -462,128 +462,96 @@ Total Keyframes: {len(strengths)}
             start_strength = max(0, start_strength)
             end_strength = max(0, end_strength)
 
-            # Generate param t across repeats
-            actual_keyframes = num_keyframes * repeat_curve
-            t = np.linspace(0, 1, actual_keyframes)
-            if repeat_curve > 1:
-                t = (t * repeat_curve) % 1.0
-
-            # Build primary curve
-            curve = self.calculate_curve(t, curve_type, curve_param, custom_formula)
-
-            # Mirror if requested
-            if mirror_curve:
-                midpoint = len(curve) // 2
-                curve[midpoint:] = curve[midpoint - 1::-1][:len(curve[midpoint:])]
-
-            # Blend with a second curve
-            if blend_curve_type != "none" and blend_amount > 0:
-                blend_curve = self.calculate_curve(t, blend_curve_type, curve_param, custom_formula)
-                curve = curve * (1 - blend_amount) + blend_curve * blend_amount
-
-            # Invert if requested
-            if invert_curve:
-                curve = 1 - curve
-
-            # Safety for NaNs
-            if np.any(np.isnan(curve)):
-                print("[ERROR] NaN in curve, using linear")
-                curve = np.linspace(0, 1, actual_keyframes)
+            # Percent positions: evenly spaced, or exactly on the sampler's steps
+            step_info = None
+            if mode == "step_aligned":
+                all_steps = step_percents(total_steps, sampler_scheduler, sigmas)
+                sample_percents, sample_points = step_aligned_percents(start_percent, end_percent, all_steps)
+                if len(sample_percents) == 0:
+                    raise ValueError("No sampling steps fall between start_percent and end_percent")
+                actual_keyframes = len(sample_percents)
+                step_info = (actual_keyframes, len(all_steps), "sigmas input" if sigmas is not None else sampler_scheduler)
+            else:
+                actual_keyframes = num_keyframes * repeat_curve
+                sample_percents = np.linspace(start_percent, end_percent, actual_keyframes)
+                sample_points = None
+            percents = sample_percents
+
+            # Sample the normalized curve (repeat, mirror, blend, invert) from the shared cache
+            curve_fn = lambda t, name: self.calculate_curve(t, name, curve_param, custom_formula)
+            curve = sample_curve(
+                curve_type, curve_param, actual_keyframes,
+                repeat_curve=repeat_curve, mirror=mirror_curve, invert=invert_curve,
+                blend_curve_type=blend_curve_type, blend_amount=blend_amount,
+                custom_formula=custom_formula, curve_fn=curve_fn, points=sample_points
+            )
 
             # Strength sampling
-            if curve_type in ["bell_curve", "reverse_bell", "sine_wave"] and abs(start_strength - end_strength) < 0.01:
-                # Center around start_strength
-                curve_min = np.min(curve)
-                curve_max = np.max(curve)
-                if curve_max > curve_min:
-                    normalized = (curve - curve_min) / (curve_max - curve_min) - 0.5
-                    strengths = start_strength + normalized * start_strength * 2
-                else:
-                    strengths = np.full_like(curve, start_strength)
-            else:
-                # Simple interpolation
-                strengths = start_strength + (end_strength - start_strength) * curve
+            strengths = self.curve_to_strengths(curve, curve_type, start_strength, end_strength, clamp_strengths)
+
+            # Adaptive placement (keyframes already sit on every step in step_aligned mode)
+            adaptive_info = None
+            if adaptive_keyframes and step_info is not None:
+                print("[Warning] adaptive_keyframes is ignored in step_aligned mode")
+            elif adaptive_keyframes and adaptive_tolerance > 0:
+                # Fewest keyframes whose held strengths stay within tolerance of a dense sampling
+                dense_samples = max(actual_keyframes, ADAPTIVE_DENSE_SAMPLES * repeat_curve)
+                dense_curve = sample_curve(
+                    curve_type, curve_param, dense_samples,
+                    repeat_curve=repeat_curve, mirror=mirror_curve, invert=invert_curve,
+                    blend_curve_type=blend_curve_type, blend_amount=blend_amount,
+                    custom_formula=custom_formula, curve_fn=curve_fn
+                )
+                dense_strengths = self.curve_to_strengths(
+                    dense_curve, curve_type, start_strength, end_strength, clamp_strengths
+                )
+                dense_percents = np.linspace(start_percent, end_percent, dense_samples)
+                percents, strengths = error_bounded_keyframes(dense_percents, dense_strengths, adaptive_tolerance)
+                held_error = np.abs(held_strengths(percents, strengths, dense_percents) - dense_strengths).max()
+                adaptive_info = (len(percents), adaptive_tolerance, float(held_error), dense_samples)
+            elif adaptive_keyframes and actual_keyframes > 2:
+                percents, strengths = self.apply_adaptive_keyframes(percents, strengths, actual_keyframes)
 
-            if clamp_strengths:
-                strengths = np.clip(strengths, 0.0, 10.0)
+            # Collapse near-identical consecutive keyframes
+            keyframes_before = len(percents)
+            percents, strengths, image_indices = compress_plateaus(percents, strengths, plateau_epsilon)
 
-            # Percent positions
-            percents = np.linspace(start_percent, end_percent, actual_keyframes)
+            # Batch image index per keyframe (-1 = beyond the batch); attached in one
+            # pass when the keyframe objects are built
+            image_index_array = None
+            if batch_images is not None:
+                batch_size = getattr(batch_images, "shape", [0])[0] if hasattr(batch_images, "shape") else 0
+                image_index_array = np.where(image_indices < batch_size, image_indices, -1)
 
-            # Adaptive redistribution
-            if adaptive_keyframes and actual_keyframes > 2:
-                percents, strengths = self.apply_adaptive_keyframes(percents, strengths, actual_keyframes)
+            # Prepare output group (array-backed; keyframe objects are built on first use)
+            guarantee_steps = np.zeros(len(percents), dtype=np.int32)
+            guarantee_steps[:1] = 1
+            new_keyframes = ArrayKeyframeGroup(percents, strengths, guarantee_steps,
+                                               with_default=prev_timestep_kf is None,
+                                               image_indices=image_index_array)
 
-            # Prepare output group
             if prev_timestep_kf is not None:
-                keyframe_group = prev_timestep_kf
+                # Chain onto the upstream group without modifying it
+                keyframe_group = ChainedKeyframeGroup(prev_timestep_kf, new_keyframes)
             else:
-                keyframe_group = TimestepKeyframeGroup()
-
-            # Build keyframes
-            for i, (percent, strength) in enumerate(zip(percents, strengths)):
-                guarantee_steps = 1 if i == 0 else 0
-
-                keyframe = TimestepKeyframe(
-                    start_percent=float(percent),
-                    strength=float(strength),
-                    guarantee_steps=guarantee_steps
-                )
+                keyframe_group = new_keyframes
 
-                # Assign batch image index when provided
-                if batch_images is not None:
-                    batch_size = getattr(batch_images, "shape", [0])[0] if hasattr(batch_images, "shape") else 0
-                    if i < batch_size:
-                        index_set = False
-
-                        # Method 1: latent_keyframe attribute
-                        try:
-                            keyframe.latent_keyframe = i
-                            index_set = True
-                        except Exception:
-                            pass
-
-                        # Method 2: latent_keyframe_index attribute
-                        if not index_set:
-                            try:
-                                keyframe.latent_keyframe_index = i
-                                index_set = True
-                            except Exception:
-                                pass
-
-                        # Method 3: batch_index attribute
-                        if not index_set:
-                            try:
-                                keyframe.batch_index = i
-                                index_set = True
-                            except Exception:
-                                pass
-
-                        # Method 4: via control_weights
-                        if not index_set:
-                            try:
-                                if not hasattr(keyframe, "control_weights") or keyframe.control_weights is None:
-                                    keyframe.control_weights = ControlWeights()
-                                keyframe.control_weights.latent_keyframe_index = i
-                                index_set = True
-                            except Exception:
-                                pass
-
-                        # Final fallback: setattr attempt
-                        if not index_set:
-                            try:
-                                setattr(keyframe, "latent_keyframe", i)
-                            except Exception:
-                                pass
-
-                keyframe_group.add(keyframe)
-
-                if print_keyframes:
-                    img_idx = getattr(keyframe, "latent_keyframe", getattr(keyframe, "latent_keyframe_index", "N/A"))
+            if print_keyframes:
+                for i, (percent, strength) in enumerate(zip(percents, strengths)):
+                    img_idx = image_index_array[i] if image_index_array is not None and image_index_array[i] >= 0 else "N/A"
                     print(f"[Advanced Curved] KF {i}: {percent:.4f}, {strength:.4f}, img_index={img_idx}")
 
             # Stats
             stats = self.calculate_statistics(percents, strengths)
+            if len(percents) < keyframes_before:
+                stats += f"\nPlateau compression: removed {keyframes_before - len(percents)} of {keyframes_before} keyframes (epsilon={plateau_epsilon:.3f})"
+            if step_info is not None:
+                placed, steps, source = step_info
+                stats += f"\nStep-aligned: {placed} keyframes, one per sampling step in range ({steps} steps, {source})"
+            if adaptive_info is not None:
+                kept, tolerance, held_error, dense_samples = adaptive_info
+                stats += (f"\nAdaptive: {kept} keyframes hold within ±{tolerance:.3f} of {dense_samples} curve samples"
+                          f" (max held error {held_error:.4f})")
 
             # Add batch info to stats
             if batch_images is not None:
@@ -594,17 +562,23 @@ Total Keyframes: {len(strengths)}
 
             # Optional CSV export
             if save_curve:
-                self.save_curve_to_csv(percents, strengths, curve_filename)
+                if export_format == "csv":
+                    self.save_curve_to_csv(percents, strengths, curve_filename)
+                else:
+                    self.save_curve_binary(keyframe_group, curve_filename, export_format)
 
-            # Graph
-            graph_image = None
-            if show_graph:
+            # Graph (skipped when show_graph is off or running headless)
+            graph_image = PLACEHOLDER_IMAGE
+            if preview_wanted(show_graph):
                 try:
                     comparison_data = None
                     if comparison_curve != "none":
-                        comp_curve = self.calculate_curve(t, comparison_curve, curve_param, custom_formula)
+                        comp_curve = sample_curve(
+                            comparison_curve, curve_param, actual_keyframes,
+                            repeat_curve=repeat_curve, curve_fn=curve_fn, points=sample_points
+                        )
                         comp_strengths = start_strength + (end_strength - start_strength) * comp_curve
-                        comparison_data = (percents, comp_strengths, comparison_curve)
+                        comparison_data = (sample_percents, comp_strengths, comparison_curve)
 
                     graph_image = self.generate_graph(
                         percents, strengths, curve_type, curve_param,
@@ -642,9 +616,8 @@ Total Keyframes: {len(strengths)}
         start_percent, end_percent, start_strength, end_strength,
         comparison_data=None
     ):
-        """Generate a matplotlib graph showing the curve"""
+        """Render the curve preview graph"""
 
-        fig = None
         try:
             if len(percents) == 0 or len(strengths) == 0:
                 return self.create_dummy_image()
@@ -658,62 +631,39 @@ Total Keyframes: {len(strengths)}
             if np.any(np.isinf(percents)) or np.any(np.isinf(strengths)):
                 return self.create_dummy_image()
 
-            fig, ax = plt.subplots(figsize=(10, 6), dpi=100)
-
-            ax.plot(percents * 100, strengths, 'b-', linewidth=2.5, label='Primary', alpha=0.8)
-            ax.scatter(percents * 100, strengths, c='red', s=50, zorder=5, label='Keyframes')
-
-            if comparison_data is not None:
-                comp_percents, comp_strengths, comp_name = comparison_data
-                ax.plot(comp_percents * 100, comp_strengths, 'g--', linewidth=2, label=f'Compare: {comp_name}', alpha=0.6)
-
-            ax.set_xlabel('Generation Progress (%)', fontsize=12, fontweight='bold')
-            ax.set_ylabel('ControlNet Strength', fontsize=12, fontweight='bold')
-            ax.set_title(f'{curve_type} (param={curve_param:.2f})', fontsize=14, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.legend(loc='best', fontsize=10)
-
-            ax.set_xlim(start_percent * 100 - 5, end_percent * 100 + 5)
-
             all_strengths = list(strengths)
             if comparison_data:
                 all_strengths.extend(comparison_data[1])
 
             y_min = min(0, min(all_strengths) - 0.1)
             y_max = max(all_strengths) + 0.1
-            ax.set_ylim(y_min, y_max)
 
-            info_text = f'Range: {start_percent:.2f}->{end_percent:.2f}\n'
-            info_text += f'Strength: {start_strength:.2f}->{end_strength:.2f}\n'
-            info_text += f'Keyframes: {len(percents)}'
-            ax.text(
-                0.02, 0.98, info_text, transform=ax.transAxes,
-                verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5),
-                fontsize=10
+            spec = PlotSpec(
+                size=(1000, 600),
+                title=f'{curve_type} (param={curve_param:.2f})',
+                xlabel='Generation Progress (%)',
+                ylabel='ControlNet Strength',
+                xlim=(start_percent * 100 - 5, end_percent * 100 + 5),
+                ylim=(y_min, y_max),
             )
+            spec.line(percents * 100, strengths, color='b', width=2.5, label='Primary', alpha=0.8)
+            spec.scatter(percents * 100, strengths, color='red', s=50, label='Keyframes')
 
-            plt.tight_layout()
-
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight')
-            buf.seek(0)
-            img = Image.open(buf)
-            plt.close(fig)
-            fig = None
+            if comparison_data is not None:
+                comp_percents, comp_strengths, comp_name = comparison_data
+                spec.line(np.asarray(comp_percents) * 100, comp_strengths, color='g', width=2, style='--',
+                          label=f'Compare: {comp_name}', alpha=0.6)
 
-            img_array = np.array(img).astype(np.float32) / 255.0
-            img_tensor = torch.from_numpy(img_array)[None,]
+            info_text = f'Range: {start_percent:.2f}->{end_percent:.2f}\n'
+            info_text += f'Strength: {start_strength:.2f}->{end_strength:.2f}\n'
+            info_text += f'Keyframes: {len(percents)}'
+            spec.text(0.02, 0.98, info_text, size=10, va='top', box='wheat', box_alpha=0.5)
 
-            return img_tensor
+            return render_preview(spec)
 
         except Exception as e:
             print(f"[Advanced Curved] Graph failed: {e}")
             return self.create_dummy_image()
-        finally:
-            if fig is not None:
-                plt.close(fig)
-            plt.close('all')
 
     def create_dummy_image(self):
         """Create dummy image when graph generation fails"""
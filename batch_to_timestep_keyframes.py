@@ -4,6 +4,7 @@
 # Advanced ControlNet expects (has_index, keyframes, etc).
 
 import inspect
+import operator
 from typing import Any, Dict, List
 import torch
 
@@ -20,6 +21,11 @@ def _import_timestep_keyframe():
 
 TimestepKeyframe = _import_timestep_keyframe()
 
+try:
+    from .shared_image_batch import HINT_DEVICES, shared_image_batch, resolve_hint_device
+except Exception:
+    from shared_image_batch import HINT_DEVICES, shared_image_batch, resolve_hint_device
+
 
 class _KeyframeContainer:
     """
@@ -74,19 +80,52 @@ def _get_keyframe_list(prev_timestep_kf: Any) -> List[Any]:
     return [prev_timestep_kf]
 
 
-def _kf_to_kwargs(kf_obj: Any, accepted: set) -> Dict[str, Any]:
-    """Copy fields from an existing keyframe, keeping only those accepted by the constructor."""
-    src = {}
-    try:
-        src = dict(vars(kf_obj))
-    except Exception:
-        for name in dir(kf_obj):
-            if not name.startswith("_"):
-                try:
-                    src[name] = getattr(kf_obj, name)
-                except Exception:
-                    pass
-    return {k: v for k, v in src.items() if k in accepted}
+_accepted_kwargs_cache: Dict[type, frozenset] = {}
+
+
+def _accepted_kwargs(cls: type) -> frozenset:
+    """Constructor keyword names of `cls`, inspected once per class."""
+    accepted = _accepted_kwargs_cache.get(cls)
+    if accepted is None:
+        try:
+            accepted = frozenset(inspect.signature(cls).parameters)
+        except (TypeError, ValueError):
+            accepted = frozenset()
+        _accepted_kwargs_cache[cls] = accepted
+    return accepted
+
+
+class _ClonePlan:
+    """
+    How to rebuild a keyframe of one source class as a TimestepKeyframe:
+    the constructor fields it carries (read through a single attrgetter) and
+    whether the constructor takes cn_extras. Worked out once per class.
+    """
+    __slots__ = ("fields", "getter", "accepts_cn_extras")
+
+    def __init__(self, src_kf: Any, accepted: frozenset):
+        self.fields = tuple(sorted(
+            name for name in accepted if name != "cn_extras" and hasattr(src_kf, name)
+        ))
+        if len(self.fields) > 1:
+            self.getter = operator.attrgetter(*self.fields)
+        elif self.fields:
+            single = operator.attrgetter(self.fields[0])
+            self.getter = lambda obj: (single(obj),)
+        else:
+            self.getter = lambda obj: ()
+        self.accepts_cn_extras = "cn_extras" in accepted
+
+
+_clone_plans: Dict[type, _ClonePlan] = {}
+
+
+def _clone_plan(src_kf: Any) -> _ClonePlan:
+    plan = _clone_plans.get(type(src_kf))
+    if plan is None:
+        plan = _ClonePlan(src_kf, _accepted_kwargs(TimestepKeyframe))
+        _clone_plans[type(src_kf)] = plan
+    return plan
 
 
 def _attach_cn_extras(obj: Any, extras: Dict[str, Any]) -> None:
@@ -99,8 +138,11 @@ def _attach_cn_extras(obj: Any, extras: Dict[str, Any]) -> None:
 
 class Batch_Images_to_Timestep_Keyframes:
     """
-    Maps a BATCH of images (K,H,W,C) to the K keyframes in prev_timestep_kf by index,
-    storing the per-index image under keyframe.cn_extras['image'].
+    Maps a BATCH of images (K,H,W,C) to the K keyframes in prev_timestep_kf by index.
+    Every keyframe's cn_extras['image'] is a view into one shared batch. When a
+    hint device or size is set, the whole batch is moved in one transfer and
+    resized in one interpolate call, and those copies are reused on reruns
+    with the same images, instead of each hint being handled on its own.
 
     Returns a container with a `.keyframes` attribute and `.has_index(i)` so
     downstream nodes (e.g. Apply Advanced ControlNet) can use it directly.
@@ -113,6 +155,24 @@ class Batch_Images_to_Timestep_Keyframes:
                 "images": ("IMAGE",),                 # (K,H,W,C)
                 "prev_timestep_kf": ("TIMESTEP_KEYFRAME",),
                 "print_keyframes": ("BOOLEAN", {"default": False}),
+            },
+            "optional": {
+                "hint_device": (list(HINT_DEVICES), {
+                    "default": "keep",
+                    "tooltip": "Move the whole image batch to this device in one transfer before mapping (keep = leave it where it is)"
+                }),
+                "pin_memory": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Pin the image batch in page-locked memory so the transfer to the GPU runs non-blocking"
+                }),
+                "hint_width": ("INT", {
+                    "default": 0, "min": 0, "max": 16384, "step": 8,
+                    "tooltip": "Resize the whole batch to this width once (0 = keep; needs hint_height)"
+                }),
+                "hint_height": ("INT", {
+                    "default": 0, "min": 0, "max": 16384, "step": 8,
+                    "tooltip": "Resize the whole batch to this height once (0 = keep; needs hint_width)"
+                }),
             }
         }
 
@@ -125,14 +185,15 @@ class Batch_Images_to_Timestep_Keyframes:
     def IS_CHANGED(cls, **kwargs):
         return float("nan")
 
-    def create_keyframes(self, images, prev_timestep_kf, print_keyframes=False):
+    def create_keyframes(self, images, prev_timestep_kf, print_keyframes=False,
+                         hint_device="keep", pin_memory=False, hint_width=0, hint_height=0):
         prev_list = _get_keyframe_list(prev_timestep_kf) or []
         num_prev = len(prev_list)
 
         if images is None:
             raise ValueError("No images batch provided.")
-        if images.dim() == 3:
-            images = images.unsqueeze(0)  # (1,H,W,C)
+        shared_batch = shared_image_batch(images)  # keyed on the tensor ComfyUI passes in
+        images = shared_batch.images  # (K,H,W,C)
         if images.dim() != 4:
             raise ValueError(f"Expected IMAGE tensor with shape (K,H,W,C); got {tuple(images.shape)}")
 
@@ -159,27 +220,35 @@ class Batch_Images_to_Timestep_Keyframes:
         if n == 0:
             return (_KeyframeContainer(prev_list), "No keyframes or images to map.")
 
-        # Which kwargs does the current constructor accept?
-        sig = inspect.signature(TimestepKeyframe)
-        accepted = set(sig.parameters.keys())
-        accepts_cn_extras = "cn_extras" in accepted
+        # One transfer / one resize for the whole batch; every keyframe gets a view of it
+        if pin_memory:
+            shared_batch.pin()
+        device = resolve_hint_device(hint_device)
+        if hint_width > 0 and hint_height > 0:
+            hints = shared_batch.resized(hint_height, hint_width, device)
+        else:
+            hints = shared_batch.to(device)
 
+        # Field lists, getters and the cn_extras strategy are cached per keyframe class
         new_kf_list: List[Any] = []
         for i in range(n):
             src_kf = prev_list[i]
-            per_k_extras = {"image": images[i]}
-
-            base_kwargs = _kf_to_kwargs(src_kf, accepted)
-            if accepts_cn_extras:
-                base_kwargs["cn_extras"] = per_k_extras
+            plan = _clone_plan(src_kf)
+            per_k_extras = {"image": hints[i]}
+            kwargs = dict(zip(plan.fields, plan.getter(src_kf)))
 
-            try:
-                new_kf = TimestepKeyframe(**base_kwargs)
-            except TypeError:
-                base_kwargs.pop("cn_extras", None)
-                new_kf = TimestepKeyframe(**base_kwargs)
-
-            if not accepts_cn_extras:
+            new_kf = None
+            if plan.accepts_cn_extras:
+                try:
+                    new_kf = TimestepKeyframe(cn_extras=per_k_extras, **kwargs)
+                except TypeError as e:
+                    # Only a rejected cn_extras keyword means the constructor can't
+                    # take it; anything else is a real error in the other fields
+                    if "cn_extras" not in str(e):
+                        raise
+                    plan.accepts_cn_extras = False
+            if new_kf is None:
+                new_kf = TimestepKeyframe(**kwargs)
                 _attach_cn_extras(new_kf, per_k_extras)
 
             new_kf_list.append(new_kf)
@@ -190,6 +259,8 @@ class Batch_Images_to_Timestep_Keyframes:
                 print(f"  keyframe[{i}] <- image[{i}]")
 
         info = f"Mapped {n} image(s) to {num_prev} keyframe(s)."
+        if hints is not images:
+            info += f" Hints: {tuple(hints.shape)} on {hints.device}."
         return (_KeyframeContainer(new_kf_list), info)
 
 
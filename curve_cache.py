@@ -0,0 +1,152 @@
+# curve_cache.py
+# Process-wide LRU cache of sampled curves shared by the scheduler nodes.
+# A workflow with a dozen schedulers on the same preset samples the curve once;
+# every later node gets the same read-only array back.
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from .curve_kernels import evaluate_curve
+except Exception:
+    from curve_kernels import evaluate_curve
+
+
+# Override with CURVED_SCHEDULE_CURVE_CACHE_SIZE=<n>; 0 disables caching.
+DEFAULT_MAX_ENTRIES = int(os.environ.get("CURVED_SCHEDULE_CURVE_CACHE_SIZE", "256"))
+
+
+class CurveCache:
+    """
+    Bounded LRU mapping of curve keys to read-only numpy arrays.
+    Thread-safe; the compute callback runs outside the lock.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_entries = max(0, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        value = np.array(compute(), copy=True)
+        value.flags.writeable = False
+
+        with self._lock:
+            if self.max_entries > 0:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+                self._evict_locked()
+        return value
+
+    def resize(self, max_entries):
+        """Change the size cap (0 disables caching) and evict as needed."""
+        with self._lock:
+            self.max_entries = max(0, int(max_entries))
+            self._evict_locked()
+
+    def clear(self, reset_stats=False):
+        with self._lock:
+            self._entries.clear()
+            if reset_stats:
+                self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict_locked(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+CURVE_CACHE = CurveCache()
+
+
+def sample_curve(curve_type, curve_param, num_samples, repeat_curve=1,
+                 mirror=False, invert=False, blend_curve_type="none",
+                 blend_amount=0.0, custom_formula=None, curve_fn=None, points=None):
+    """
+    Sample a normalized curve over `num_samples` evenly spaced points, applying
+    repeat, mirror, blend and invert in that order. Results are cached in
+    CURVE_CACHE and returned read-only - copy before modifying.
+
+    `points` optionally replaces the even spacing with explicit positions in
+    [0, 1] (num_samples is then ignored); mirroring is applied in t-space.
+
+    `curve_fn(t, curve_type)` overrides how a single curve type is evaluated
+    (the advanced scheduler uses it for custom formulas); it must depend only
+    on values that are part of the cache key.
+    """
+    blending = blend_curve_type != "none" and blend_amount > 0
+    if points is not None:
+        points = np.ascontiguousarray(points, dtype=np.float64)
+        num_samples = len(points)
+    key = (
+        curve_type,
+        float(curve_param),
+        int(num_samples),
+        int(repeat_curve),
+        bool(mirror),
+        bool(invert),
+        blend_curve_type if blending else "none",
+        float(blend_amount) if blending else 0.0,
+        custom_formula if curve_type == "custom_formula" else None,
+        points.tobytes() if points is not None else None,
+    )
+
+    def compute():
+        evaluate = curve_fn or (lambda t, name: evaluate_curve(name, t, curve_param))
+
+        if points is None:
+            t = np.linspace(0, 1, num_samples)
+        elif mirror:
+            t = np.where(points > 0.5, 1.0 - points, points)
+        else:
+            t = points
+        if repeat_curve > 1:
+            t = (t * repeat_curve) % 1.0
+
+        curve = np.array(evaluate(t, curve_type), dtype=np.float64)
+
+        if mirror and points is None:
+            midpoint = len(curve) // 2
+            curve[midpoint:] = curve[midpoint - 1::-1][:len(curve[midpoint:])]
+
+        if blending:
+            blend_curve = evaluate(t, blend_curve_type)
+            curve = curve * (1 - blend_amount) + blend_curve * blend_amount
+
+        if invert:
+            curve = 1 - curve
+
+        if np.any(np.isnan(curve)):
+            print("[ERROR] NaN values detected in curve calculation, using linear fallback")
+            curve = np.linspace(0, 1, num_samples) if points is None else points.copy()
+
+        return curve
+
+    return CURVE_CACHE.get_or_compute(key, compute)
@@ -1,10 +1,12 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import torch
-import io
-from PIL import Image
+
+try:
+    from .curve_kernels import evaluate_curve
+    from .preview_render import PlotSpec, render_preview
+except Exception:
+    from curve_kernels import evaluate_curve
+    from preview_render import PlotSpec, render_preview
 
 class CurveFormulaBuilder:
     """
@@ -134,20 +136,20 @@ class CurveFormulaBuilder:
         elif pattern == "Ease In (Slow Start)":
             # Slow start, fast end
             power = 1.0 + strength_factor
-            curve = t ** power
+            curve = evaluate_curve("ease_in", t, power)
             formula = f"t**{power:.2f}"
             description = "Starts gentle, accelerates toward the end"
             
         elif pattern == "Ease Out (Slow End)":
             # Fast start, slow end
             power = 1.0 + strength_factor
-            curve = 1 - (1 - t) ** power
+            curve = evaluate_curve("ease_out", t, power)
             formula = f"1-(1-t)**{power:.2f}"
             description = "Starts strong, slows down toward the end"
             
         elif pattern == "S-Curve (Smooth)":
             # Smooth S-curve (ease in-out)
-            curve = 3 * t**2 - 2 * t**3
+            curve = evaluate_curve("smoothstep", t)
             # Apply strength by adjusting the curve
             if strength_factor != 1.0:
                 curve = curve ** (1.0 / strength_factor)
@@ -159,30 +161,28 @@ class CurveFormulaBuilder:
             # Sine wave
             cycles = speed_factor * 2  # More speed = more cycles
             amplitude = strength_factor * 0.5
-            curve = 0.5 + amplitude * np.sin(t * np.pi * 2 * cycles)
+            curve = 0.5 + 2 * amplitude * (evaluate_curve("sine_wave", t, cycles) - 0.5)
             formula = f"0.5 + {amplitude:.2f}*sin(t*6.28*{cycles:.1f})"
             description = f"Oscillating wave with {cycles:.1f} cycles"
             
         elif pattern == "Peak (Up Then Down)":
             # Bell curve
-            center = 0.5
-            width = 0.3 / speed_factor
-            curve = strength_factor * np.exp(-((t - center)**2) / (2 * width**2))
+            width = 0.3 / speed_factor  # kernel width is 0.15 / param
+            curve = strength_factor * evaluate_curve("bell_curve", t, speed_factor / 2)
             formula = f"{strength_factor:.2f}*exp(-((t-0.5)**2)/(2*{width:.3f}**2))"
             description = "Peaks in the middle, low at edges"
             
         elif pattern == "Valley (Down Then Up)":
             # Inverted bell curve
-            center = 0.5
-            width = 0.3 / speed_factor
-            curve = 1 - strength_factor * np.exp(-((t - center)**2) / (2 * width**2))
+            width = 0.3 / speed_factor  # kernel width is 0.15 / param
+            curve = 1 - strength_factor * evaluate_curve("bell_curve", t, speed_factor / 2)
             formula = f"1 - {strength_factor:.2f}*exp(-((t-0.5)**2)/(2*{width:.3f}**2))"
             description = "Dips in the middle, high at edges"
             
         elif pattern == "Exponential Growth":
             # Exponential increase
             rate = speed_factor * 5
-            curve = (np.exp(rate * t) - 1) / (np.exp(rate) - 1)
+            curve = evaluate_curve("exponential", t, rate)
             curve = curve * strength_factor
             curve = np.clip(curve, 0, 1)
             formula = f"(exp({rate:.1f}*t)-1)/(exp({rate:.1f})-1)"
@@ -191,7 +191,7 @@ class CurveFormulaBuilder:
         elif pattern == "Exponential Decay":
             # Exponential decrease
             rate = speed_factor * 5
-            curve = 1 - (np.exp(rate * t) - 1) / (np.exp(rate) - 1)
+            curve = 1 - evaluate_curve("exponential", t, rate)
             curve = curve * strength_factor
             curve = np.clip(curve, 0, 1)
             formula = f"1 - (exp({rate:.1f}*t)-1)/(exp({rate:.1f})-1)"
@@ -208,47 +208,34 @@ class CurveFormulaBuilder:
     def generate_preview(self, t, curve, pattern, strength, speed):
         """Generate a preview graph of the curve"""
         try:
-            fig, ax = plt.subplots(figsize=(8, 5), dpi=100)
+            spec = PlotSpec(
+                size=(800, 500),
+                title=f'{pattern}\nStrength: {strength:.0f}% | Speed: {speed:.0f}%',
+                xlabel='Progress (%)',
+                ylabel='Strength',
+                xlim=(-5, 105),
+                ylim=(-0.1, 1.1),
+                title_size=12,
+                label_size=11,
+                legend=False,
+            )
             
             # Plot the curve
-            ax.plot(t * 100, curve, 'b-', linewidth=2.5, label='Your Curve')
-            ax.scatter(t[::len(t)//10] * 100, curve[::len(t)//10], 
-                      c='red', s=40, zorder=5, alpha=0.6)
-            
-            # Styling
-            ax.set_xlabel('Progress (%)', fontsize=11, fontweight='bold')
-            ax.set_ylabel('Strength', fontsize=11, fontweight='bold')
-            ax.set_title(f'{pattern}\nStrength: {strength:.0f}% | Speed: {speed:.0f}%', 
-                        fontsize=12, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.set_xlim(-5, 105)
-            ax.set_ylim(-0.1, 1.1)
+            spec.line(t * 100, curve, color='b', width=2.5, label='Your Curve')
+            spec.scatter(t[::len(t)//10] * 100, curve[::len(t)//10], 
+                         color='red', s=40, alpha=0.6)
             
             # Add reference lines
-            ax.axhline(y=0.5, color='gray', linestyle=':', alpha=0.5, linewidth=1)
-            ax.axvline(x=50, color='gray', linestyle=':', alpha=0.5, linewidth=1)
-            
-            plt.tight_layout()
-            
-            # Convert to image tensor
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight')
-            buf.seek(0)
-            img = Image.open(buf)
-            plt.close(fig)
-            
-            img_array = np.array(img).astype(np.float32) / 255.0
-            img_tensor = torch.from_numpy(img_array)[None,]
+            spec.axhline(0.5, color='gray', style=':', alpha=0.5, width=1)
+            spec.axvline(50, color='gray', style=':', alpha=0.5, width=1)
             
-            return img_tensor
+            return render_preview(spec)
             
         except Exception as e:
             print(f"[Curve Formula Builder] Graph error: {e}")
             # Return dummy image on error
             dummy = np.zeros((100, 100, 3), dtype=np.float32)
             return torch.from_numpy(dummy)[None,]
-        finally:
-            plt.close('all')
     
     def build_description(self, pattern, strength, speed, flip_vertical, 
                          flip_horizontal, repeat_times, show_formula, 
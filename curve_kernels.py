@@ -0,0 +1,343 @@
+# curve_kernels.py
+# Shared curve math for every scheduler node in this package.
+# Each curve type maps to a pure array kernel that writes into a caller-supplied
+# output buffer, so the shapes are defined in exactly one place and large sweeps
+# can be evaluated with a single allocation.
+
+import numpy as np
+
+
+BELL_CENTER = 0.5
+BELL_BASE_WIDTH = 0.15      # bell width at curve_param == 1.0
+EXPONENTIAL_MAX_PARAM = 10.0  # keeps exp() well inside float range
+
+
+# ---------------------------------------------------------------------------
+# Kernels
+#
+# Signature: kernel(t, p, out) -> out
+#   t   : array of normalized progress values in [0, 1]
+#   p   : curve_param, a scalar or an array broadcastable against t
+#   out : preallocated buffer with shape broadcast(t, p); its dtype is the
+#         working precision of the kernel
+# Kernels only use ufuncs with out= so they allocate as little as possible.
+# ---------------------------------------------------------------------------
+
+def _linear(t, p, out):
+    np.copyto(out, t)
+    return out
+
+
+def _ease_in(t, p, out):
+    # Slow start, fast end
+    return np.power(t, p, out=out)
+
+
+def _ease_out(t, p, out):
+    # Fast start, slow end
+    np.subtract(1.0, t, out=out)
+    np.power(out, p, out=out)
+    return np.subtract(1.0, out, out=out)
+
+
+def _ease_in_out(t, p, out):
+    # Slow start and end: 2^(p-1) * t^p, mirrored around t = 0.5
+    upper = t >= 0.5
+    np.multiply(t, 2.0, out=out)
+    np.subtract(2.0, out, out=out, where=upper)
+    np.power(out, p, out=out)
+    out *= 0.5
+    return np.subtract(1.0, out, out=out, where=upper)
+
+
+def _sine_wave(t, p, out):
+    # Oscillates between 0 and 1, curve_param full cycles
+    np.multiply(t, 2.0 * np.pi, out=out)
+    np.multiply(out, p, out=out)
+    np.sin(out, out=out)
+    out += 1.0
+    out *= 0.5
+    return out
+
+
+def _bell_curve(t, p, out):
+    # Gaussian peak in the middle; higher curve_param = narrower peak
+    width = BELL_BASE_WIDTH / np.maximum(p, 0.1)
+    np.subtract(t, BELL_CENTER, out=out)
+    np.square(out, out=out)
+    np.divide(out, -2.0 * width * width, out=out)
+    return np.exp(out, out=out)
+
+
+def _reverse_bell(t, p, out):
+    # Valley in the middle (inverted bell)
+    _bell_curve(t, p, out)
+    return np.subtract(1.0, out, out=out)
+
+
+def _exponential(t, p, out):
+    # Exponential growth normalized to [0, 1]
+    safe_p = np.minimum(p, EXPONENTIAL_MAX_PARAM)
+    denom = np.expm1(safe_p)
+    degenerate = denom < 1e-10
+    np.multiply(t, safe_p, out=out)
+    np.expm1(out, out=out)
+    np.divide(out, np.where(degenerate, 1.0, denom), out=out)
+    if np.any(degenerate):
+        print("[Warning] Exponential curve parameter too small, using linear")
+        np.copyto(out, t, where=degenerate)
+    return out
+
+
+def _bounce(t, p, out):
+    # Bouncing abs sine wave
+    np.multiply(t, np.pi, out=out)
+    np.multiply(out, p, out=out)
+    np.sin(out, out=out)
+    return np.abs(out, out=out)
+
+
+def _custom_bezier(t, p, out):
+    # Cubic bezier from (0,0) to (1,1) with control points p/10 and 1 - p/10
+    p1 = np.multiply(p, 0.1)
+    p2 = 1.0 - p1
+    s = 1.0 - t
+    np.multiply(s, p1, out=out)
+    out += np.multiply(t, p2)
+    out *= s
+    out *= t
+    out *= 3.0
+    out += t ** 3
+    return out
+
+
+def _smoothstep(t, p, out):
+    # Hermite S-curve 3t^2 - 2t^3 (curve_param is ignored)
+    np.multiply(t, -2.0, out=out)
+    out += 3.0
+    out *= t
+    out *= t
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Penner easing family
+#
+# Each family is defined by its "ease in" shape f(t). The out and in_out
+# variants are derived from it:
+#   out(t)    = 1 - f(1 - t)
+#   in_out(t) = f(2t) / 2              for t < 0.5
+#             = 1 - f(2 - 2t) / 2      for t >= 0.5
+# Penner's back and elastic in_out use a wider overshoot / longer period, so
+# those families pass a separate f for in_out. curve_param is ignored.
+# ---------------------------------------------------------------------------
+
+BACK_OVERSHOOT = 1.70158
+BACK_IN_OUT_OVERSHOOT = BACK_OVERSHOOT * 1.525
+ELASTIC_PERIOD = 3.0
+ELASTIC_IN_OUT_PERIOD = 4.5
+
+
+def _power_in(n):
+    def ease_in(t, out):
+        return np.power(t, n, out=out)
+    return ease_in
+
+
+def _sine_in(t, out):
+    np.multiply(t, np.pi / 2.0, out=out)
+    np.cos(out, out=out)
+    return np.subtract(1.0, out, out=out)
+
+
+def _expo_in(t, out):
+    np.multiply(t, 10.0, out=out)
+    out -= 10.0
+    np.exp2(out, out=out)
+    np.copyto(out, 0.0, where=t <= 0.0)
+    return out
+
+
+def _circ_in(t, out):
+    np.square(t, out=out)
+    np.subtract(1.0, out, out=out)
+    np.maximum(out, 0.0, out=out)
+    np.sqrt(out, out=out)
+    return np.subtract(1.0, out, out=out)
+
+
+def _back_in(c):
+    def ease_in(t, out):
+        # t^2 * ((c + 1) t - c)
+        np.multiply(t, c + 1.0, out=out)
+        out -= c
+        out *= t
+        out *= t
+        return out
+    return ease_in
+
+
+def _elastic_in(period):
+    def ease_in(t, out):
+        # -2^(10t - 10) * sin((10t - 10 - period/4) * 2pi / period)
+        phase = np.multiply(t, 10.0)
+        phase -= 10.0 + period / 4.0
+        phase *= 2.0 * np.pi / period
+        np.sin(phase, out=phase)
+        np.multiply(t, 10.0, out=out)
+        out -= 10.0
+        np.exp2(out, out=out)
+        out *= phase
+        np.negative(out, out=out)
+        np.copyto(out, 0.0, where=t <= 0.0)
+        return out
+    return ease_in
+
+
+_BOUNCE_N = 7.5625
+_BOUNCE_D = 2.75
+
+
+def _bounce_in(t, out):
+    # Penner defines bounce by its "out" shape; in(t) = 1 - bounce_out(1 - t)
+    x = 1.0 - t
+    segments = [x < 1.0 / _BOUNCE_D, x < 2.0 / _BOUNCE_D, x < 2.5 / _BOUNCE_D]
+    offset = np.select(segments, [0.0, 1.5 / _BOUNCE_D, 2.25 / _BOUNCE_D], 2.625 / _BOUNCE_D)
+    lift = np.select(segments, [0.0, 0.75, 0.9375], 0.984375)
+    np.subtract(x, offset, out=x)
+    np.square(x, out=out)
+    out *= _BOUNCE_N
+    out += lift
+    return np.subtract(1.0, out, out=out)
+
+
+def _easing_kernels(ease_in, ease_in_for_in_out=None):
+    """Build the (in, out, in_out) kernels for one easing family."""
+    ease_in_for_in_out = ease_in_for_in_out or ease_in
+
+    def in_kernel(t, p, out):
+        return ease_in(t, out)
+
+    def out_kernel(t, p, out):
+        ease_in(1.0 - t, out)
+        return np.subtract(1.0, out, out=out)
+
+    def in_out_kernel(t, p, out):
+        upper = t >= 0.5
+        u = np.multiply(t, 2.0)
+        np.subtract(2.0, u, out=u, where=upper)
+        ease_in_for_in_out(u, out)
+        out *= 0.5
+        return np.subtract(1.0, out, out=out, where=upper)
+
+    return in_kernel, out_kernel, in_out_kernel
+
+
+EASING_FAMILIES = {
+    "sine": (_sine_in,),
+    "quad": (_power_in(2),),
+    "cubic": (_power_in(3),),
+    "quart": (_power_in(4),),
+    "quint": (_power_in(5),),
+    "expo": (_expo_in,),
+    "circ": (_circ_in,),
+    "back": (_back_in(BACK_OVERSHOOT), _back_in(BACK_IN_OUT_OVERSHOOT)),
+    "elastic": (_elastic_in(ELASTIC_PERIOD), _elastic_in(ELASTIC_IN_OUT_PERIOD)),
+    "bounce": (_bounce_in,),
+}
+
+EASING_KERNELS = {}
+for _family, _shapes in EASING_FAMILIES.items():
+    _in, _out, _in_out = _easing_kernels(*_shapes)
+    EASING_KERNELS[f"ease_in_{_family}"] = _in
+    EASING_KERNELS[f"ease_out_{_family}"] = _out
+    EASING_KERNELS[f"ease_in_out_{_family}"] = _in_out
+
+EASING_TYPES = tuple(EASING_KERNELS.keys())
+
+
+CURVE_KERNELS = {
+    "linear": _linear,
+    "ease_in": _ease_in,
+    "ease_out": _ease_out,
+    "ease_in_out": _ease_in_out,
+    "sine_wave": _sine_wave,
+    "bell_curve": _bell_curve,
+    "reverse_bell": _reverse_bell,
+    "exponential": _exponential,
+    "bounce": _bounce,
+    "custom_bezier": _custom_bezier,
+    "smoothstep": _smoothstep,
+    **EASING_KERNELS,
+}
+
+CURVE_TYPES = tuple(CURVE_KERNELS.keys())
+
+
+def evaluate_curve(curve_type, t, curve_param=2.0, out=None, dtype=None):
+    """
+    Evaluate a named curve over normalized progress values.
+
+    t and curve_param are broadcast together, so a column of parameters against
+    a row of t values evaluates a whole sweep in one call. If `out` is given the
+    result is written into it (shape must match the broadcast shape); otherwise
+    a new buffer of `dtype` (default float64, or out.dtype) is allocated.
+    Unknown curve types fall back to linear.
+    """
+    if dtype is None:
+        dtype = out.dtype if out is not None else np.float64
+    t = np.asarray(t, dtype=dtype)
+    if np.ndim(curve_param) == 0:
+        p = float(curve_param)
+    else:
+        p = np.asarray(curve_param, dtype=dtype)
+
+    shape = np.broadcast_shapes(t.shape, np.shape(p))
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        raise ValueError(f"Output buffer has shape {out.shape}, expected {shape}")
+
+    kernel = CURVE_KERNELS.get(curve_type)
+    if kernel is None:
+        print(f"[Warning] Unknown curve type '{curve_type}', using linear")
+        kernel = _linear
+
+    kernel(t, p, out)
+    return out
+
+
+def _benchmark_easing(sample_counts=(10_000, 100_000), repeats=5):
+    """
+    Microbenchmark: per-element scalar lambdas (the old EASING_FUNCTIONS path)
+    versus the array kernels above. Run with `python curve_kernels.py`.
+    """
+    import time
+
+    scalar_easing = {
+        "ease_in_out_quad": lambda t: 2 * t ** 2 if t < 0.5 else 1 - (-2 * t + 2) ** 2 / 2,
+        "ease_in_out_cubic": lambda t: 4 * t ** 3 if t < 0.5 else 1 - (-2 * t + 2) ** 3 / 2,
+        "ease_out_quart": lambda t: 1 - (1 - t) ** 4,
+    }
+
+    def best_of(fn):
+        best = float("inf")
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    for n in sample_counts:
+        t = np.linspace(0.0, 1.0, n)
+        out = np.empty_like(t)
+        for name, scalar in scalar_easing.items():
+            slow = best_of(lambda: np.array([scalar(ti) for ti in t]))
+            fast = best_of(lambda: evaluate_curve(name, t, out=out))
+            assert np.allclose(np.array([scalar(ti) for ti in t]), out)
+            print(f"{name:<20} n={n:>7}: scalar {slow * 1e3:8.2f} ms | "
+                  f"kernel {fast * 1e3:6.3f} ms | {slow / fast:6.0f}x")
+
+
+if __name__ == "__main__":
+    _benchmark_easing()
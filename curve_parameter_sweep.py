@@ -0,0 +1,323 @@
+# curve_parameter_sweep.py
+# Parameter-sweep scheduler: every combination of curve type, curve_param and
+# start/end strength is evaluated as rows of one 2D array, so a grid of A/B
+# schedules costs one kernel call per curve type instead of one node each.
+
+import hashlib
+
+import numpy as np
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+import torch
+
+try:
+    from .curve_kernels import evaluate_curve, CURVE_TYPES
+    from .keyframe_group import ArrayKeyframeGroup
+    from .preview_render import PREVIEW_CACHE, preview_wanted, PLACEHOLDER_IMAGE
+except Exception:
+    from curve_kernels import evaluate_curve, CURVE_TYPES
+    from keyframe_group import ArrayKeyframeGroup
+    from preview_render import PREVIEW_CACHE, preview_wanted, PLACEHOLDER_IMAGE
+
+# Import Advanced ControlNet classes
+try:
+    from .utils import TimestepKeyframeGroup, TimestepKeyframe
+    ACN_AVAILABLE = True
+except Exception:
+    try:
+        import sys
+        import os
+        comfy_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        acn_path = os.path.join(comfy_path, "custom_nodes", "ComfyUI-Advanced-ControlNet")
+        if os.path.exists(acn_path):
+            sys.path.insert(0, acn_path)
+            from adv_control.utils import TimestepKeyframeGroup, TimestepKeyframe
+            ACN_AVAILABLE = True
+        else:
+            ACN_AVAILABLE = False
+    except Exception as e:
+        print(f"Failed to import Advanced ControlNet: {e}")
+        ACN_AVAILABLE = False
+
+# Upper bound on schedules per sweep; larger grids are truncated with a warning
+MAX_SWEEP_COMBINATIONS = 256
+
+# Upper bound on the values a single start:stop:step range may expand to
+MAX_RANGE_VALUES = 1000
+
+
+def parse_value_list(text, name="value"):
+    """
+    Parse a comma-separated list of numbers and inclusive ranges.
+    "0.5, 1, 2" -> [0.5, 1.0, 2.0]; "1:3:0.5" -> [1.0, 1.5, 2.0, 2.5, 3.0]
+    A range that would expand to more than MAX_RANGE_VALUES values is rejected
+    before anything is allocated.
+    """
+    values = []
+    for item in str(text).replace(";", ",").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        if ":" in item:
+            parts = [float(part) for part in item.split(":")]
+            if len(parts) == 2:
+                parts.append(1.0)
+            if len(parts) != 3 or parts[2] == 0:
+                raise ValueError(f"Invalid {name} range '{item}' (use start:stop:step)")
+            start, stop, step = parts
+            count = (stop - start) / step
+            if not np.isfinite(count) or count + 1 > MAX_RANGE_VALUES:
+                raise ValueError(f"{name} range '{item}' expands to more than {MAX_RANGE_VALUES} values")
+            count = int(np.floor(count + 1e-9)) + 1
+            values.extend(start + step * np.arange(max(count, 0)))
+        else:
+            values.append(float(item))
+    if not values:
+        raise ValueError(f"No {name} values given")
+    return np.asarray(values, dtype=np.float64)
+
+
+def parse_curve_types(text):
+    """Parse a comma-separated list of curve type names; unknown names are skipped."""
+    names = [name.strip() for name in str(text).replace(";", ",").split(",") if name.strip()]
+    valid = [name for name in names if name in CURVE_TYPES]
+    for name in names:
+        if name not in CURVE_TYPES:
+            print(f"[Warning] Unknown curve type '{name}' in sweep, skipping")
+    if not valid:
+        raise ValueError("No valid curve types given")
+    return valid
+
+
+class CurveParameterSweep:
+    """
+    Sweep curve_type, curve_param and start/end strength in one node.
+    Outputs one keyframe group per combination plus a contact sheet of all of them.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "curve_types": ("STRING", {
+                    "default": "ease_out, bell_curve",
+                    "multiline": False,
+                    "tooltip": f"Comma-separated curve types. Available: {', '.join(CURVE_TYPES)}"
+                }),
+                "curve_params": ("STRING", {
+                    "default": "1.0:3.0:1.0",
+                    "multiline": False,
+                    "tooltip": "Comma-separated values and/or start:stop:step ranges for curve_param"
+                }),
+                "start_strengths": ("STRING", {
+                    "default": "1.0",
+                    "multiline": False,
+                    "tooltip": "Comma-separated values and/or start:stop:step ranges for start strength"
+                }),
+                "end_strengths": ("STRING", {
+                    "default": "0.0, 0.25",
+                    "multiline": False,
+                    "tooltip": "Comma-separated values and/or start:stop:step ranges for end strength"
+                }),
+                "num_keyframes": ("INT", {
+                    "default": 10,
+                    "min": 2,
+                    "max": 100,
+                    "step": 1,
+                    "tooltip": "Number of keyframes per schedule"
+                }),
+                "start_percent": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "When every schedule starts"
+                }),
+                "end_percent": ("FLOAT", {
+                    "default": 1.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "When every schedule ends"
+                }),
+            },
+            "optional": {
+                "tile_columns": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 32,
+                    "step": 1,
+                    "tooltip": "Contact sheet columns (0 = one column per start/end strength pair, one row per curve type and param)"
+                }),
+                "show_graph": ("BOOLEAN", {
+                    "default": True,
+                    "tooltip": "Draw the contact sheet of every schedule"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("TIMESTEP_KEYFRAME", "IMAGE", "STRING")
+    RETURN_NAMES = ("TIMESTEP_KF_LIST", "contact_sheet", "sweep_info")
+    OUTPUT_IS_LIST = (True, False, False)
+    FUNCTION = "run_sweep"
+    CATEGORY = "conditioning/controlnet"
+
+    def evaluate_sweep(self, curve_types, curve_params, start_strengths, end_strengths, num_keyframes,
+                       limit=MAX_SWEEP_COMBINATIONS):
+        """
+        Evaluate the first `limit` combinations as one (combinations, num_keyframes)
+        array. Row order is curve_type, curve_param, start_strength, end_strength
+        (last varies fastest); returns (strengths, combos). Only the kept rows are
+        ever evaluated, so memory does not depend on the size of the full grid.
+        """
+        t = np.linspace(0, 1, num_keyframes)
+        shape = (len(curve_types), len(curve_params), len(start_strengths), len(end_strengths))
+        count = min(int(np.prod(shape, dtype=np.float64)), limit)
+        type_idx, param_idx, start_idx, end_idx = np.unravel_index(np.arange(count), shape)
+
+        # (rows, N) curves: one broadcast kernel call per curve type, over the params its rows use
+        curves = np.empty((count, num_keyframes))
+        for i, curve_type in enumerate(curve_types):
+            rows = np.flatnonzero(type_idx == i)
+            if len(rows) == 0:
+                continue
+            used, inverse = np.unique(param_idx[rows], return_inverse=True)
+            evaluated = evaluate_curve(curve_type, t[None, :], curve_params[used][:, None])
+            curves[rows] = np.broadcast_to(evaluated, (len(used), num_keyframes))[inverse]
+
+        # start + (end - start) * curve, per row
+        starts = start_strengths[start_idx][:, None]
+        strengths = starts + (end_strengths[end_idx][:, None] - starts) * curves
+
+        combos = [
+            (curve_types[a], curve_params[b], start_strengths[c], end_strengths[d])
+            for a, b, c, d in zip(type_idx, param_idx, start_idx, end_idx)
+        ]
+        return strengths, combos
+
+    def generate_contact_sheet(self, percents, strengths, combos, columns):
+        """
+        Contact sheet of every schedule, from PREVIEW_CACHE when the same sweep
+        was drawn before (keyed on the schedules, their labels and the layout).
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr(("contact_sheet", int(columns), strengths.shape, combos)).encode())
+        digest.update(np.ascontiguousarray(percents, dtype=np.float64))
+        digest.update(np.ascontiguousarray(strengths, dtype=np.float64))
+        try:
+            return PREVIEW_CACHE.get_or_render(
+                digest.digest(), lambda: self.draw_contact_sheet(percents, strengths, combos, columns)
+            )
+        except Exception as e:
+            print(f"[Curve Sweep] Contact sheet failed: {e}")
+            return PLACEHOLDER_IMAGE
+
+    def draw_contact_sheet(self, percents, strengths, combos, columns):
+        """
+        Draw every schedule as a tile of one shared axes. All curves go through a
+        single LineCollection, so render cost grows with the data, not the grid.
+        The sheet's size depends on the grid, so it gets its own Agg figure
+        (no pyplot state) and the pixels are read from its buffer.
+        """
+        count, n = strengths.shape
+        columns = max(1, min(columns, count))
+        rows = int(np.ceil(count / columns))
+
+        lo = min(0.0, float(strengths.min()))
+        hi = max(1.0, float(strengths.max()))
+        span = hi - lo
+        gap = 0.15
+
+        index = np.arange(count)
+        x_offset = (index % columns) * (1.0 + gap)
+        y_offset = -(index // columns) * span * (1.0 + gap)
+
+        # (count, n, 2) polylines in sheet coordinates
+        x = (percents - percents[0]) / max(percents[-1] - percents[0], 1e-9)
+        segments = np.empty((count, n, 2))
+        segments[:, :, 0] = x[None, :] + x_offset[:, None]
+        segments[:, :, 1] = (strengths - lo) + y_offset[:, None]
+
+        # Tile frames as a second collection
+        corners = np.array([[0, 0], [1, 0], [1, span], [0, span], [0, 0]], dtype=np.float64)
+        frames = corners[None, :, :] + np.stack([x_offset, y_offset], axis=1)[:, None, :]
+
+        fig_w = min(2.2 * columns + 0.5, 40)
+        fig_h = min(1.5 * rows + 0.5, 40)
+        fig = Figure(figsize=(fig_w, fig_h), dpi=100)
+        canvas = FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+
+        colors = matplotlib.colormaps['viridis'](np.linspace(0.0, 0.9, count))
+        ax.add_collection(LineCollection(frames, colors='#CCCCCC', linewidths=0.8))
+        ax.add_collection(LineCollection(segments, colors=colors, linewidths=1.6))
+
+        if count <= 64:
+            for i, (curve_type, param, start, end) in enumerate(combos):
+                ax.text(x_offset[i] + 0.03, y_offset[i] + span * 0.97,
+                        f"{i}: {curve_type} p={param:g}\n{start:g}→{end:g}",
+                        fontsize=6, va='top', ha='left', color='#333333')
+
+        ax.set_xlim(-gap / 2, columns * (1.0 + gap) - gap / 2)
+        ax.set_ylim(-(rows - 1) * span * (1.0 + gap) - gap * span / 2, span * (1.0 + gap / 2))
+        ax.set_axis_off()
+        ax.set_title(f'Curve Parameter Sweep ({count} schedules)', fontsize=12, fontweight='bold')
+
+        fig.tight_layout()
+        canvas.draw()
+
+        width, height = canvas.get_width_height()
+        rgba = np.frombuffer(canvas.buffer_rgba(), dtype=np.uint8).reshape(height, width, 4)
+        return torch.from_numpy(np.divide(rgba[:, :, :3], np.float32(255.0), dtype=np.float32))[None,]
+
+    def run_sweep(self, curve_types, curve_params, start_strengths, end_strengths,
+                  num_keyframes, start_percent, end_percent, tile_columns=0, show_graph=True):
+        """Main execution function"""
+        if not ACN_AVAILABLE:
+            raise Exception("Advanced ControlNet not found. Please install ComfyUI-Advanced-ControlNet")
+
+        curve_types = parse_curve_types(curve_types)
+        curve_params = np.maximum(parse_value_list(curve_params, "curve_param"), 1e-6)
+        start_strengths = parse_value_list(start_strengths, "start strength")
+        end_strengths = parse_value_list(end_strengths, "end strength")
+
+        # Counted from the list lengths; only the kept combinations are evaluated
+        total = len(curve_types) * len(curve_params) * len(start_strengths) * len(end_strengths)
+        if total > MAX_SWEEP_COMBINATIONS:
+            print(f"[Warning] Sweep has {total} combinations, keeping the first {MAX_SWEEP_COMBINATIONS}")
+        strengths, combos = self.evaluate_sweep(curve_types, curve_params, start_strengths,
+                                                end_strengths, num_keyframes, MAX_SWEEP_COMBINATIONS)
+
+        percents = np.linspace(start_percent, end_percent, num_keyframes)
+        guarantee_steps = np.zeros(num_keyframes, dtype=np.int32)
+        guarantee_steps[:1] = 1
+        groups = [ArrayKeyframeGroup(percents, row, guarantee_steps) for row in strengths]
+
+        columns = tile_columns if tile_columns > 0 else len(start_strengths) * len(end_strengths)
+        if preview_wanted(show_graph):
+            contact_sheet = self.generate_contact_sheet(percents, strengths, combos, columns)
+        else:
+            contact_sheet = PLACEHOLDER_IMAGE
+
+        info_lines = [
+            "Curve Parameter Sweep",
+            f"Schedules: {len(groups)} ({len(curve_types)} types × {len(curve_params)} params × "
+            f"{len(start_strengths)} starts × {len(end_strengths)} ends)",
+            f"Keyframes per schedule: {num_keyframes} | Range: {start_percent:.3f}-{end_percent:.3f}",
+            "",
+        ]
+        for i, (curve_type, param, start, end) in enumerate(combos):
+            info_lines.append(f"{i}: {curve_type} | param={param:g} | {start:g}→{end:g}")
+
+        return (groups, contact_sheet, "\n".join(info_lines))
+
+
+NODE_CLASS_MAPPINGS = {
+    "CurveParameterSweep": CurveParameterSweep
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "CurveParameterSweep": "Curve Parameter Sweep"
+}
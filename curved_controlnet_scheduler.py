@@ -1,11 +1,17 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import io
-from PIL import Image
 import torch
 
+try:
+    from .curve_cache import sample_curve
+    from .keyframe_utils import compress_plateaus
+    from .keyframe_group import ArrayKeyframeGroup, ChainedKeyframeGroup
+    from .preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+except Exception:
+    from curve_cache import sample_curve
+    from keyframe_utils import compress_plateaus
+    from keyframe_group import ArrayKeyframeGroup, ChainedKeyframeGroup
+    from preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+
 # Import Advanced ControlNet classes
 try:
     from .control import ControlWeights
@@ -108,6 +114,13 @@ class CurvedControlNetScheduler:
                     "default": True,
                     "tooltip": "Clamp strength values to valid range (0-10)"
                 }),
+                "plateau_epsilon": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "Drop keyframes whose strength differs from the previous kept keyframe by less than this (0 = keep all)"
+                }),
                 "print_keyframes": ("BOOLEAN", {
                     "default": False,
                     "tooltip": "Print generated keyframes for debugging"
@@ -124,12 +137,6 @@ class CurvedControlNetScheduler:
     FUNCTION = "generate_keyframes"
     CATEGORY = "conditioning/controlnet"
     
-    @classmethod
-    def IS_CHANGED(cls, **kwargs):
-        # Force re-execution if any parameter changes
-        # This ensures the graph updates properly
-        return float("nan")
-    
     def validate_inputs(self, start_percent, end_percent, num_keyframes, start_strength, end_strength):
         """Validate inputs before processing"""
         errors = []
@@ -155,7 +162,7 @@ class CurvedControlNetScheduler:
     def generate_keyframes(self, num_keyframes, start_percent, end_percent, 
                           start_strength, end_strength, curve_type, curve_param,
                           prev_timestep_kf=None, invert_curve=False, clamp_strengths=True,
-                          print_keyframes=False, show_graph=True):
+                          plateau_epsilon=0.0, print_keyframes=False, show_graph=True):
         """Generate curved timestep keyframes for ControlNet strength scheduling"""
         
         try:
@@ -187,67 +194,10 @@ class CurvedControlNetScheduler:
             start_strength = max(0, start_strength)
             end_strength = max(0, end_strength)
             
-            # Create normalized array from 0 to 1
-            t = np.linspace(0, 1, num_keyframes)
-            
             # Generate NORMALIZED curve (always 0 to 1, representing progress)
-            # The curve shape determines HOW we interpolate, not the direction
-            if curve_type == "linear":
-                curve = t
-            elif curve_type == "ease_in":
-                # Slow start, fast end
-                curve = t ** curve_param
-            elif curve_type == "ease_out":
-                # Fast start, slow end
-                curve = 1 - (1 - t) ** curve_param
-            elif curve_type == "ease_in_out":
-                # Slow start and end, fast middle
-                curve = np.where(t < 0.5, 
-                               2 ** (curve_param - 1) * t ** curve_param,
-                               1 - (-2 * t + 2) ** curve_param / 2)
-            elif curve_type == "sine_wave":
-                # Oscillating wave
-                curve = (np.sin(t * curve_param * 2 * np.pi) + 1) / 2
-            elif curve_type == "bell_curve":
-                # Peak in the middle
-                center = 0.5
-                width = 0.15 / max(curve_param, 0.1)  # Prevent division by tiny numbers
-                curve = np.exp(-((t - center) ** 2) / (2 * width ** 2))
-            elif curve_type == "reverse_bell":
-                # Valley in the middle (inverted bell)
-                center = 0.5
-                width = 0.15 / max(curve_param, 0.1)  # Prevent division by tiny numbers
-                bell = np.exp(-((t - center) ** 2) / (2 * width ** 2))
-                curve = 1 - bell
-            elif curve_type == "exponential":
-                # Exponential growth with numerical stability
-                safe_param = min(curve_param, 10.0)  # Clamp to prevent overflow
-                denom = np.exp(safe_param) - 1
-                if denom < 1e-10:  # Prevent division by very small numbers
-                    print("[Warning] Exponential curve parameter too small, using linear")
-                    curve = t
-                else:
-                    curve = (np.exp(safe_param * t) - 1) / denom
-            elif curve_type == "bounce":
-                # Bouncing abs sine wave
-                curve = np.abs(np.sin(t * curve_param * np.pi))
-            elif curve_type == "custom_bezier":
-                # Custom cubic bezier curve
-                p1 = curve_param / 10
-                p2 = 1 - curve_param / 10
-                curve = 3 * (1 - t) ** 2 * t * p1 + 3 * (1 - t) * t ** 2 * p2 + t ** 3
-            else:
-                print(f"[Warning] Unknown curve type '{curve_type}', using linear")
-                curve = t
-            
-            # Invert curve if requested (flips the shape)
-            if invert_curve:
-                curve = 1 - curve
-            
-            # Check for NaN values in curve
-            if np.any(np.isnan(curve)):
-                print("[ERROR] NaN values detected in curve calculation, using linear fallback")
-                curve = np.linspace(0, 1, num_keyframes)
+            # The curve shape determines HOW we interpolate, not the direction.
+            # Sampled curves are shared across nodes via the process-wide cache.
+            curve = sample_curve(curve_type, curve_param, num_keyframes, invert=invert_curve)
             
             # Now apply the curve to interpolate between start_strength and end_strength
             # curve goes from 0 to 1, so this correctly interpolates
@@ -260,32 +210,33 @@ class CurvedControlNetScheduler:
             # Map to percent range
             percents = np.linspace(start_percent, end_percent, num_keyframes)
             
-            # Create timestep keyframe group
+            # Collapse near-identical consecutive keyframes
+            percents, strengths, _ = compress_plateaus(percents, strengths, plateau_epsilon)
+            removed = num_keyframes - len(percents)
+            if removed and print_keyframes:
+                print(f"[Curved Timestep] Plateau compression removed {removed} of {num_keyframes} keyframes")
+            
+            # Create timestep keyframe group (array-backed; keyframe objects are built on first use)
+            guarantee_steps = np.zeros(len(percents), dtype=np.int32)
+            guarantee_steps[:1] = 1
+            new_keyframes = ArrayKeyframeGroup(percents, strengths, guarantee_steps,
+                                               with_default=prev_timestep_kf is None)
             if prev_timestep_kf is not None:
-                keyframe_group = prev_timestep_kf
+                # Chain onto the upstream group without modifying it
+                keyframe_group = ChainedKeyframeGroup(prev_timestep_kf, new_keyframes)
             else:
-                keyframe_group = TimestepKeyframeGroup()
+                keyframe_group = new_keyframes
             
-            # Add keyframes
-            for i, (percent, strength) in enumerate(zip(percents, strengths)):
-                guarantee_steps = 1 if i == 0 else 0
-                
-                keyframe = TimestepKeyframe(
-                    start_percent=float(percent),
-                    strength=float(strength),
-                    guarantee_steps=guarantee_steps
-                )
-                keyframe_group.add(keyframe)
-                
-                if print_keyframes:
+            if print_keyframes:
+                for i, (percent, strength) in enumerate(zip(percents, strengths)):
                     print(f"[Curved Timestep] Keyframe {i}: percent={percent:.4f}, strength={strength:.4f}")
             
             if print_keyframes:
-                print(f"[Curved Timestep] Total keyframes: {len(keyframe_group.keyframes)}")
+                print(f"[Curved Timestep] Total keyframes: {len(keyframe_group)}")
             
             # Generate graph if requested
-            graph_image = None
-            if show_graph:
+            graph_image = PLACEHOLDER_IMAGE
+            if preview_wanted(show_graph):
                 try:
                     graph_image = self.generate_graph(percents, strengths, curve_type, curve_param, 
                                                       start_percent, end_percent, start_strength, end_strength)
@@ -322,9 +273,8 @@ class CurvedControlNetScheduler:
 
     def generate_graph(self, percents, strengths, curve_type, curve_param, 
                       start_percent, end_percent, start_strength, end_strength):
-        """Generate a matplotlib graph showing the curve"""
+        """Render the curve preview graph"""
         
-        fig = None
         try:
             # Add validation
             if len(percents) == 0 or len(strengths) == 0:
@@ -343,47 +293,29 @@ class CurvedControlNetScheduler:
                 print("[Warning] Infinite values detected in curve data")
                 return self.create_dummy_image()
             
-            # Create figure
-            fig, ax = plt.subplots(figsize=(8, 6), dpi=100)
-            
-            # Plot the curve
-            ax.plot(percents * 100, strengths, 'b-', linewidth=2.5, label='Strength Curve')
-            ax.scatter(percents * 100, strengths, c='red', s=50, zorder=5, label='Keyframes')
-            
-            # Styling
-            ax.set_xlabel('Generation Progress (%)', fontsize=12, fontweight='bold')
-            ax.set_ylabel('ControlNet Strength', fontsize=12, fontweight='bold')
-            ax.set_title(f'Curve: {curve_type} (param={curve_param:.2f})', fontsize=14, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.legend(loc='best')
-            
-            # Set axis limits with some padding
-            ax.set_xlim(start_percent * 100 - 5, end_percent * 100 + 5)
+            # Axis limits with some padding
             y_min = min(0, min(strengths) - 0.1)
             y_max = max(strengths) + 0.1
-            ax.set_ylim(y_min, y_max)
+            spec = PlotSpec(
+                size=(800, 600),
+                title=f'Curve: {curve_type} (param={curve_param:.2f})',
+                xlabel='Generation Progress (%)',
+                ylabel='ControlNet Strength',
+                xlim=(start_percent * 100 - 5, end_percent * 100 + 5),
+                ylim=(y_min, y_max),
+            )
+            
+            # Plot the curve
+            spec.line(percents * 100, strengths, color='b', width=2.5, label='Strength Curve')
+            spec.scatter(percents * 100, strengths, color='red', s=50, label='Keyframes')
             
             # Add info text
             info_text = f'Range: {start_percent:.2f} → {end_percent:.2f}\n'
             info_text += f'Strength: {start_strength:.2f} → {end_strength:.2f}\n'
             info_text += f'Keyframes: {len(percents)}'
-            ax.text(0.02, 0.98, info_text, transform=ax.transAxes, 
-                   verticalalignment='top', bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5),
-                   fontsize=10)
+            spec.text(0.02, 0.98, info_text, size=10, va='top', box='wheat', box_alpha=0.5)
             
-            plt.tight_layout()
-            
-            # Convert to image
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight')
-            buf.seek(0)
-            img = Image.open(buf)
-            plt.close(fig)
-            fig = None  # Mark as closed
-            
-            # Convert to ComfyUI image format (tensor)
-            img_array = np.array(img).astype(np.float32) / 255.0
-            img_tensor = torch.from_numpy(img_array)[None,]
+            img_tensor = render_preview(spec)
             
             # Validate tensor shape
             if len(img_tensor.shape) != 4 or img_tensor.shape[0] != 1:
@@ -396,11 +328,6 @@ class CurvedControlNetScheduler:
             import traceback
             traceback.print_exc()
             return self.create_dummy_image()
-        finally:
-            # Ensure matplotlib resources are always cleaned up
-            if fig is not None:
-                plt.close(fig)
-            plt.close('all')
     
     
     def create_dummy_image(self):
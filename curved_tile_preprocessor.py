@@ -1,59 +1,28 @@
 # curved_tile_preprocessor.py
-# Self-contained curved blur batch preprocessor for ComfyUI
-# No relative imports; works inside any custom_nodes package.
+# Curved blur batch preprocessor for ComfyUI
+# Curve math comes from the sibling curve_kernels module (package or flat import).
 
-import io
 import math
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import torch
 import torch.nn.functional as F
 
-# Use non-interactive backend for headless environments
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-
-
-def _calc_curve(t, curve_type: str, curve_param: float):
-    # t in [0,1], vectorized (numpy)
-    p = max(float(curve_param), 1e-6)
-    if curve_type == "linear":
-        return t
-    if curve_type == "ease_in":
-        return t ** p
-    if curve_type == "ease_out":
-        return 1.0 - (1.0 - t) ** p
-    if curve_type == "ease_in_out":
-        left = (2.0 ** (p - 1.0)) * (t ** p)
-        right = 1.0 - ((-2.0 * t + 2.0) ** p) / 2.0
-        return np.where(t < 0.5, left, right)
-    if curve_type == "exponential":
-        p = min(max(p, 1e-6), 10.0)
-        denom = np.exp(p) - 1.0
-        return (np.exp(p * t) - 1.0) / (denom if denom > 1e-12 else 1.0)
-    # default
-    return t
+try:
+    from .curve_cache import sample_curve
+    from .preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+except Exception:
+    from curve_cache import sample_curve
+    from preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
 
 
 def _plot_curve(xs, ys, title):
     try:
-        fig, ax = plt.subplots(figsize=(9, 5), dpi=100)
-        ax.plot(xs * 100.0, ys, linewidth=2.5, label="Blur sigma")
-        ax.scatter(xs * 100.0, ys, s=36)
-        ax.set_xlabel("Generation Progress (%)")
-        ax.set_ylabel("Gaussian Sigma (s)")
-        ax.set_title(title)
-        ax.grid(True, alpha=0.3, linestyle="--")
-        ax.legend(loc="best")
-        fig.tight_layout()
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight")
-        plt.close(fig)
-        buf.seek(0)
-        im = Image.open(buf).convert("RGBA")
-        arr = np.array(im).astype(np.float32) / 255.0
-        return torch.from_numpy(arr)[None, :, :, :3]  # drop alpha, keep RGB
+        spec = PlotSpec(size=(900, 500), title=title, xlabel="Generation Progress (%)",
+                        ylabel="Gaussian Sigma (s)", title_size=12, label_size=10)
+        spec.line(xs * 100.0, ys, color="#1f77b4", width=2.5, label="Blur sigma")
+        spec.scatter(xs * 100.0, ys, color="#1f77b4", s=36)
+        return render_preview(spec)
     except Exception as e:
         print(f"⚠️  [Curved Blur] Graph generation failed: {e}")
         # Create a simple error message image
@@ -179,8 +148,8 @@ class Curved_Blur_Batch_Preprocessor:
             end_percent = min(1.0, start_percent + 1e-3)
 
         # Curve samples
-        t = np.linspace(0.0, 1.0, int(num_keyframes))
-        curve = np.clip(_calc_curve(t, curve_type, curve_param), 0.0, 1.0)
+        curve = sample_curve(curve_type, max(float(curve_param), 1e-6), int(num_keyframes))
+        curve = np.clip(curve, 0.0, 1.0)
         sigmas = start_sigma + (end_sigma - start_sigma) * curve
         sigmas = np.clip(sigmas, 0.0, 1e6)
 
@@ -193,8 +162,8 @@ class Curved_Blur_Batch_Preprocessor:
 
         # Graph
         xs = np.linspace(start_percent, end_percent, int(num_keyframes))
-        graph = _plot_curve(xs, sigmas, f"Blur Curve: {curve_type} (param={curve_param:.2f})") if show_graph \
-                else torch.zeros((1, 64, 64, 3), dtype=torch.float32)
+        graph = _plot_curve(xs, sigmas, f"Blur Curve: {curve_type} (param={curve_param:.2f})") \
+            if preview_wanted(show_graph) else PLACEHOLDER_IMAGE
 
         # Stats
         stats = (
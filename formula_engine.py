@@ -0,0 +1,228 @@
+# formula_engine.py
+# Safe evaluation of user-supplied curve formulas such as "sin(t*3)*exp(-t)".
+# Formulas are parsed once, checked against a whitelist of AST node types and
+# names, compiled to a code object and cached by formula text, so repeat runs
+# only pay the numpy cost.
+
+import ast
+from functools import lru_cache
+
+import numpy as np
+
+
+# Top-level names a formula may reference
+FORMULA_FUNCTIONS = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "exp": np.exp, "log": np.log, "log10": np.log10,
+    "sqrt": np.sqrt, "abs": np.abs,
+}
+FORMULA_CONSTANTS = {"pi": np.pi, "e": np.e}
+FORMULA_VARIABLES = ("t",)
+
+# Attributes reachable through the `np` name (e.g. formulas emitted by the
+# Interactive Curve Designer use np.interp)
+NUMPY_ATTRIBUTES = frozenset({
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2",
+    "sinh", "cosh", "tanh", "exp", "exp2", "expm1", "log", "log2", "log10", "log1p",
+    "sqrt", "cbrt", "square", "power", "abs", "absolute", "sign",
+    "floor", "ceil", "round", "mod", "fmod", "minimum", "maximum", "clip",
+    "where", "interp", "pi", "e",
+})
+
+ALLOWED_NODES = (
+    ast.Expression, ast.Load,
+    ast.BinOp, ast.UnaryOp, ast.Compare, ast.IfExp,
+    ast.Call, ast.keyword, ast.Name, ast.Attribute, ast.Constant,
+    ast.List, ast.Tuple,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+ALLOWED_NAMES = frozenset(FORMULA_FUNCTIONS) | frozenset(FORMULA_CONSTANTS) | frozenset(FORMULA_VARIABLES) | {"np"}
+
+# Shared, read-only globals for every evaluation
+_FORMULA_GLOBALS = {"__builtins__": {}, "np": np, **FORMULA_FUNCTIONS, **FORMULA_CONSTANTS}
+
+FORMULA_CACHE_SIZE = 512
+
+
+def validate_formula_tree(tree):
+    """Raise ValueError if the parsed formula uses anything outside the whitelist."""
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Formula contains forbidden syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in ALLOWED_NAMES:
+            raise ValueError(f"Formula uses unknown name '{node.id}'")
+        if isinstance(node, ast.Attribute):
+            if not (isinstance(node.value, ast.Name) and node.value.id == "np"):
+                raise ValueError("Formula attributes are only allowed on 'np'")
+            if node.attr not in NUMPY_ATTRIBUTES:
+                raise ValueError(f"Formula uses forbidden numpy attribute 'np.{node.attr}'")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Formula contains non-numeric constant {node.value!r}")
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def parse_formula(formula):
+    """Parse and validate a formula; the checked AST is cached by formula text."""
+    tree = ast.parse(formula.strip(), mode="eval")
+    validate_formula_tree(tree)
+    return tree
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def compile_formula(formula):
+    """Return the cached code object for a validated formula."""
+    return compile(parse_formula(formula), "<curve formula>", "eval")
+
+
+def evaluate_formula(formula, t):
+    """Evaluate a formula over `t` (numpy array). Raises ValueError on disallowed input."""
+    return eval(compile_formula(formula), _FORMULA_GLOBALS, {"t": t})
+
+
+# ---------------------------------------------------------------------------
+# Fused, chunked evaluation
+#
+# Plain eval runs one numpy operator at a time over the whole array, and each
+# operator allocates a full-size temporary. For large sample counts the
+# validated tree is instead lowered to a straight-line list of ufunc calls that
+# write into a few chunk-sized scratch registers, and the program is run chunk
+# by chunk so every intermediate stays in cache. Constant subtrees are folded at
+# lowering time. Formulas that use non-ufunc calls (np.interp, np.where, ...)
+# fall back to evaluating the compiled code chunk by chunk, which still bounds
+# temporaries to the chunk size since every whitelisted operation is elementwise.
+# ---------------------------------------------------------------------------
+
+DEFAULT_CHUNK_SIZE = 8192  # float64 samples per register: 64 KiB
+
+_BINARY_UFUNCS = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+    ast.Div: np.true_divide, ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.remainder, ast.Pow: np.power,
+}
+_COMPARE_UFUNCS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+    ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+
+# Operand kinds in a lowered program
+_T, _CONST, _REG = 0, 1, 2
+
+
+class _NotFusible(Exception):
+    pass
+
+
+class FusedFormula:
+    """A formula lowered to ufunc steps over reusable scratch registers."""
+
+    def __init__(self, formula):
+        self.steps = []
+        self._free = []
+        self.num_registers = 0
+        self.result = self._lower(parse_formula(formula).body)
+
+    def _alloc(self):
+        if self._free:
+            return self._free.pop()
+        self.num_registers += 1
+        return self.num_registers - 1
+
+    def _emit(self, ufunc, operands):
+        if all(kind == _CONST for kind, _ in operands):
+            # Fold like Python arithmetic would: 1/0 and 0/0 raise instead of producing
+            # inf/nan, while overflow and underflow give inf/0 as unfused numpy does
+            with np.errstate(divide="raise", invalid="raise", over="ignore", under="ignore"):
+                return (_CONST, float(ufunc(*(value for _, value in operands))))
+        regs = [value for kind, value in operands if kind == _REG]
+        dest = regs[0] if regs else self._alloc()
+        self._free.extend(regs[1:])
+        self.steps.append((ufunc, tuple(operands), dest))
+        return (_REG, dest)
+
+    def _resolve_function(self, func):
+        if isinstance(func, ast.Name) and func.id in FORMULA_FUNCTIONS:
+            ufunc = FORMULA_FUNCTIONS[func.id]
+        elif isinstance(func, ast.Attribute):
+            ufunc = getattr(np, func.attr)
+        else:
+            raise _NotFusible
+        if not isinstance(ufunc, np.ufunc):
+            raise _NotFusible
+        return ufunc
+
+    def _lower(self, node):
+        if isinstance(node, ast.Constant):
+            return (_CONST, float(node.value))
+        if isinstance(node, ast.Name):
+            if node.id == "t":
+                return (_T, None)
+            if node.id in FORMULA_CONSTANTS:
+                return (_CONST, float(FORMULA_CONSTANTS[node.id]))
+            raise _NotFusible
+        if isinstance(node, ast.Attribute) and node.attr in FORMULA_CONSTANTS:
+            return (_CONST, float(FORMULA_CONSTANTS[node.attr]))
+        if isinstance(node, ast.BinOp):
+            return self._emit(_BINARY_UFUNCS[type(node.op)],
+                              [self._lower(node.left), self._lower(node.right)])
+        if isinstance(node, ast.UnaryOp):
+            operand = self._lower(node.operand)
+            return operand if isinstance(node.op, ast.UAdd) else self._emit(np.negative, [operand])
+        if isinstance(node, ast.Compare) and len(node.ops) == 1:
+            return self._emit(_COMPARE_UFUNCS[type(node.ops[0])],
+                              [self._lower(node.left), self._lower(node.comparators[0])])
+        if isinstance(node, ast.Call) and not node.keywords:
+            ufunc = self._resolve_function(node.func)
+            if ufunc.nin != len(node.args):
+                raise _NotFusible
+            return self._emit(ufunc, [self._lower(arg) for arg in node.args])
+        raise _NotFusible
+
+    def __call__(self, t, out, chunk_size=DEFAULT_CHUNK_SIZE):
+        kind, value = self.result
+        if kind != _REG:
+            np.copyto(out, t if kind == _T else value)
+            return out
+
+        scratch = np.empty((self.num_registers, min(chunk_size, len(t))), dtype=np.float64)
+        last = len(self.steps) - 1
+        for start in range(0, len(t), chunk_size):
+            stop = min(start + chunk_size, len(t))
+            t_chunk = t[start:stop]
+            regs = scratch[:, :stop - start]
+            for index, (ufunc, operands, dest) in enumerate(self.steps):
+                args = [t_chunk if k == _T else v if k == _CONST else regs[v] for k, v in operands]
+                ufunc(*args, out=out[start:stop] if index == last else regs[dest])
+        return out
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def compile_fused_formula(formula):
+    """Return the cached FusedFormula for a formula, or None if it needs the eval fallback."""
+    try:
+        return FusedFormula(formula)
+    except _NotFusible:
+        return None
+
+
+def evaluate_formula_fused(formula, t, out=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Evaluate a formula over a 1-D `t` in cache-sized chunks into a single output
+    buffer (allocated as float64 when `out` is None). Same whitelist as
+    evaluate_formula; raises ValueError on disallowed input.
+    """
+    t = np.asarray(t, dtype=np.float64).reshape(-1)
+    if out is None:
+        out = np.empty_like(t)
+
+    fused = compile_fused_formula(formula)
+    if fused is not None:
+        return fused(t, out, chunk_size)
+
+    code = compile_formula(formula)
+    for start in range(0, len(t), chunk_size):
+        stop = min(start + chunk_size, len(t))
+        out[start:stop] = eval(code, _FORMULA_GLOBALS, {"t": t[start:stop]})
+    return out
@@ -1,11 +1,11 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import torch
-import io
 import json
-from PIL import Image
+
+try:
+    from .preview_render import PlotSpec, render_preview, render_message
+except Exception:
+    from preview_render import PlotSpec, render_preview, render_message
 
 class InteractiveCurveDesigner:
     """
@@ -224,87 +224,45 @@ class InteractiveCurveDesigner:
     def generate_preview(self, t, curve, points_x, points_y, method):
         """Generate preview graph"""
         try:
-            fig, ax = plt.subplots(figsize=(10, 6), dpi=100)
+            y_min = min(0, np.min(curve), np.min(points_y)) - 0.15
+            y_max = max(1, np.max(curve), np.max(points_y)) + 0.15
+            spec = PlotSpec(
+                size=(1000, 600),
+                title=f'Interactive Curve Designer - {method.replace("_", " ").title()}\n'
+                      f'{len(points_x)} Control Points',
+                xlabel='Progress (%)',
+                ylabel='Strength',
+                xlim=(-5, 105),
+                ylim=(y_min, y_max),
+                label_size=13,
+                legend_size=11,
+                axes_facecolor='#f8f8f8',
+            )
             
             # Plot curve
-            ax.plot(t * 100, curve, 'b-', linewidth=3, label='Interpolated Curve', alpha=0.9)
+            spec.line(t * 100, curve, color='b', width=3, label='Interpolated Curve', alpha=0.9)
             
             # Plot control points
-            ax.scatter(points_x * 100, points_y, c='red', s=150, zorder=10, 
-                      label='Control Points', edgecolors='darkred', linewidth=2.5)
+            spec.scatter(points_x * 100, points_y, color='red', s=150, 
+                         label='Control Points', edgecolor='darkred', edgewidth=2.5)
             
             # Connect points with thin lines
-            ax.plot(points_x * 100, points_y, 'r--', linewidth=1, alpha=0.3)
+            spec.line(points_x * 100, points_y, color='r', width=1, style='--', alpha=0.3)
             
             # Point labels
             for i, (x, y) in enumerate(zip(points_x, points_y), 1):
-                ax.annotate(f'P{i}\n({x:.2f},{y:.2f})', 
-                           (x * 100, y), 
-                           xytext=(0, 15), 
-                           textcoords='offset points',
-                           ha='center',
-                           fontsize=9,
-                           bbox=dict(boxstyle='round,pad=0.5', 
-                                   facecolor='yellow', 
-                                   alpha=0.8,
-                                   edgecolor='orange'))
-            
-            # Styling
-            ax.set_xlabel('Progress (%)', fontsize=13, fontweight='bold')
-            ax.set_ylabel('Strength', fontsize=13, fontweight='bold')
-            ax.set_title(f'Interactive Curve Designer - {method.replace("_", " ").title()}\n'
-                        f'{len(points_x)} Control Points',
-                        fontsize=14, fontweight='bold', pad=15)
-            
-            ax.grid(True, alpha=0.3, linestyle='--', linewidth=0.8)
-            ax.legend(loc='best', fontsize=11, framealpha=0.9)
-            
-            ax.set_xlim(-5, 105)
-            y_min = min(0, np.min(curve), np.min(points_y)) - 0.15
-            y_max = max(1, np.max(curve), np.max(points_y)) + 0.15
-            ax.set_ylim(y_min, y_max)
-            
-            # Background
-            ax.set_facecolor('#f8f8f8')
-            fig.patch.set_facecolor('white')
-            
-            plt.tight_layout()
-            
-            # Convert to tensor
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight', facecolor='white', dpi=100)
-            buf.seek(0)
-            img = Image.open(buf)
-            plt.close(fig)
+                spec.annotate(x * 100, y, f'P{i}\n({x:.2f},{y:.2f})', offset=15, size=9,
+                              facecolor='yellow', edgecolor='orange')
             
-            img_array = np.array(img).astype(np.float32) / 255.0
-            img_tensor = torch.from_numpy(img_array)[None,]
-            
-            return img_tensor
+            return render_preview(spec)
             
         except Exception as e:
             print(f"[Interactive Curve Designer] Preview error: {e}")
             return self.create_error_image(str(e))
-        finally:
-            plt.close('all')
     
     def create_error_image(self, message):
         """Create error image"""
-        fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
-        ax.text(0.5, 0.5, f'Error:\n{message}', 
-               ha='center', va='center',
-               fontsize=14, color='red',
-               bbox=dict(boxstyle='round,pad=1', facecolor='wheat', alpha=0.8))
-        ax.axis('off')
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        img = Image.open(buf)
-        plt.close(fig)
-        
-        img_array = np.array(img).astype(np.float32) / 255.0
-        return torch.from_numpy(img_array)[None,]
+        return render_message(f'Error:\n{message}', size=(800, 400), color='red', box='wheat')
     
     def generate_description(self, points, formula, method, normalized):
         """Generate description"""
@@ -0,0 +1,321 @@
+# keyframe_group.py
+# Array-backed drop-in for Advanced ControlNet's TimestepKeyframeGroup.
+# A schedule is stored as contiguous percent / strength / guarantee_steps
+# arrays; TimestepKeyframe objects are only built the first time something
+# (normally Advanced ControlNet itself) reads `.keyframes`.
+
+import copy
+
+import numpy as np
+
+# Import Advanced ControlNet classes
+try:
+    from .control import ControlWeights
+    from .utils import TimestepKeyframe
+    ACN_AVAILABLE = True
+except Exception:
+    try:
+        import sys
+        import os
+        comfy_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        acn_path = os.path.join(comfy_path, "custom_nodes", "ComfyUI-Advanced-ControlNet")
+        if os.path.exists(acn_path):
+            sys.path.insert(0, acn_path)
+            from adv_control.control import ControlWeights
+            from adv_control.utils import TimestepKeyframe
+            ACN_AVAILABLE = True
+        else:
+            ACN_AVAILABLE = False
+    except Exception as e:
+        print(f"Failed to import Advanced ControlNet: {e}")
+        ACN_AVAILABLE = False
+
+
+# ---------------------------------------------------------------------------
+# Batch image indices
+#
+# Where a keyframe's batch image index lives depends on the installed Advanced
+# ControlNet version. The strategies below are tried in order on the first
+# keyframe of a class; the one that works is cached for that class and then
+# applied to every keyframe in a single pass without exception handling.
+# ---------------------------------------------------------------------------
+
+def _set_attribute(name):
+    def apply(keyframes, indices):
+        for keyframe, index in zip(keyframes, indices):
+            setattr(keyframe, name, index)
+    return apply
+
+
+def _set_control_weights_index(keyframes, indices):
+    for keyframe, index in zip(keyframes, indices):
+        if getattr(keyframe, "control_weights", None) is None:
+            keyframe.control_weights = ControlWeights()
+        keyframe.control_weights.latent_keyframe_index = index
+
+
+IMAGE_INDEX_STRATEGIES = (
+    ("latent_keyframe", _set_attribute("latent_keyframe")),
+    ("latent_keyframe_index", _set_attribute("latent_keyframe_index")),
+    ("batch_index", _set_attribute("batch_index")),
+    ("control_weights", _set_control_weights_index),
+)
+
+_image_index_strategies = {}
+
+
+def image_index_strategy(keyframe, index):
+    """Return the cached (name, apply) strategy for type(keyframe), probing with `index` on first use."""
+    cls = type(keyframe)
+    if cls not in _image_index_strategies:
+        strategy = None
+        for name, apply in IMAGE_INDEX_STRATEGIES:
+            try:
+                apply((keyframe,), (index,))
+                strategy = (name, apply)
+                break
+            except Exception:
+                continue
+        if strategy is None:
+            print(f"[Warning] Could not attach batch image indices to {cls.__name__}")
+        _image_index_strategies[cls] = strategy
+    return _image_index_strategies[cls]
+
+
+def assign_image_indices(keyframes, indices):
+    """
+    Attach batch image indices to keyframes in one pass. Returns the name of
+    the strategy used, or None if the keyframe class accepts none of them.
+    """
+    keyframes = list(keyframes)
+    indices = [int(index) for index in indices]
+    if not keyframes:
+        return None
+    strategy = image_index_strategy(keyframes[0], indices[0])
+    if strategy is None:
+        return None
+    name, apply = strategy
+    apply(keyframes, indices)
+    return name
+
+
+def _read_image_index(keyframe):
+    for name, _ in IMAGE_INDEX_STRATEGIES[:-1]:
+        index = getattr(keyframe, name, None)
+        if isinstance(index, (int, np.integer)):
+            return int(index)
+    index = getattr(getattr(keyframe, "control_weights", None), "latent_keyframe_index", None)
+    return int(index) if isinstance(index, (int, np.integer)) else -1
+
+
+def read_image_indices(keyframes):
+    """Batch image index of every keyframe (-1 = none), or None if no keyframe has one."""
+    indices = np.fromiter((_read_image_index(kf) for kf in keyframes), np.int64)
+    return indices if np.any(indices >= 0) else None
+
+
+class ArrayKeyframeGroup:
+    """
+    TimestepKeyframeGroup-compatible schedule backed by numpy arrays.
+
+    Like TimestepKeyframeGroup it starts with Advanced ControlNet's default
+    keyframe (disable with with_default=False) and keeps keyframes sorted by
+    start_percent, with ties kept in insertion order. `strength_at` answers
+    strength lookups by binary search without building any keyframe objects.
+
+    `image_indices` optionally gives each keyframe a batch image index
+    (negative = none); they are attached when the keyframes are built.
+    """
+
+    def __init__(self, percents=(), strengths=(), guarantee_steps=None, with_default=True,
+                 image_indices=None):
+        percents = np.asarray(percents, dtype=np.float64).reshape(-1)
+        strengths = np.asarray(strengths, dtype=np.float64).reshape(-1)
+        if len(percents) != len(strengths):
+            raise ValueError(f"Got {len(percents)} percents but {len(strengths)} strengths")
+        if guarantee_steps is None:
+            # TimestepKeyframe's own default
+            guarantee_steps = np.ones(len(percents), dtype=np.int32)
+        guarantee_steps = np.broadcast_to(np.asarray(guarantee_steps, dtype=np.int32), percents.shape)
+        if image_indices is not None:
+            image_indices = np.broadcast_to(np.asarray(image_indices, dtype=np.int64), percents.shape)
+
+        if with_default:
+            percents = np.concatenate(([0.0], percents))
+            strengths = np.concatenate(([1.0], strengths))
+            guarantee_steps = np.concatenate(([0], guarantee_steps))
+            if image_indices is not None:
+                image_indices = np.concatenate(([-1], image_indices))
+
+        order = np.argsort(percents, kind="stable")
+        self.percents = percents[order]
+        self.strengths = strengths[order]
+        self.guarantee_steps = np.ascontiguousarray(guarantee_steps[order])
+        self.image_indices = image_indices[order] if image_indices is not None else None
+        self._default_index = int(np.flatnonzero(order == 0)[0]) if with_default else None
+        self._keyframes = None
+
+    @classmethod
+    def from_arrays(cls, percents, strengths, guarantee_steps, image_indices=None):
+        """
+        Wrap arrays that are already sorted by percent as-is: no copy and no
+        default keyframe is added, so read-only memory-mapped arrays stay mapped.
+        """
+        group = cls.__new__(cls)
+        group.percents = percents
+        group.strengths = strengths
+        group.guarantee_steps = guarantee_steps
+        group.image_indices = image_indices
+        group._default_index = None
+        group._keyframes = None
+        return group
+
+    # ---- lazy keyframe objects -------------------------------------------
+
+    @property
+    def keyframes(self):
+        if self._keyframes is None:
+            self._keyframes = self._build_keyframes()
+        return self._keyframes
+
+    @keyframes.setter
+    def keyframes(self, keyframes):
+        self._keyframes = list(keyframes)
+        self._default_index = None
+        self.image_indices = None  # now carried by the keyframe objects
+        self._sync_arrays()
+
+    @property
+    def is_materialized(self):
+        return self._keyframes is not None
+
+    def _build_keyframes(self):
+        keyframes = [
+            TimestepKeyframe(start_percent=percent, strength=strength, guarantee_steps=guarantee)
+            for percent, strength, guarantee in zip(
+                self.percents.tolist(), self.strengths.tolist(), self.guarantee_steps.tolist()
+            )
+        ]
+        if self._default_index is not None:
+            keyframes[self._default_index] = TimestepKeyframe.default()
+        if self.image_indices is not None:
+            rows = np.flatnonzero(self.image_indices >= 0)
+            assign_image_indices([keyframes[row] for row in rows], self.image_indices[rows])
+        return keyframes
+
+    def _sync_arrays(self):
+        """Refresh the arrays from materialized keyframes after an object-level edit."""
+        keyframes = self._keyframes
+        self.percents = np.fromiter((kf.start_percent for kf in keyframes), np.float64, len(keyframes))
+        self.strengths = np.fromiter((kf.strength for kf in keyframes), np.float64, len(keyframes))
+        self.guarantee_steps = np.fromiter(
+            (getattr(kf, "guarantee_steps", 1) for kf in keyframes), np.int32, len(keyframes)
+        )
+
+    # ---- lookups -----------------------------------------------------------
+
+    def strength_at(self, percent):
+        """
+        Strength Advanced ControlNet holds at `percent` (scalar or array):
+        the last keyframe whose start_percent <= percent, by binary search.
+        """
+        index = np.searchsorted(self.percents, percent, side="right") - 1
+        strengths = self.strengths[np.clip(index, 0, max(len(self.strengths) - 1, 0))]
+        return float(strengths) if np.ndim(strengths) == 0 else strengths
+
+    # ---- TimestepKeyframeGroup API ------------------------------------------
+
+    def add(self, keyframe):
+        """Insert a keyframe object after any existing keyframes at the same percent."""
+        keyframes = self.keyframes
+        position = int(np.searchsorted(self.percents, keyframe.start_percent, side="right"))
+        keyframes.insert(position, keyframe)
+        self.percents = np.insert(self.percents, position, keyframe.start_percent)
+        self.strengths = np.insert(self.strengths, position, keyframe.strength)
+        self.guarantee_steps = np.insert(self.guarantee_steps, position, getattr(keyframe, "guarantee_steps", 1))
+        if self.image_indices is not None:
+            self.image_indices = np.insert(self.image_indices, position, -1)
+
+    def get_index(self, index):
+        try:
+            return self.keyframes[index]
+        except IndexError:
+            return None
+
+    def has_index(self, index):
+        return 0 <= index < len(self.percents)
+
+    def __getitem__(self, index):
+        return self.keyframes[index]
+
+    def __iter__(self):
+        return iter(self.keyframes)
+
+    def __len__(self):
+        return len(self.percents)
+
+    def is_empty(self):
+        return len(self.percents) == 0
+
+    def clone(self):
+        """Shallow copy: arrays are shared (never written in place), keyframe objects are reused."""
+        cloned = copy.copy(self)
+        cloned._keyframes = list(self._keyframes) if self._keyframes is not None else None
+        return cloned
+
+    def initialize_timesteps(self, model):
+        for keyframe in self.keyframes:
+            keyframe.start_t = model.model_sampling.percent_to_sigma(keyframe.start_percent)
+
+    def __repr__(self):
+        return f"ArrayKeyframeGroup({len(self)} keyframes, materialized={self.is_materialized})"
+
+
+def _group_arrays(group):
+    """(percents, strengths, guarantee_steps) of any TimestepKeyframeGroup-like object."""
+    if isinstance(group, ArrayKeyframeGroup):
+        return group.percents, group.strengths, group.guarantee_steps
+    keyframes = list(getattr(group, "keyframes", group))
+    count = len(keyframes)
+    percents = np.fromiter((kf.start_percent for kf in keyframes), np.float64, count)
+    strengths = np.fromiter(
+        (1.0 if getattr(kf, "strength", None) is None else kf.strength for kf in keyframes), np.float64, count
+    )
+    guarantee_steps = np.fromiter((getattr(kf, "guarantee_steps", 1) for kf in keyframes), np.int32, count)
+    return percents, strengths, guarantee_steps
+
+
+class ChainedKeyframeGroup(ArrayKeyframeGroup):
+    """
+    Copy-on-write chain of an upstream group and this node's own keyframes.
+
+    `base` (any TimestepKeyframeGroup-like object, e.g. a cached
+    prev_timestep_kf) is never modified: its keyframe objects are shared with
+    the chain rather than copied, and adding to the chain only touches the
+    chain. `own` is an ArrayKeyframeGroup built with with_default=False; its
+    keyframes sort after base keyframes at the same percent, as if they had
+    been added to base one by one.
+    """
+
+    def __init__(self, base, own):
+        self.base = base
+        self.own = own
+        base_arrays = _group_arrays(base)
+        self._base_count = len(base_arrays[0])
+
+        percents = np.concatenate((base_arrays[0], own.percents))
+        self._order = np.argsort(percents, kind="stable")
+        self.percents = percents[self._order]
+        self.strengths = np.concatenate((base_arrays[1], own.strengths))[self._order]
+        self.guarantee_steps = np.concatenate((base_arrays[2], own.guarantee_steps))[self._order]
+        self.image_indices = None  # carried by base and own
+        self._default_index = None
+        self._keyframes = None
+
+    def _build_keyframes(self):
+        combined = list(getattr(self.base, "keyframes", self.base)) + list(self.own.keyframes)
+        return [combined[index] for index in self._order.tolist()]
+
+    def __repr__(self):
+        return (f"ChainedKeyframeGroup({self._base_count} upstream + {len(self.own)} own keyframes, "
+                f"materialized={self.is_materialized})")
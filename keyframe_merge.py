@@ -0,0 +1,213 @@
+# keyframe_merge.py
+# Merge several keyframe groups into one schedule sorted by start_percent.
+# Chaining schedulers through prev_timestep_kf stacks every upstream keyframe
+# onto the next node; this node merges N finished groups in one pass instead.
+
+import numpy as np
+
+try:
+    from .keyframe_group import ArrayKeyframeGroup, ChainedKeyframeGroup, _group_arrays
+except Exception:
+    from keyframe_group import ArrayKeyframeGroup, ChainedKeyframeGroup, _group_arrays
+
+
+MERGE_RULES = ("max", "sum", "last_wins")
+MAX_MERGE_INPUTS = 8
+
+
+def _default_row(group):
+    """
+    Row of the default keyframe `group` was created with, or None. Only that
+    keyframe counts as the default: a keyframe the user added with the same
+    values (0.0, strength 1.0, guarantee 0) is a real keyframe.
+    """
+    if isinstance(group, ChainedKeyframeGroup):
+        row = _default_row(group.base)
+        return None if row is None else int(np.flatnonzero(group._order == row)[0])
+    if isinstance(group, ArrayKeyframeGroup):
+        return group._default_index
+    # TimestepKeyframeGroup starts with its default and sorts stably, so it stays first
+    keyframes = getattr(group, "keyframes", group)
+    if len(keyframes) == 0:
+        return None
+    first = keyframes[0]
+    strength = getattr(first, "strength", None)
+    if (first.start_percent == 0.0 and (strength is None or strength == 1.0)
+            and getattr(first, "guarantee_steps", 1) == 0):
+        return 0
+    return None
+
+
+def _without_default(group):
+    """(percents, strengths, guarantee_steps, rows) of `group` minus its default keyframe; rows index the group."""
+    percents, strengths, guarantee_steps = _group_arrays(group)
+    rows = np.arange(len(percents))
+    default = _default_row(group)
+    if default is not None:
+        rows = np.delete(rows, default)
+        percents, strengths, guarantee_steps = percents[rows], strengths[rows], guarantee_steps[rows]
+    return percents, strengths, guarantee_steps, rows
+
+
+def merge_keyframe_arrays(groups, rule="max", tolerance=1e-6):
+    """
+    K-way merge of (percents, strengths, guarantee_steps) tuples on percent.
+
+    Each input is sorted (stably) if it is not already; the sorted runs are then
+    concatenated and merged with a stable argsort, which numpy runs as timsort
+    on float keys - it detects the k presorted runs and merges them in
+    O(n log k). Keyframes whose percents are within `tolerance` of the previous
+    one are collapsed with `rule`: "max" and "sum" combine strengths,
+    "last_wins" keeps the strength of the keyframe that comes last in input
+    order (later input, then later row), whatever its percent inside the
+    tolerance. Collapsed keyframes keep the largest guarantee_steps of the
+    group, so no guaranteed step is lost.
+
+    Returns (percents, strengths, guarantee_steps, sources): `sources` gives,
+    per merged keyframe, its row in the inputs concatenated in order, or -1
+    if it was collapsed from several keyframes.
+    """
+    if rule not in MERGE_RULES:
+        raise ValueError(f"Unknown conflict rule '{rule}' (expected one of {MERGE_RULES})")
+
+    runs = []
+    offset = 0
+    for percents, strengths, guarantee_steps in groups:
+        percents = np.asarray(percents, dtype=np.float64)
+        strengths = np.asarray(strengths, dtype=np.float64)
+        guarantee_steps = np.asarray(guarantee_steps, dtype=np.int32)
+        sources = np.arange(offset, offset + len(percents))
+        offset += len(percents)
+        if len(percents) > 1 and np.any(percents[1:] < percents[:-1]):
+            order = np.argsort(percents, kind="stable")
+            percents, strengths, guarantee_steps = percents[order], strengths[order], guarantee_steps[order]
+            sources = sources[order]
+        runs.append((percents, strengths, guarantee_steps, sources))
+
+    if not runs:
+        empty = np.empty(0)
+        return empty, empty.copy(), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.intp)
+
+    percents = np.concatenate([run[0] for run in runs])
+    strengths = np.concatenate([run[1] for run in runs])
+    guarantee_steps = np.concatenate([run[2] for run in runs])
+    sources = np.concatenate([run[3] for run in runs])
+    if len(percents) == 0:
+        return percents, strengths, guarantee_steps, sources
+
+    order = np.argsort(percents, kind="stable")
+    percents, strengths, guarantee_steps, sources = (
+        percents[order], strengths[order], guarantee_steps[order], sources[order]
+    )
+
+    # Start of every conflict group
+    starts = np.flatnonzero(np.concatenate(([True], np.diff(percents) > tolerance)))
+    if len(starts) == len(percents):
+        return percents, strengths, guarantee_steps, sources
+
+    if rule == "max":
+        merged_strengths = np.maximum.reduceat(strengths, starts)
+    elif rule == "sum":
+        merged_strengths = np.add.reduceat(strengths, starts)
+    else:
+        # Within the tolerance the percent order can differ from the input order
+        by_source = np.empty_like(strengths)
+        by_source[sources] = strengths
+        merged_strengths = by_source[np.maximum.reduceat(sources, starts)]
+    collapsed = np.diff(np.append(starts, len(percents))) > 1
+    merged_sources = np.where(collapsed, -1, sources[starts])
+    return percents[starts], merged_strengths, np.maximum.reduceat(guarantee_steps, starts), merged_sources
+
+
+class MergedKeyframeGroup(ArrayKeyframeGroup):
+    """
+    Merge result that reuses the input keyframe objects: a keyframe that was
+    not collapsed with another one is the original object, with its control
+    weights, latent keyframes and batch image index. Collapsed keyframes and
+    the default are built new. Nothing is built until `.keyframes` is read.
+    """
+
+    def __init__(self, percents, strengths, guarantee_steps, inputs, sources):
+        super().__init__(percents, strengths, guarantee_steps)
+        # sources[i] = (index into inputs, row in that input) of keyframe i, (-1, -1) if none
+        sources = np.asarray(sources, dtype=np.intp).reshape(-1, 2)
+        self._inputs = list(inputs)
+        self._sources = np.insert(sources, self._default_index, -1, axis=0)
+
+    def _build_keyframes(self):
+        keyframes = super()._build_keyframes()
+        for position in np.flatnonzero(self._sources[:, 0] >= 0).tolist():
+            group, row = self._sources[position].tolist()
+            keyframes[position] = self._inputs[group].keyframes[row]
+        return keyframes
+
+
+class MergeKeyframeGroups:
+    """
+    Merge up to eight TIMESTEP_KEYFRAME groups into one sorted group.
+    Each input's default keyframe is dropped before merging and a single
+    default is added back, so merging never stacks duplicate defaults.
+    Keyframes that are not collapsed keep their original objects.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        optional = {
+            f"keyframes_{i}": ("TIMESTEP_KEYFRAME",) for i in range(3, MAX_MERGE_INPUTS + 1)
+        }
+        return {
+            "required": {
+                "keyframes_1": ("TIMESTEP_KEYFRAME",),
+                "keyframes_2": ("TIMESTEP_KEYFRAME",),
+                "conflict_rule": (list(MERGE_RULES), {
+                    "default": "max",
+                    "tooltip": "How keyframes at the same start_percent combine: max strength, summed strength, or the last connected input wins"
+                }),
+                "merge_tolerance": ("FLOAT", {
+                    "default": 0.000001,
+                    "min": 0.0,
+                    "max": 0.1,
+                    "step": 0.000001,
+                    "tooltip": "Keyframes closer than this (in percent) count as the same keyframe"
+                }),
+            },
+            "optional": optional,
+        }
+
+    RETURN_TYPES = ("TIMESTEP_KEYFRAME", "STRING",)
+    RETURN_NAMES = ("TIMESTEP_KF", "merge_info",)
+    FUNCTION = "merge"
+    CATEGORY = "conditioning/controlnet"
+
+    def merge(self, keyframes_1, keyframes_2, conflict_rule="max", merge_tolerance=1e-6, **kwargs):
+        inputs = [keyframes_1, keyframes_2] + [
+            kwargs.get(f"keyframes_{i}") for i in range(3, MAX_MERGE_INPUTS + 1)
+        ]
+
+        inputs = [group for group in inputs if group is not None]
+        groups = []
+        origins = []
+        for index, group in enumerate(inputs):
+            percents, strengths, guarantee_steps, rows = _without_default(group)
+            groups.append((percents, strengths, guarantee_steps))
+            origins.append(np.column_stack((np.full(len(rows), index), rows)))
+        total = sum(len(group[0]) for group in groups)
+
+        percents, strengths, guarantee_steps, sources = merge_keyframe_arrays(groups, conflict_rule, merge_tolerance)
+        origins = np.concatenate(origins + [np.full((1, 2), -1)])  # row -1 = no source
+        keyframe_group = MergedKeyframeGroup(percents, strengths, guarantee_steps, inputs, origins[sources])
+
+        info = (f"Merged {len(groups)} groups: {total} keyframes -> {len(percents)} "
+                f"({total - len(percents)} collapsed with '{conflict_rule}')")
+        if len(percents):
+            info += f"\nRange: {percents[0]:.3f}-{percents[-1]:.3f} | Strength: {strengths.min():.3f}-{strengths.max():.3f}"
+        return (keyframe_group, info)
+
+
+NODE_CLASS_MAPPINGS = {
+    "MergeKeyframeGroups": MergeKeyframeGroups
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "MergeKeyframeGroups": "Merge Keyframe Groups"
+}
@@ -0,0 +1,131 @@
+# keyframe_resample.py
+# Change the resolution of an existing keyframe group: the keyframes are read
+# into arrays and re-sampled onto evenly spaced percents in one numpy pass.
+
+import numpy as np
+
+try:
+    from .keyframe_group import ArrayKeyframeGroup
+    from .keyframe_merge import _without_default
+    from .keyframe_utils import pchip_interpolate
+except Exception:
+    from keyframe_group import ArrayKeyframeGroup
+    from keyframe_merge import _without_default
+    from keyframe_utils import pchip_interpolate
+
+
+RESAMPLE_METHODS = ("linear", "pchip", "nearest")
+
+
+def resample_schedule(percents, strengths, num_keyframes, method="linear", start_percent=None, end_percent=None):
+    """
+    Resample a schedule onto `num_keyframes` evenly spaced percents between
+    start_percent and end_percent (default: the schedule's own range).
+    Keyframes sharing a percent keep the last one, the one Advanced ControlNet
+    ends up holding. Returns (new_percents, new_strengths).
+    """
+    if method not in RESAMPLE_METHODS:
+        raise ValueError(f"Unknown resample method '{method}' (expected one of {RESAMPLE_METHODS})")
+    percents = np.asarray(percents, dtype=np.float64)
+    strengths = np.asarray(strengths, dtype=np.float64)
+    if len(percents) == 0:
+        raise ValueError("Cannot resample an empty keyframe group")
+
+    order = np.argsort(percents, kind="stable")
+    percents, strengths = percents[order], strengths[order]
+    # Last keyframe of every run of equal percents
+    last = np.append(percents[1:] != percents[:-1], True)
+    percents, strengths = percents[last], strengths[last]
+
+    start = percents[0] if start_percent is None else start_percent
+    end = percents[-1] if end_percent is None else end_percent
+    targets = np.linspace(start, end, num_keyframes)
+
+    if len(percents) == 1:
+        return targets, np.full(num_keyframes, strengths[0])
+    if method == "linear":
+        return targets, np.interp(targets, percents, strengths)
+    if method == "pchip":
+        return targets, pchip_interpolate(percents, strengths, targets)
+
+    # nearest: compare against the midpoints between source keyframes
+    index = np.searchsorted((percents[1:] + percents[:-1]) * 0.5, targets, side="right")
+    return targets, strengths[index]
+
+
+class ResampleKeyframeGroup:
+    """
+    Resample any TIMESTEP_KEYFRAME (a scheduler's group, a loaded schedule or
+    the Batch Images to Timestep Keyframes container) to a new keyframe count
+    with linear, PCHIP or nearest interpolation. The default keyframe is
+    dropped before resampling and added back to the result.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "timestep_kf": ("TIMESTEP_KEYFRAME",),
+                "num_keyframes": ("INT", {
+                    "default": 20,
+                    "min": 2,
+                    "max": 1000,
+                    "step": 1,
+                    "tooltip": "Keyframe count of the resampled schedule"
+                }),
+                "method": (list(RESAMPLE_METHODS), {
+                    "default": "linear",
+                    "tooltip": "linear = straight lines between keyframes; pchip = smooth without overshoot; nearest = closest source keyframe"
+                }),
+            },
+            "optional": {
+                "start_percent": ("FLOAT", {
+                    "default": -1.0,
+                    "min": -1.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "First resampled percent (-1 = first source keyframe)"
+                }),
+                "end_percent": ("FLOAT", {
+                    "default": -1.0,
+                    "min": -1.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "Last resampled percent (-1 = last source keyframe)"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("TIMESTEP_KEYFRAME", "STRING",)
+    RETURN_NAMES = ("TIMESTEP_KF", "resample_info",)
+    FUNCTION = "resample"
+    CATEGORY = "conditioning/controlnet"
+
+    def resample(self, timestep_kf, num_keyframes, method="linear", start_percent=-1.0, end_percent=-1.0):
+        percents, strengths, _, _ = _without_default(timestep_kf)
+        source_count = len(percents)
+
+        new_percents, new_strengths = resample_schedule(
+            percents, strengths, num_keyframes, method,
+            start_percent if start_percent >= 0 else None,
+            end_percent if end_percent >= 0 else None,
+        )
+        # Same convention as the schedulers: only the first keyframe is guaranteed, so
+        # ACN's keyframe search is not held back one keyframe per step on dense schedules
+        guarantee_steps = np.zeros(len(new_percents), dtype=np.int32)
+        guarantee_steps[:1] = 1
+        keyframe_group = ArrayKeyframeGroup(new_percents, new_strengths, guarantee_steps)
+
+        info = (f"Resampled {source_count} -> {num_keyframes} keyframes ({method})"
+                f"\nRange: {new_percents[0]:.3f}-{new_percents[-1]:.3f}"
+                f" | Strength: {new_strengths.min():.3f}-{new_strengths.max():.3f}")
+        return (keyframe_group, info)
+
+
+NODE_CLASS_MAPPINGS = {
+    "ResampleKeyframeGroup": ResampleKeyframeGroup
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "ResampleKeyframeGroup": "Resample Keyframe Group"
+}
@@ -0,0 +1,239 @@
+# keyframe_utils.py
+# Array-level helpers for turning dense (percent, strength) samples into
+# keyframe schedules. Advanced ControlNet holds each keyframe's strength until
+# the next keyframe starts, so every helper here models a schedule as a step
+# function rather than a polyline.
+
+from functools import lru_cache
+
+import numpy as np
+
+
+def error_bounded_keyframes(percents, strengths, tolerance, initial_window=64):
+    """
+    Return the fewest keyframes whose held strengths stay within `tolerance` of
+    every dense sample.
+
+    Greedy left-to-right scan: a keyframe covers the longest run of samples
+    whose max - min <= 2 * tolerance and holds the midpoint of that run, which
+    is optimal for step-function reconstruction. Runs are found with a
+    galloping window of running max/min so the whole pass stays vectorized.
+    """
+    percents = np.asarray(percents, dtype=np.float64)
+    strengths = np.asarray(strengths, dtype=np.float64)
+    n = len(strengths)
+    if n == 0:
+        return percents.copy(), strengths.copy()
+
+    span = 2.0 * max(float(tolerance), 0.0)
+    starts = []
+    values = []
+    i = 0
+    while i < n:
+        width = initial_window
+        while True:
+            stop = min(n, i + width)
+            segment = strengths[i:stop]
+            hi = np.maximum.accumulate(segment)
+            lo = np.minimum.accumulate(segment)
+            over = np.flatnonzero(hi - lo > span)
+            if len(over) or stop == n:
+                break
+            width *= 2
+        length = over[0] if len(over) else stop - i
+        starts.append(i)
+        values.append(0.5 * (hi[length - 1] + lo[length - 1]))
+        i += length
+
+    return percents[starts], np.array(values)
+
+
+def held_strengths(key_percents, key_strengths, percents):
+    """Evaluate a held (step) schedule at arbitrary percents."""
+    index = np.searchsorted(key_percents, percents, side="right") - 1
+    return np.asarray(key_strengths)[np.clip(index, 0, len(key_strengths) - 1)]
+
+
+def compress_plateaus(percents, strengths, epsilon):
+    """
+    Collapse runs of keyframes whose strength stays within `epsilon` of the
+    last kept keyframe. The first keyframe is always kept, so the held
+    schedule never drifts more than epsilon from the original.
+
+    Returns (percents, strengths, kept_indices).
+    """
+    percents = np.asarray(percents)
+    strengths = np.asarray(strengths)
+    if epsilon <= 0 or len(strengths) < 2:
+        return percents, strengths, np.arange(len(strengths))
+
+    kept = [0]
+    anchor = strengths[0]
+    for i in range(1, len(strengths)):
+        if abs(strengths[i] - anchor) >= epsilon:
+            kept.append(i)
+            anchor = strengths[i]
+
+    kept = np.asarray(kept)
+    return percents[kept], strengths[kept], kept
+
+
+def pchip_interpolate(x, y, xi):
+    """
+    Shape-preserving piecewise cubic Hermite (PCHIP) interpolation of y(x) at
+    xi, fully vectorized. x must be strictly increasing; slopes follow
+    Fritsch-Carlson (weighted harmonic means, zero at local extrema), so the
+    result never overshoots the data. Values outside x are clamped.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    xi = np.clip(np.asarray(xi, dtype=np.float64), x[0], x[-1])
+    if len(x) < 3:
+        return np.interp(xi, x, y)
+
+    h = np.diff(x)
+    delta = np.diff(y) / h
+
+    # Interior slopes: weighted harmonic mean where neighbouring secants agree in sign
+    d = np.zeros_like(y)
+    w1 = 2 * h[1:] + h[:-1]
+    w2 = h[1:] + 2 * h[:-1]
+    same_sign = delta[:-1] * delta[1:] > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        harmonic = (w1 + w2) / (w1 / delta[:-1] + w2 / delta[1:])
+    d[1:-1] = np.where(same_sign, harmonic, 0.0)
+
+    # End slopes: non-centered three-point estimate, kept shape-preserving
+    def edge(h0, h1, m0, m1):
+        slope = ((2 * h0 + h1) * m0 - h0 * m1) / (h0 + h1)
+        if np.sign(slope) != np.sign(m0):
+            return 0.0
+        if np.sign(m0) != np.sign(m1) and abs(slope) > 3 * abs(m0):
+            return 3 * m0
+        return slope
+
+    d[0] = edge(h[0], h[1], delta[0], delta[1])
+    d[-1] = edge(h[-1], h[-2], delta[-1], delta[-2])
+
+    k = np.clip(np.searchsorted(x, xi, side="right") - 1, 0, len(x) - 2)
+    s = (xi - x[k]) / h[k]
+    s2, s3 = s * s, s * s * s
+    return ((2 * s3 - 3 * s2 + 1) * y[k] + (s3 - 2 * s2 + s) * h[k] * d[k]
+            + (-2 * s3 + 3 * s2) * y[k + 1] + (s3 - s2) * h[k] * d[k + 1])
+
+
+def total_variation(strengths):
+    """Summed absolute change along the last axis: how much a curve moves."""
+    return np.abs(np.diff(np.asarray(strengths, dtype=np.float64), axis=-1)).sum(axis=-1)
+
+
+def allocate_keyframe_budget(weights, budget, minimum=2):
+    """
+    Split `budget` keyframes across curves in proportion to `weights` (e.g.
+    their total variation), giving each at least `minimum`. Rounding uses
+    largest remainders so the counts sum to the budget exactly; if the
+    budget cannot cover the minimums every curve gets `minimum`.
+    """
+    weights = np.maximum(np.asarray(weights, dtype=np.float64), 0.0)
+    counts = np.full(len(weights), int(minimum))
+    spare = int(budget) - counts.sum()
+    if len(weights) == 0 or spare <= 0:
+        return counts
+
+    total = weights.sum()
+    share = weights / total * spare if total > 0 else np.full(len(weights), spare / len(weights))
+    extra = np.floor(share).astype(int)
+    leftover = spare - extra.sum()
+    extra[np.argsort(extra - share, kind="stable")[:leftover]] += 1
+    return counts + extra
+
+
+# ---------------------------------------------------------------------------
+# Sampler step tables
+#
+# Advanced ControlNet converts a keyframe's start_percent to a sigma with the
+# model's percent_to_sigma and activates it once the sampler's sigma drops to
+# that value. Mapping each step's sigma back through the same (discrete SD1.x /
+# SDXL) noise schedule gives the exact percent at which that step runs, so
+# keyframes can be placed where they actually fire.
+# ---------------------------------------------------------------------------
+
+DISCRETE_TIMESTEPS = 1000
+SAMPLER_SCHEDULERS = ("normal", "karras", "exponential", "sgm_uniform", "simple")
+# Keyframes are nudged this far below their step so float round-trips through
+# percent_to_sigma can never push one past the step it was placed on
+STEP_PERCENT_EPSILON = 1e-5
+
+
+@lru_cache(maxsize=4)
+def discrete_log_sigmas(beta_start=0.00085, beta_end=0.012):
+    """Ascending log-sigmas of the scaled-linear beta schedule (index = timestep)."""
+    betas = np.linspace(beta_start ** 0.5, beta_end ** 0.5, DISCRETE_TIMESTEPS) ** 2
+    alphas_cumprod = np.cumprod(1.0 - betas)
+    log_sigmas = 0.5 * np.log((1.0 - alphas_cumprod) / alphas_cumprod)
+    log_sigmas.flags.writeable = False
+    return log_sigmas
+
+
+def _sigma_at(timesteps):
+    return np.exp(np.interp(timesteps, np.arange(DISCRETE_TIMESTEPS), discrete_log_sigmas()))
+
+
+def scheduler_sigmas(scheduler, steps):
+    """Sigmas of the first `steps` sampling steps for a ComfyUI scheduler (no trailing zero)."""
+    steps = max(int(steps), 1)
+    log_sigmas = discrete_log_sigmas()
+    sigma_min, sigma_max = np.exp(log_sigmas[0]), np.exp(log_sigmas[-1])
+    last = DISCRETE_TIMESTEPS - 1
+
+    if scheduler == "karras":
+        rho = 7.0
+        ramp = np.linspace(0, 1, steps)
+        min_inv_rho, max_inv_rho = sigma_min ** (1 / rho), sigma_max ** (1 / rho)
+        return (max_inv_rho + ramp * (min_inv_rho - max_inv_rho)) ** rho
+    if scheduler == "exponential":
+        return np.exp(np.linspace(np.log(sigma_max), np.log(sigma_min), steps))
+    if scheduler == "sgm_uniform":
+        return _sigma_at(np.linspace(last, 0, steps + 1)[:-1])
+    if scheduler == "simple":
+        stride = DISCRETE_TIMESTEPS / steps
+        return np.exp(log_sigmas[last - (np.arange(steps) * stride).astype(int)])
+    if scheduler != "normal":
+        print(f"[Warning] Unknown scheduler '{scheduler}', using normal")
+    return _sigma_at(np.linspace(last, 0, steps))
+
+
+def sigmas_to_percents(sigmas):
+    """Invert percent_to_sigma: the start_percent whose sigma equals each given sigma."""
+    sigmas = np.maximum(np.asarray(sigmas, dtype=np.float64), 1e-10)
+    timesteps = np.interp(np.log(sigmas), discrete_log_sigmas(), np.arange(DISCRETE_TIMESTEPS))
+    return 1.0 - timesteps / (DISCRETE_TIMESTEPS - 1)
+
+
+def step_percents(total_steps, scheduler="normal", sigmas=None):
+    """
+    Percent at which each sampling step runs. A connected SIGMAS tensor (as
+    produced by ComfyUI's scheduler nodes) takes precedence over the named
+    scheduler; its trailing sigma is the end of sampling, not a step.
+    """
+    if sigmas is not None:
+        if hasattr(sigmas, "detach"):
+            sigmas = sigmas.detach().cpu().numpy()
+        sigmas = np.asarray(sigmas, dtype=np.float64).reshape(-1)[:-1]
+    else:
+        sigmas = scheduler_sigmas(scheduler, total_steps)
+    return sigmas_to_percents(sigmas)
+
+
+def step_aligned_percents(start_percent, end_percent, percents):
+    """
+    Keep the step percents inside [start_percent, end_percent].
+    Returns (keyframe_percents, curve_points): the keyframe positions, nudged by
+    STEP_PERCENT_EPSILON, and each step's normalized position within the range.
+    """
+    percents = np.unique(np.asarray(percents, dtype=np.float64))
+    tolerance = STEP_PERCENT_EPSILON
+    percents = percents[(percents >= start_percent - tolerance) & (percents <= end_percent + tolerance)]
+    span = max(end_percent - start_percent, 1e-9)
+    points = np.clip((percents - start_percent) / span, 0.0, 1.0)
+    return np.maximum(percents - STEP_PERCENT_EPSILON, 0.0), points
@@ -1,11 +1,17 @@
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import io
-from PIL import Image
 import torch
 
+try:
+    from .curve_kernels import EASING_TYPES, evaluate_curve
+    from .keyframe_utils import compress_plateaus, total_variation, allocate_keyframe_budget
+    from .keyframe_group import ArrayKeyframeGroup
+    from .preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+except Exception:
+    from curve_kernels import EASING_TYPES, evaluate_curve
+    from keyframe_utils import compress_plateaus, total_variation, allocate_keyframe_budget
+    from keyframe_group import ArrayKeyframeGroup
+    from preview_render import PlotSpec, render_preview, preview_wanted, PLACEHOLDER_IMAGE
+
 # Import Advanced ControlNet classes
 try:
     from .control import ControlWeights
@@ -43,17 +49,89 @@ CURVE_PRESETS = {
     "Smooth Transition": {"start_strength": 1.0, "end_strength": 0.0, "curve_type": "ease_in_out", "curve_param": 2.0},
 }
 
-EASING_FUNCTIONS = {
-    "ease_in_quad": lambda t: t ** 2,
-    "ease_out_quad": lambda t: 1 - (1 - t) ** 2,
-    "ease_in_out_quad": lambda t: 2 * t ** 2 if t < 0.5 else 1 - (-2 * t + 2) ** 2 / 2,
-    "ease_in_cubic": lambda t: t ** 3,
-    "ease_out_cubic": lambda t: 1 - (1 - t) ** 3,
-    "ease_in_out_cubic": lambda t: 4 * t ** 3 if t < 0.5 else 1 - (-2 * t + 2) ** 3 / 2,
-    "ease_in_quart": lambda t: t ** 4,
-    "ease_out_quart": lambda t: 1 - (1 - t) ** 4,
-    "ease_in_out_quart": lambda t: 8 * t ** 4 if t < 0.5 else 1 - (-2 * t + 2) ** 4 / 2,
+SLOT_COLORS = ['#2E86DE', '#EE5A6F', '#10AC84', '#F79F1F', '#8E44AD', '#16A085', '#D35400', '#7F8C8D']
+
+# Keys a slot spec line may set, with their defaults
+SLOT_SPEC_DEFAULTS = {
+    "enabled": True,
+    "preset": "Custom",
+    "curve_type": "linear",
+    "start_strength": 1.0,
+    "end_strength": 0.0,
+    "curve_param": 2.0,
+    "start_percent": 0.0,
+    "end_percent": 1.0,
 }
+MAX_SLOTS = 64
+
+# Samples per slot used to measure curve complexity for keyframe budgets
+BUDGET_SAMPLES = 256
+
+
+def evaluate_slots(slots, num_keyframes):
+    """
+    Percents and strengths of every slot as rows of two (slots, num_keyframes)
+    arrays. Slots sharing a curve type are evaluated by one broadcast kernel
+    call over the distinct curve_params they use, so the cost grows with the
+    number of distinct curves rather than the number of slots, and repeated
+    slots reuse the same row.
+    """
+    t = np.linspace(0, 1, num_keyframes)
+    column = lambda key: np.array([float(slot[key]) for slot in slots])[:, None]
+
+    start_percents, end_percents = column("start_percent"), column("end_percent")
+    start_strengths, end_strengths = column("start_strength"), column("end_strength")
+    params = column("curve_param")[:, 0]
+
+    curves = np.empty((len(slots), num_keyframes))
+    curve_types = np.array([slot["curve_type"] for slot in slots], dtype=object)
+    for curve_type in dict.fromkeys(curve_types):
+        rows = np.flatnonzero(curve_types == curve_type)
+        used, inverse = np.unique(params[rows], return_inverse=True)
+        evaluated = evaluate_curve(curve_type, t[None, :], used[:, None])
+        curves[rows] = np.broadcast_to(evaluated, (len(used), num_keyframes))[inverse]
+
+    percents = start_percents + (end_percents - start_percents) * t
+    strengths = start_strengths + (end_strengths - start_strengths) * curves
+    return percents, strengths
+
+
+def parse_slot_specs(text):
+    """
+    Parse one slot per line as comma-separated key=value pairs, e.g.
+    "preset=Fade Out, start_percent=0.0, end_percent=0.4". Blank lines and
+    lines starting with # are skipped; missing keys use SLOT_SPEC_DEFAULTS.
+    """
+    slots = []
+    for line_number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        slot = dict(SLOT_SPEC_DEFAULTS)
+        for item in line.split(","):
+            if not item.strip():
+                continue
+            key, sep, value = item.partition("=")
+            key, value = key.strip(), value.strip()
+            if not sep or key not in SLOT_SPEC_DEFAULTS:
+                raise ValueError(f"Slot line {line_number}: expected key=value with key in {list(SLOT_SPEC_DEFAULTS)}, got '{item.strip()}'")
+            default = SLOT_SPEC_DEFAULTS[key]
+            if isinstance(default, bool):
+                slot[key] = value.lower() in ("1", "true", "yes", "on")
+            elif isinstance(default, float):
+                try:
+                    slot[key] = float(value)
+                except ValueError:
+                    raise ValueError(f"Slot line {line_number}: {key} must be a number, got '{value}'")
+            else:
+                slot[key] = value
+        if slot["preset"] not in CURVE_PRESETS:
+            raise ValueError(f"Slot line {line_number}: unknown preset '{slot['preset']}'")
+        slots.append(slot)
+    if len(slots) > MAX_SLOTS:
+        raise ValueError(f"{len(slots)} slots exceeds the limit of {MAX_SLOTS}")
+    return slots
+
 
 class MultiControlNetCurveCoordinator:
     """
@@ -65,9 +143,7 @@ class MultiControlNetCurveCoordinator:
     def INPUT_TYPES(cls):
         curve_types = [
             "linear", "ease_in", "ease_out", "ease_in_out",
-            "ease_in_quad", "ease_out_quad", "ease_in_out_quad",
-            "ease_in_cubic", "ease_out_cubic", "ease_in_out_cubic",
-            "ease_in_quart", "ease_out_quart", "ease_in_out_quart",
+            *EASING_TYPES,
             "sine_wave", "bell_curve", "reverse_bell",
             "exponential", "bounce", "custom_bezier"
         ]
@@ -294,6 +370,22 @@ class MultiControlNetCurveCoordinator:
                     "step": 0.1,
                     "tooltip": "Curve parameter for Slot D"
                 }),
+            },
+            "optional": {
+                "plateau_epsilon": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "Drop keyframes whose strength differs from the previous kept keyframe by less than this (0 = keep all, applies to all slots)"
+                }),
+                "keyframe_budget": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 2000,
+                    "step": 1,
+                    "tooltip": "Total keyframes shared by all enabled slots, split by how much each curve moves (total variation); 0 = every slot uses num_keyframes"
+                }),
             }
         }
 
@@ -302,72 +394,46 @@ class MultiControlNetCurveCoordinator:
     FUNCTION = "coordinate_curves"
     CATEGORY = "conditioning/controlnet"
 
-    def calculate_curve(self, t, curve_type, curve_param):
-        """Calculate curve values (reused from your existing node)"""
-        t = np.clip(t, 0, 1)
-        
-        if curve_type == "linear":
-            return t
-        elif curve_type in ["ease_in", "ease_out", "ease_in_out"]:
-            if curve_type == "ease_in":
-                return t ** curve_param
-            elif curve_type == "ease_out":
-                return 1 - (1 - t) ** curve_param
-            else:  # ease_in_out
-                return np.where(t < 0.5, 
-                    2**(curve_param-1) * t**curve_param,
-                    1 - (-2*t + 2)**curve_param / (2**(curve_param-1)))
-        elif curve_type in EASING_FUNCTIONS:
-            return np.array([EASING_FUNCTIONS[curve_type](ti) for ti in t])
-        elif curve_type == "sine_wave":
-            return (np.sin(t * np.pi * curve_param * 2 - np.pi/2) + 1) / 2
-        elif curve_type == "bell_curve":
-            center = 0.5
-            return np.exp(-curve_param * (t - center)**2)
-        elif curve_type == "reverse_bell":
-            center = 0.5
-            return 1 - np.exp(-curve_param * (t - center)**2)
-        elif curve_type == "exponential":
-            return (np.exp(curve_param * t) - 1) / (np.exp(curve_param) - 1)
-        elif curve_type == "bounce":
-            n = int(curve_param)
-            decay = 0.5
-            result = np.zeros_like(t)
-            for i in range(n):
-                phase = t * n - i
-                bounce = np.maximum(0, 1 - np.abs(phase))
-                result += bounce * (decay ** i)
-            return result / np.max(result) if np.max(result) > 0 else result
-        elif curve_type == "custom_bezier":
-            p0, p1, p2, p3 = 0, curve_param/10, 1-curve_param/10, 1
-            return 3*(1-t)**2*t*p1 + 3*(1-t)*t**2*p2 + t**3*p3
-        else:
-            return t
+    def allocate_slot_keyframes(self, slots, keyframe_budget):
+        """Keyframe count per slot: `keyframe_budget` split by each curve's total variation."""
+        _, dense = evaluate_slots(slots, BUDGET_SAMPLES)
+        return allocate_keyframe_budget(total_variation(dense), keyframe_budget).tolist()
+
+    def build_slot_groups(self, slots, num_keyframes, plateau_epsilon=0.0, keyframe_budget=0):
+        """
+        Evaluate every enabled slot in one vectorized pass (one pass per distinct
+        keyframe count when a budget is set). Returns one (keyframe_group,
+        percents, strengths) per slot; disabled slots get an empty group and
+        empty arrays. Each slot's keyframe count is stored as slot["num_keyframes"].
+        """
+        results = [(TimestepKeyframeGroup(), np.array([]), np.array([])) for _ in slots]
+        enabled = [i for i, slot in enumerate(slots) if slot["enabled"]]
+        for slot in slots:
+            slot["num_keyframes"] = num_keyframes if slot["enabled"] else 0
+        if not enabled:
+            return results
 
-    def create_keyframe_group(self, num_keyframes, start_percent, end_percent, 
-                            start_strength, end_strength, curve_type, curve_param):
-        """Create a TimestepKeyframeGroup for a single slot"""
         try:
-            keyframe_group = TimestepKeyframeGroup()
-            
-            t = np.linspace(0, 1, num_keyframes)
-            percents = start_percent + (end_percent - start_percent) * t
-            
-            curve = self.calculate_curve(t, curve_type, curve_param)
-            strengths = start_strength + (end_strength - start_strength) * curve
-            
-            for i, (percent, strength) in enumerate(zip(percents, strengths)):
-                keyframe = TimestepKeyframe(
-                    start_percent=float(percent),
-                    strength=float(strength)
-                )
-                keyframe_group.add(keyframe)
-            
-            return keyframe_group, percents, strengths
-            
+            if keyframe_budget > 0:
+                counts = self.allocate_slot_keyframes([slots[i] for i in enabled], keyframe_budget)
+                for i, count in zip(enabled, counts):
+                    slots[i]["num_keyframes"] = count
+
+            for count in dict.fromkeys(slots[i]["num_keyframes"] for i in enabled):
+                rows = [i for i in enabled if slots[i]["num_keyframes"] == count]
+                percent_rows, strength_rows = evaluate_slots([slots[i] for i in rows], count)
+                for i, percents, strengths in zip(rows, percent_rows, strength_rows):
+                    percents, strengths, _ = compress_plateaus(percents, strengths, plateau_epsilon)
+                    results[i] = (ArrayKeyframeGroup(percents, strengths), percents, strengths)
         except Exception as e:
-            print(f"[Multi-CN Coordinator] Error creating keyframe group: {e}")
-            return TimestepKeyframeGroup(), np.array([]), np.array([])
+            print(f"[Multi-CN Coordinator] Error creating keyframe groups: {e}")
+        return results
+
+    def plateau_note(self, num_keyframes, percents, keyframe_budget=0):
+        """Info suffix reporting the slot's budgeted count and keyframes removed by plateau compression"""
+        note = f" | {num_keyframes} keyframes" if keyframe_budget > 0 else ""
+        removed = num_keyframes - len(percents)
+        return note + (f" | plateau: -{removed} keyframes" if 0 < removed < num_keyframes else "")
 
     def apply_preset(self, preset_name, curve_type, start_strength, end_strength, curve_param):
         """Apply preset if not Custom"""
@@ -382,74 +448,56 @@ class MultiControlNetCurveCoordinator:
                 )
         return curve_type, start_strength, end_strength, curve_param
 
+    def combined_graph(self, slot_data):
+        """The combined graph, or the shared placeholder when running headless"""
+        if not preview_wanted(True):
+            return PLACEHOLDER_IMAGE
+        return self.generate_combined_graph(slot_data)
+
     def generate_combined_graph(self, slot_data):
         """Generate graph showing all active curves with timing windows"""
         try:
-            fig, ax = plt.subplots(figsize=(12, 7), dpi=100)
+            all_strengths = []
+            for enabled, percents, strengths, _, _, _, _ in slot_data:
+                if enabled and len(strengths) > 0:
+                    all_strengths.extend(strengths)
+            
+            if all_strengths:
+                ylim = (min(0, min(all_strengths) - 0.1), max(all_strengths) + 0.1)
+            else:
+                ylim = (-0.1, 1.1)
             
-            colors = ['#2E86DE', '#EE5A6F', '#10AC84', '#F79F1F']
-            slot_names = ['Slot A', 'Slot B', 'Slot C', 'Slot D']
+            spec = PlotSpec(
+                size=(1200, 700),
+                title='Multi-ControlNet Curve Coordination (Shaded = Active Window)',
+                xlabel='Generation Progress (%)',
+                ylabel='ControlNet Strength',
+                xlim=(-5, 105),
+                ylim=ylim,
+                legend_size=9,
+            )
             
             active_count = 0
             for i, (enabled, percents, strengths, curve_type, label, start_pct, end_pct) in enumerate(slot_data):
                 if enabled and len(percents) > 0:
                     # Draw shaded region for active window
-                    ax.axvspan(start_pct * 100, end_pct * 100, 
-                             alpha=0.1, color=colors[i], zorder=0)
+                    color = SLOT_COLORS[i % len(SLOT_COLORS)]
+                    spec.span(start_pct * 100, end_pct * 100, color, alpha=0.1)
                     
                     # Draw the curve
-                    ax.plot(percents * 100, strengths, 
-                           color=colors[i], linewidth=2.5, 
-                           label=f'{slot_names[i]}: {curve_type} [{start_pct:.2f}-{end_pct:.2f}]', 
-                           alpha=0.85)
-                    ax.scatter(percents * 100, strengths, 
-                             c=colors[i], s=40, zorder=5, alpha=0.6)
+                    spec.line(percents * 100, strengths, color=color, width=2.5, alpha=0.85,
+                              label=f'{label}: {curve_type} [{start_pct:.2f}-{end_pct:.2f}]')
+                    spec.scatter(percents * 100, strengths, color=color, s=40, alpha=0.6)
                     active_count += 1
             
             if active_count == 0:
-                ax.text(0.5, 0.5, 'No active slots', 
-                       ha='center', va='center', transform=ax.transAxes,
-                       fontsize=16, color='gray')
+                spec.text(0.5, 0.5, 'No active slots', size=16, color='gray', ha='center', va='center')
             
-            ax.set_xlabel('Generation Progress (%)', fontsize=12, fontweight='bold')
-            ax.set_ylabel('ControlNet Strength', fontsize=12, fontweight='bold')
-            ax.set_title('Multi-ControlNet Curve Coordination (Shaded = Active Window)', 
-                        fontsize=14, fontweight='bold')
-            ax.grid(True, alpha=0.3, linestyle='--')
-            ax.legend(loc='best', fontsize=9, framealpha=0.9)
-            
-            ax.set_xlim(-5, 105)
-            
-            all_strengths = []
-            for enabled, percents, strengths, _, _, _, _ in slot_data:
-                if enabled and len(strengths) > 0:
-                    all_strengths.extend(strengths)
-            
-            if all_strengths:
-                y_min = min(0, min(all_strengths) - 0.1)
-                y_max = max(all_strengths) + 0.1
-                ax.set_ylim(y_min, y_max)
-            else:
-                ax.set_ylim(-0.1, 1.1)
-            
-            plt.tight_layout()
-            
-            buf = io.BytesIO()
-            plt.savefig(buf, format='png', bbox_inches='tight')
-            buf.seek(0)
-            img = Image.open(buf)
-            plt.close(fig)
-            
-            img_array = np.array(img).astype(np.float32) / 255.0
-            img_tensor = torch.from_numpy(img_array)[None,]
-            
-            return img_tensor
+            return render_preview(spec)
             
         except Exception as e:
             print(f"[Multi-CN Coordinator] Graph failed: {e}")
             return self.create_dummy_image()
-        finally:
-            plt.close('all')
 
     def create_dummy_image(self):
         """Create dummy image when graph fails"""
@@ -463,7 +511,8 @@ class MultiControlNetCurveCoordinator:
                          divider_a, enable_slot_a, start_percent_a, end_percent_a, preset_a, curve_type_a, start_strength_a, end_strength_a, curve_param_a,
                          divider_b, enable_slot_b, start_percent_b, end_percent_b, preset_b, curve_type_b, start_strength_b, end_strength_b, curve_param_b,
                          divider_c, enable_slot_c, start_percent_c, end_percent_c, preset_c, curve_type_c, start_strength_c, end_strength_c, curve_param_c,
-                         divider_d, enable_slot_d, start_percent_d, end_percent_d, preset_d, curve_type_d, start_strength_d, end_strength_d, curve_param_d):
+                         divider_d, enable_slot_d, start_percent_d, end_percent_d, preset_d, curve_type_d, start_strength_d, end_strength_d, curve_param_d,
+                         plateau_epsilon=0.0, keyframe_budget=0):
         """Main execution function"""
         
         try:
@@ -477,26 +526,24 @@ class MultiControlNetCurveCoordinator:
             curve_type_d, start_strength_d, end_strength_d, curve_param_d = \
                 self.apply_preset(preset_d, curve_type_d, start_strength_d, end_strength_d, curve_param_d)
             
-            # Create keyframe groups for each slot with individual timing
-            kf_a, percents_a, strengths_a = self.create_keyframe_group(
-                num_keyframes, start_percent_a, end_percent_a, 
-                start_strength_a, end_strength_a, curve_type_a, curve_param_a
-            ) if enable_slot_a else (TimestepKeyframeGroup(), np.array([]), np.array([]))
-            
-            kf_b, percents_b, strengths_b = self.create_keyframe_group(
-                num_keyframes, start_percent_b, end_percent_b,
-                start_strength_b, end_strength_b, curve_type_b, curve_param_b
-            ) if enable_slot_b else (TimestepKeyframeGroup(), np.array([]), np.array([]))
-            
-            kf_c, percents_c, strengths_c = self.create_keyframe_group(
-                num_keyframes, start_percent_c, end_percent_c,
-                start_strength_c, end_strength_c, curve_type_c, curve_param_c
-            ) if enable_slot_c else (TimestepKeyframeGroup(), np.array([]), np.array([]))
-            
-            kf_d, percents_d, strengths_d = self.create_keyframe_group(
-                num_keyframes, start_percent_d, end_percent_d,
-                start_strength_d, end_strength_d, curve_type_d, curve_param_d
-            ) if enable_slot_d else (TimestepKeyframeGroup(), np.array([]), np.array([]))
+            # Evaluate all four slots, each with individual timing, in one pass
+            slots = [
+                {"enabled": enable_slot_a, "curve_type": curve_type_a, "start_strength": start_strength_a,
+                 "end_strength": end_strength_a, "curve_param": curve_param_a,
+                 "start_percent": start_percent_a, "end_percent": end_percent_a},
+                {"enabled": enable_slot_b, "curve_type": curve_type_b, "start_strength": start_strength_b,
+                 "end_strength": end_strength_b, "curve_param": curve_param_b,
+                 "start_percent": start_percent_b, "end_percent": end_percent_b},
+                {"enabled": enable_slot_c, "curve_type": curve_type_c, "start_strength": start_strength_c,
+                 "end_strength": end_strength_c, "curve_param": curve_param_c,
+                 "start_percent": start_percent_c, "end_percent": end_percent_c},
+                {"enabled": enable_slot_d, "curve_type": curve_type_d, "start_strength": start_strength_d,
+                 "end_strength": end_strength_d, "curve_param": curve_param_d,
+                 "start_percent": start_percent_d, "end_percent": end_percent_d},
+            ]
+            (kf_a, percents_a, strengths_a), (kf_b, percents_b, strengths_b), \
+                (kf_c, percents_c, strengths_c), (kf_d, percents_d, strengths_d) = \
+                self.build_slot_groups(slots, num_keyframes, plateau_epsilon, keyframe_budget)
             
             # Generate combined graph with timing windows
             slot_data = [
@@ -506,23 +553,27 @@ class MultiControlNetCurveCoordinator:
                 (enable_slot_d, percents_d, strengths_d, curve_type_d, "Slot D", start_percent_d, end_percent_d),
             ]
             
-            graph = self.generate_combined_graph(slot_data)
+            graph = self.combined_graph(slot_data)
             
             # Generate info text
             info_lines = [
                 f"Multi-ControlNet Curve Coordinator",
-                f"Keyframes: {num_keyframes}",
+                f"Keyframes: {num_keyframes}" if keyframe_budget <= 0 else f"Keyframe budget: {keyframe_budget}",
                 ""
             ]
             
             if enable_slot_a:
-                info_lines.append(f"Slot A: {curve_type_a} | {start_strength_a:.2f}→{end_strength_a:.2f} | [{start_percent_a:.2f}-{end_percent_a:.2f}]")
+                info_lines.append(f"Slot A: {curve_type_a} | {start_strength_a:.2f}→{end_strength_a:.2f} | [{start_percent_a:.2f}-{end_percent_a:.2f}]"
+                                  + self.plateau_note(slots[0]["num_keyframes"], percents_a, keyframe_budget))
             if enable_slot_b:
-                info_lines.append(f"Slot B: {curve_type_b} | {start_strength_b:.2f}→{end_strength_b:.2f} | [{start_percent_b:.2f}-{end_percent_b:.2f}]")
+                info_lines.append(f"Slot B: {curve_type_b} | {start_strength_b:.2f}→{end_strength_b:.2f} | [{start_percent_b:.2f}-{end_percent_b:.2f}]"
+                                  + self.plateau_note(slots[1]["num_keyframes"], percents_b, keyframe_budget))
             if enable_slot_c:
-                info_lines.append(f"Slot C: {curve_type_c} | {start_strength_c:.2f}→{end_strength_c:.2f} | [{start_percent_c:.2f}-{end_percent_c:.2f}]")
+                info_lines.append(f"Slot C: {curve_type_c} | {start_strength_c:.2f}→{end_strength_c:.2f} | [{start_percent_c:.2f}-{end_percent_c:.2f}]"
+                                  + self.plateau_note(slots[2]["num_keyframes"], percents_c, keyframe_budget))
             if enable_slot_d:
-                info_lines.append(f"Slot D: {curve_type_d} | {start_strength_d:.2f}→{end_strength_d:.2f} | [{start_percent_d:.2f}-{end_percent_d:.2f}]")
+                info_lines.append(f"Slot D: {curve_type_d} | {start_strength_d:.2f}→{end_strength_d:.2f} | [{start_percent_d:.2f}-{end_percent_d:.2f}]"
+                                  + self.plateau_note(slots[3]["num_keyframes"], percents_d, keyframe_budget))
             
             info = "\n".join(info_lines)
             
@@ -540,10 +591,108 @@ class MultiControlNetCurveCoordinator:
             return (dummy_kf, dummy_kf, dummy_kf, dummy_kf, dummy_graph, error_info)
 
 
+class MultiControlNetCurveCoordinatorN(MultiControlNetCurveCoordinator):
+    """
+    Any number of ControlNet curves from a list of slot specs (one per line).
+    Every slot is evaluated as a row of one 2D array and the node returns a
+    list with one keyframe group per slot, in line order.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "num_keyframes": ("INT", {
+                    "default": 10,
+                    "min": 2,
+                    "max": 100,
+                    "step": 1,
+                    "tooltip": "Number of keyframes (applies to all slots)"
+                }),
+                "slot_specs": ("STRING", {
+                    "default": "preset=Fade Out, start_percent=0.0, end_percent=0.5\n"
+                               "preset=Fade In, start_percent=0.3, end_percent=0.8\n"
+                               "preset=Peak Control, start_percent=0.7, end_percent=1.0",
+                    "multiline": True,
+                    "tooltip": "One slot per line as key=value pairs: enabled, preset, curve_type, start_strength, end_strength, curve_param, start_percent, end_percent (# starts a comment)"
+                }),
+            },
+            "optional": {
+                "plateau_epsilon": ("FLOAT", {
+                    "default": 0.0,
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.001,
+                    "tooltip": "Drop keyframes whose strength differs from the previous kept keyframe by less than this (0 = keep all, applies to all slots)"
+                }),
+                "keyframe_budget": ("INT", {
+                    "default": 0,
+                    "min": 0,
+                    "max": 2000,
+                    "step": 1,
+                    "tooltip": "Total keyframes shared by all enabled slots, split by how much each curve moves (total variation); 0 = every slot uses num_keyframes"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("TIMESTEP_KEYFRAME", "IMAGE", "STRING")
+    RETURN_NAMES = ("TIMESTEP_KF_LIST", "combined_graph", "info")
+    OUTPUT_IS_LIST = (True, False, False)
+    FUNCTION = "coordinate_slots"
+    CATEGORY = "conditioning/controlnet"
+
+    def coordinate_slots(self, num_keyframes, slot_specs, plateau_epsilon=0.0, keyframe_budget=0):
+        try:
+            return self._coordinate_slots(num_keyframes, slot_specs, plateau_epsilon, keyframe_budget)
+        except Exception as e:
+            print(f"[Multi-CN Coordinator] ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+
+            return ([TimestepKeyframeGroup()], self.create_dummy_image(), f"Error: {str(e)}")
+
+    def _coordinate_slots(self, num_keyframes, slot_specs, plateau_epsilon, keyframe_budget):
+        slots = parse_slot_specs(slot_specs)
+        if not slots:
+            raise ValueError("No slots given - add at least one key=value line to slot_specs")
+
+        for slot in slots:
+            slot["curve_type"], slot["start_strength"], slot["end_strength"], slot["curve_param"] = \
+                self.apply_preset(slot["preset"], slot["curve_type"], slot["start_strength"],
+                                  slot["end_strength"], slot["curve_param"])
+
+        results = self.build_slot_groups(slots, num_keyframes, plateau_epsilon, keyframe_budget)
+
+        slot_data = [
+            (slot["enabled"], percents, strengths, slot["curve_type"], f"Slot {i + 1}",
+             slot["start_percent"], slot["end_percent"])
+            for i, (slot, (_, percents, strengths)) in enumerate(zip(slots, results))
+        ]
+        graph = self.combined_graph(slot_data)
+
+        info_lines = [
+            f"Multi-ControlNet Curve Coordinator ({len(slots)} slots)",
+            f"Keyframes: {num_keyframes}" if keyframe_budget <= 0 else f"Keyframe budget: {keyframe_budget}",
+            ""
+        ]
+        for i, (slot, (_, percents, _)) in enumerate(zip(slots, results)):
+            if slot["enabled"]:
+                info_lines.append(
+                    f"Slot {i + 1}: {slot['curve_type']} | {slot['start_strength']:.2f}→{slot['end_strength']:.2f}"
+                    f" | [{slot['start_percent']:.2f}-{slot['end_percent']:.2f}]"
+                    + self.plateau_note(slot["num_keyframes"], percents, keyframe_budget))
+            else:
+                info_lines.append(f"Slot {i + 1}: disabled")
+
+        return ([group for group, _, _ in results], graph, "\n".join(info_lines))
+
+
 NODE_CLASS_MAPPINGS = {
-    "Multi-ControlNet Curve Coordinator": MultiControlNetCurveCoordinator
+    "Multi-ControlNet Curve Coordinator": MultiControlNetCurveCoordinator,
+    "Multi-ControlNet Curve Coordinator (N Slots)": MultiControlNetCurveCoordinatorN,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
-    "Multi-ControlNet Curve Coordinator": "Multi-ControlNet Curve Coordinator"
+    "Multi-ControlNet Curve Coordinator": "Multi-ControlNet Curve Coordinator",
+    "Multi-ControlNet Curve Coordinator (N Slots)": "Multi-ControlNet Curve Coordinator (N Slots)",
 }
\ No newline at end of file
@@ -0,0 +1,1002 @@
+# preview_render.py
+# Curve preview images. Nodes describe a preview as a PlotSpec (arrays plus
+# styling); render_preview() turns it into a ComfyUI IMAGE tensor.
+#
+# The default "raster" renderer draws axes, grid, polylines, markers, shaded
+# windows and text straight into a preallocated float32 RGB buffer that
+# becomes the output tensor as-is: no figure, no PNG encode/decode. Set
+# CURVED_SCHEDULE_PREVIEW_RENDERER=matplotlib to render the same specs with
+# matplotlib instead; with CURVED_SCHEDULE_PREVIEW_WORKERS=<n> those renders
+# run in a pool of n persistent worker processes (see preview_worker.py).
+#
+# With show_graph off, or CURVED_SCHEDULE_HEADLESS=1, nodes skip rendering
+# entirely and return PLACEHOLDER_IMAGE instead.
+# Rendered images are kept in PREVIEW_CACHE, keyed on a hash of the spec, so
+# an unchanged curve is never drawn twice.
+
+import atexit
+import hashlib
+import importlib.util
+import math
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import torch
+from PIL import Image, ImageDraw, ImageFont
+
+try:
+    from .preview_worker import draw_matplotlib, send_frame, receive_frame
+except Exception:
+    from preview_worker import draw_matplotlib, send_frame, receive_frame
+
+
+PREVIEW_RENDERERS = ("raster", "matplotlib")
+PREVIEW_RENDERER = os.environ.get("CURVED_SCHEDULE_PREVIEW_RENDERER", "raster").strip().lower()
+if PREVIEW_RENDERER not in PREVIEW_RENDERERS:
+    print(f"[Warning] Unknown preview renderer '{PREVIEW_RENDERER}', using raster")
+    PREVIEW_RENDERER = "raster"
+
+# Never render previews (batch / server deployments that never look at them)
+HEADLESS = os.environ.get("CURVED_SCHEDULE_HEADLESS", "0") == "1"
+
+# Worker processes for matplotlib rendering; 0 renders on the calling thread.
+PREVIEW_WORKERS = max(0, int(os.environ.get("CURVED_SCHEDULE_PREVIEW_WORKERS", "0")))
+
+# Seconds to wait for a free worker or a worker's reply before rendering in-process
+PREVIEW_WORKER_TIMEOUT = float(os.environ.get("CURVED_SCHEDULE_PREVIEW_WORKER_TIMEOUT", "30"))
+
+# Override with CURVED_SCHEDULE_PREVIEW_CACHE_MB=<n>; 0 disables caching.
+DEFAULT_CACHE_MB = float(os.environ.get("CURVED_SCHEDULE_PREVIEW_CACHE_MB", "64"))
+
+DPI = 100
+PX_PER_POINT = DPI / 72.0
+
+# matplotlib's default color cycle, used when a series has no color
+DEFAULT_COLORS = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b', '#e377c2', '#7f7f7f')
+
+NAMED_COLORS = {
+    "b": "#0000ff", "g": "#008000", "r": "#ff0000", "k": "#000000", "w": "#ffffff",
+    "blue": "#0000ff", "green": "#008000", "red": "#ff0000", "black": "#000000", "white": "#ffffff",
+    "gray": "#808080", "grey": "#808080", "darkred": "#8b0000", "orange": "#ffa500",
+    "yellow": "#ffff00", "wheat": "#f5deb3",
+}
+
+# matplotlib's grid styling
+GRID_COLOR = "#b0b0b0"
+GRID_ALPHA = 0.3
+
+# Dash patterns in multiples of the line width, as matplotlib defines them
+LINE_STYLES = {"-": None, "--": (3.7, 1.6), ":": (1.0, 1.65), "-.": (6.4, 1.6)}
+
+
+@lru_cache(maxsize=256)
+def to_rgb(color):
+    """(r, g, b) floats in [0, 1] for a hex string or one of NAMED_COLORS."""
+    value = NAMED_COLORS.get(color, color)
+    if isinstance(value, str) and value.startswith("#") and len(value) == 7:
+        return tuple(int(value[i:i + 2], 16) / 255.0 for i in (1, 3, 5))
+    raise ValueError(f"Unsupported color '{color}'")
+
+
+class PlotSpec:
+    """
+    Backend-independent description of a preview graph. Coordinates are data
+    units; sizes (fonts, marker area, line widths) use matplotlib's units so
+    both renderers draw the same picture.
+    """
+
+    def __init__(self, size=(800, 600), title="", xlabel="", ylabel="", xlim=None, ylim=None,
+                 title_size=14, label_size=12, legend_size=10, legend=True, grid=True,
+                 facecolor="white", axes_facecolor="white", antialias=True):
+        self.size = (int(size[0]), int(size[1]))
+        self.title = title
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.xlim = tuple(float(v) for v in xlim) if xlim is not None else None
+        self.ylim = tuple(float(v) for v in ylim) if ylim is not None else None
+        self.title_size = title_size
+        self.label_size = label_size
+        self.legend_size = legend_size
+        self.legend = legend
+        self.grid = grid
+        self.facecolor = facecolor
+        self.axes_facecolor = axes_facecolor
+        self.antialias = antialias
+        self.lines = []
+        self.points = []
+        self.spans = []
+        self.hlines = []
+        self.vlines = []
+        self.annotations = []
+        self.texts = []
+
+    @staticmethod
+    def _array(values):
+        return np.ascontiguousarray(values, dtype=np.float64).reshape(-1)
+
+    def _next_color(self):
+        return DEFAULT_COLORS[(len(self.lines) + len(self.points)) % len(DEFAULT_COLORS)]
+
+    def line(self, x, y, color=None, width=1.5, style="-", alpha=1.0, label=None):
+        self.lines.append({"x": self._array(x), "y": self._array(y), "color": color or self._next_color(),
+                           "width": float(width), "style": style, "alpha": float(alpha), "label": label})
+
+    def scatter(self, x, y, color=None, s=36, alpha=1.0, label=None, edgecolor=None, edgewidth=0.0):
+        self.points.append({"x": self._array(x), "y": self._array(y), "color": color or self._next_color(),
+                            "s": float(s), "alpha": float(alpha), "label": label,
+                            "edgecolor": edgecolor, "edgewidth": float(edgewidth)})
+
+    def span(self, x0, x1, color, alpha=0.1):
+        self.spans.append({"x0": float(x0), "x1": float(x1), "color": color, "alpha": float(alpha)})
+
+    def axhline(self, y, color="gray", style=":", alpha=1.0, width=1.0):
+        self.hlines.append({"value": float(y), "color": color, "style": style, "alpha": float(alpha), "width": float(width)})
+
+    def axvline(self, x, color="gray", style=":", alpha=1.0, width=1.0):
+        self.vlines.append({"value": float(x), "color": color, "style": style, "alpha": float(alpha), "width": float(width)})
+
+    def annotate(self, x, y, text, offset=15, size=9, facecolor="yellow", edgecolor="orange"):
+        """Text centered `offset` points above the data point (x, y), in a box."""
+        self.annotations.append({"x": float(x), "y": float(y), "text": text, "offset": float(offset),
+                                 "size": size, "facecolor": facecolor, "edgecolor": edgecolor})
+
+    def text(self, x, y, text, size=10, color="black", ha="left", va="top", box=None, box_alpha=0.5):
+        """Text at axes-fraction position (x, y), optionally in a box filled with `box`."""
+        self.texts.append({"x": float(x), "y": float(y), "text": text, "size": size, "color": color,
+                           "ha": ha, "va": va, "box": box, "box_alpha": float(box_alpha)})
+
+    def cache_key(self, renderer=""):
+        """Digest of everything that affects the rendered image: arrays, text and styling."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((
+            renderer, self.size, self.title, self.xlabel, self.ylabel, self.xlim, self.ylim,
+            self.title_size, self.label_size, self.legend_size, self.legend, self.grid,
+            self.facecolor, self.axes_facecolor, self.antialias,
+        )).encode())
+        for items in (self.lines, self.points, self.spans, self.hlines, self.vlines, self.annotations, self.texts):
+            digest.update(b"|%d" % len(items))
+            for item in items:
+                for name, value in item.items():
+                    if isinstance(value, np.ndarray):
+                        # float64 and contiguous (see _array), so hashed as-is
+                        digest.update(b"%s:%d:" % (name.encode(), len(value)))
+                        digest.update(value)
+                    else:
+                        digest.update(repr((name, value)).encode())
+        return digest.digest()
+
+    def state(self):
+        """Plain-value snapshot (limits resolved) that draw_matplotlib() and worker processes take."""
+        state = dict(self.__dict__)
+        state["xlim"], state["ylim"] = self.data_limits()
+        state["dpi"] = DPI
+        return state
+
+    def data_limits(self):
+        """(xlim, ylim): the explicit limits, or the data range plus matplotlib's 5% margin."""
+        def auto(limit, arrays, extra):
+            if limit is not None:
+                return limit
+            values = [a[np.isfinite(a)] for a in arrays] + [np.asarray(extra, dtype=np.float64)]
+            values = np.concatenate(values) if values else np.empty(0)
+            if len(values) == 0:
+                return (0.0, 1.0)
+            lo, hi = float(values.min()), float(values.max())
+            if hi == lo:
+                lo, hi = lo - 0.5, hi + 0.5
+            pad = (hi - lo) * 0.05
+            return (lo - pad, hi + pad)
+
+        series = self.lines + self.points
+        xlim = auto(self.xlim, [s["x"] for s in series],
+                    [v for span in self.spans for v in (span["x0"], span["x1"])] + [v["value"] for v in self.vlines])
+        ylim = auto(self.ylim, [s["y"] for s in series], [h["value"] for h in self.hlines])
+        return xlim, ylim
+
+
+# ---------------------------------------------------------------------------
+# Skipped previews
+# ---------------------------------------------------------------------------
+
+# Shared stand-in for previews that are not drawn; treat it as read-only
+PLACEHOLDER_IMAGE = torch.zeros((1, 64, 64, 3), dtype=torch.float32)
+
+
+def preview_wanted(show_graph):
+    """
+    Whether a node should render its preview graph output at all. Only node
+    inputs and the process-wide HEADLESS setting decide this, so ComfyUI's
+    output cache (keyed on inputs) never serves a stale placeholder.
+    """
+    return show_graph and not HEADLESS
+
+
+# ---------------------------------------------------------------------------
+# Rendered preview cache
+# ---------------------------------------------------------------------------
+
+class PreviewCache:
+    """
+    Bounded LRU mapping of PlotSpec digests to rendered IMAGE tensors, sized in
+    megabytes. Thread-safe; rendering runs outside the lock. Cached tensors are
+    shared between nodes - treat them as read-only.
+    """
+
+    def __init__(self, max_mb=DEFAULT_CACHE_MB):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_bytes = max(0, int(max_mb * 1024 * 1024))
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        image = render()
+        size = image.nbytes
+
+        with self._lock:
+            if 0 < size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = image
+                self.bytes += size
+                self._evict_locked()
+        return image
+
+    def resize(self, max_mb):
+        """Change the size cap (0 disables caching) and evict as needed."""
+        with self._lock:
+            self.max_bytes = max(0, int(max_mb * 1024 * 1024))
+            self._evict_locked()
+
+    def clear(self, reset_stats=False):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            if reset_stats:
+                self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "mb": self.bytes / (1024 * 1024),
+                "max_mb": self.max_bytes / (1024 * 1024),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _evict_locked(self):
+        while self.bytes > self.max_bytes:
+            _, image = self._entries.popitem(last=False)
+            self.bytes -= image.nbytes
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+PREVIEW_CACHE = PreviewCache()
+
+
+def render_preview(spec, renderer=None):
+    """
+    Render a PlotSpec to a (1, H, W, 3) float32 IMAGE tensor. Identical specs
+    return the same cached tensor from PREVIEW_CACHE - do not modify it.
+    """
+    renderer = renderer or PREVIEW_RENDERER
+    if renderer == "matplotlib":
+        render = lambda: render_matplotlib(spec)
+    else:
+        render = lambda: render_raster(spec)
+    if PREVIEW_CACHE.max_bytes <= 0:
+        return render()
+    return PREVIEW_CACHE.get_or_render(spec.cache_key(renderer), render)
+
+
+# ---------------------------------------------------------------------------
+# Text
+# ---------------------------------------------------------------------------
+
+def _matplotlib_font(bold):
+    """Path of matplotlib's bundled DejaVu Sans, found without importing matplotlib."""
+    try:
+        spec = importlib.util.find_spec("matplotlib")
+    except Exception:
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    path = os.path.join(list(spec.submodule_search_locations)[0], "mpl-data", "fonts", "ttf", name)
+    return path if os.path.exists(path) else None
+
+
+@lru_cache(maxsize=32)
+def _font(size, bold=False):
+    path = _matplotlib_font(bold)
+    try:
+        if path:
+            return ImageFont.truetype(path, size)
+        return ImageFont.load_default(size=size)
+    except Exception:
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1024)
+def text_mask(text, size, bold=False, rotate=False):
+    """Read-only float32 coverage mask of `text` (lines split on newlines, centered)."""
+    font = _font(size, bold)
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent
+    lines = text.split("\n")
+    widths = [max(1, int(math.ceil(font.getlength(line)))) for line in lines]
+    width = max(widths)
+    image = Image.new("L", (width, line_height * len(lines)), 0)
+    draw = ImageDraw.Draw(image)
+    for i, (line, line_width) in enumerate(zip(lines, widths)):
+        draw.text(((width - line_width) // 2, i * line_height), line, font=font, fill=255)
+    mask = np.asarray(image, dtype=np.float32) / np.float32(255.0)
+    if rotate:
+        mask = np.ascontiguousarray(np.rot90(mask))
+    mask.flags.writeable = False
+    return mask
+
+
+@lru_cache(maxsize=1024)
+def _channel_weights(text, size, bold=False, rotate=False):
+    """text_mask repeated per RGB channel as (h, w * 3), matching a flattened pixel row."""
+    weights = np.repeat(text_mask(text, size, bold, rotate), 3, axis=1)
+    weights.flags.writeable = False
+    return weights
+
+
+def _points(size):
+    return max(6, int(round(size * PX_PER_POINT)))
+
+
+# ---------------------------------------------------------------------------
+# Raster canvas
+# ---------------------------------------------------------------------------
+
+class RasterCanvas:
+    """
+    float32 (H, W, 3) pixel buffer with alpha-blended drawing primitives.
+    Coordinates are pixels, origin top-left. Every primitive blends only the
+    pixels it covers, so cost follows the drawn area rather than the image.
+    """
+
+    def __init__(self, width, height, background="white", antialias=True):
+        """`background=None` leaves the buffer uninitialized for callers that cover every pixel."""
+        self.width = int(width)
+        self.height = int(height)
+        self.antialias = antialias
+        self.pixels = np.empty((self.height, self.width, 3), dtype=np.float32)
+        if background is not None:
+            self.fill_rect(0, 0, self.width, self.height, background)
+        # One 12-byte element per pixel: gathers/scatters move whole pixels at once
+        self._pixel_view = self.pixels.reshape(-1, 3).view(np.dtype((np.void, 12))).reshape(-1)
+
+    @staticmethod
+    def _color_row(color, width, scale=1.0):
+        """A (width, 3) row of `color`; broadcasting whole rows keeps numpy's inner loops long."""
+        row = np.empty((width, 3), dtype=np.float32)
+        row[...] = np.asarray(to_rgb(color), dtype=np.float32) * np.float32(scale)
+        return row
+
+    def to_tensor(self):
+        """The buffer as a (1, H, W, 3) IMAGE tensor (shares memory with the canvas)."""
+        return torch.from_numpy(self.pixels)[None,]
+
+    def blend_pixels(self, index, coverage, color, alpha=1.0):
+        """Blend `color` into flat pixel indices with per-pixel coverage."""
+        if len(index) == 0:
+            return
+        if not self.antialias:
+            coverage = (coverage >= 0.5).astype(np.float32)
+        current = self._pixel_view.take(index).view(np.float32)
+        delta = np.tile(np.asarray(to_rgb(color), dtype=np.float32), len(index))
+        delta -= current
+        delta *= np.repeat(np.asarray(coverage, dtype=np.float32) * np.float32(alpha), 3)
+        current += delta
+        self._pixel_view[index] = current.view(self._pixel_view.dtype)
+
+    def fill_rect(self, x0, y0, x1, y1, color, alpha=1.0):
+        x0, x1 = max(0, int(round(min(x0, x1)))), min(self.width, int(round(max(x0, x1))))
+        y0, y1 = max(0, int(round(min(y0, y1)))), min(self.height, int(round(max(y0, y1))))
+        if x1 <= x0 or y1 <= y0:
+            return
+        region = self.pixels[y0:y1, x0:x1]
+        if alpha >= 1.0:
+            r, g, b = to_rgb(color)
+            if r == g == b:
+                region.fill(r)
+            else:
+                region[...] = self._color_row(color, x1 - x0)
+        else:
+            region *= np.float32(1.0 - alpha)
+            region += self._color_row(color, x1 - x0, alpha)
+
+    def rect_outline(self, x0, y0, x1, y1, color, alpha=1.0):
+        x0, y0, x1, y1 = int(round(x0)), int(round(y0)), int(round(x1)), int(round(y1))
+        self.fill_rect(x0, y0, x1, y0 + 1, color, alpha)
+        self.fill_rect(x0, y1 - 1, x1, y1, color, alpha)
+        self.fill_rect(x0, y0 + 1, x0 + 1, y1 - 1, color, alpha)
+        self.fill_rect(x1 - 1, y0 + 1, x1, y1 - 1, color, alpha)
+
+    def blend_mask(self, x, y, weights, color, alpha=1.0):
+        """
+        Blend per-channel coverage `weights` (h, w * 3; see _channel_weights)
+        with the top-left corner at pixel (x, y). Rows are blended as flat
+        (w * 3) runs so numpy never loops over the 3-wide channel axis.
+        """
+        x, y = int(round(x)), int(round(y))
+        h, w = weights.shape[0], weights.shape[1] // 3
+        mx0, my0 = max(0, -x), max(0, -y)
+        mx1, my1 = min(w, self.width - x), min(h, self.height - y)
+        if mx1 <= mx0 or my1 <= my0:
+            return
+        region = self.pixels[y + my0:y + my1, x + mx0:x + mx1].reshape(my1 - my0, -1)
+        weight = weights[my0:my1, mx0 * 3:mx1 * 3]
+        if alpha < 1.0:
+            weight = weight * np.float32(alpha)
+        delta = self._color_row(color, mx1 - mx0).reshape(-1) - region
+        delta *= weight
+        region += delta
+
+    def text(self, x, y, text, size, color="black", ha="left", va="top", bold=False, rotate=False, alpha=1.0):
+        """Draw text anchored at pixel (x, y); returns its (x0, y0, x1, y1) box."""
+        weights = _channel_weights(text, size, bold, rotate)
+        h, w = weights.shape[0], weights.shape[1] // 3
+        x0 = x - (w / 2 if ha == "center" else w if ha == "right" else 0)
+        y0 = y - (h / 2 if va == "center" else h if va == "bottom" else 0)
+        self.blend_mask(x0, y0, weights, color, alpha)
+        return (x0, y0, x0 + w, y0 + h)
+
+    @staticmethod
+    def _line_rows(at, width, limit):
+        """(row, coverage) pairs across an axis-aligned line; thin lines snap to the pixel grid."""
+        if width <= 1.5:
+            at = math.floor(at) + 0.5
+        lo, hi = at - width / 2.0, at + width / 2.0
+        for row in range(max(0, int(math.floor(lo))), min(limit, int(math.ceil(hi)))):
+            coverage = min(row + 1, hi) - max(row, lo)
+            if coverage > 0:
+                yield row, coverage
+
+    @staticmethod
+    def _dash_pattern(length, dash):
+        if dash is None:
+            return None
+        on, off = dash
+        return (((np.arange(length) % (on + off)) < on).astype(np.float32))[:, None]
+
+    def hline(self, y, x0, x1, color, alpha=1.0, width=1.0, dash=None):
+        x0, x1 = max(0, int(round(x0))), min(self.width, int(round(x1)))
+        if x1 <= x0:
+            return
+        pattern = self._dash_pattern(x1 - x0, dash)
+        rgb = np.asarray(to_rgb(color), dtype=np.float32)
+        for row, coverage in self._line_rows(y, width, self.height):
+            region = self.pixels[row, x0:x1]
+            weight = np.float32(coverage * alpha) if pattern is None else pattern * np.float32(coverage * alpha)
+            region += (rgb - region) * weight
+
+    def vline(self, x, y0, y1, color, alpha=1.0, width=1.0, dash=None):
+        y0, y1 = max(0, int(round(y0))), min(self.height, int(round(y1)))
+        if y1 <= y0:
+            return
+        pattern = self._dash_pattern(y1 - y0, dash)
+        rgb = np.asarray(to_rgb(color), dtype=np.float32)
+        for column, coverage in self._line_rows(x, width, self.width):
+            region = self.pixels[y0:y1, column]
+            weight = np.float32(coverage * alpha) if pattern is None else pattern * np.float32(coverage * alpha)
+            region += (rgb - region) * weight
+
+    def polyline(self, px, py, color, width=1.5, alpha=1.0, dash=None, clip=None):
+        """
+        Thick polyline through pixel coordinates. Each x-monotonic run is drawn
+        column by column: the curve's vertical extent in every pixel column is
+        padded by the line width and filled as one run of pixels with
+        fractional (anti-aliased) coverage at both ends.
+        """
+        px = np.asarray(px, dtype=np.float64)
+        py = np.asarray(py, dtype=np.float64)
+        finite = np.isfinite(px) & np.isfinite(py)
+        px, py = px[finite], py[finite]
+        if len(px) == 0:
+            return
+        if len(px) == 1:
+            px, py = np.repeat(px, 2), np.repeat(py, 2)
+
+        direction = np.sign(np.diff(px))
+        direction[direction == 0] = 1
+        breaks = np.flatnonzero(direction[1:] != direction[:-1]) + 1
+        start = 0
+        for stop in list(breaks) + [len(px) - 1]:
+            run = slice(start, stop + 1)
+            xs, ys = px[run], py[run]
+            if xs[0] > xs[-1]:
+                xs, ys = xs[::-1], ys[::-1]
+            self._monotonic_run(xs, ys, color, width, alpha, dash, clip)
+            start = stop
+
+    def _monotonic_run(self, xs, ys, color, width, alpha, dash, clip):
+        cx0, cy0, cx1, cy1 = clip if clip is not None else (0, 0, self.width, self.height)
+        half = max(width, 1.0) / 2.0
+
+        c0, c1 = int(math.floor(xs[0])), int(math.floor(xs[-1]))
+        columns = np.arange(c0, c1 + 1)
+        edges = np.clip(np.arange(c0, c1 + 2, dtype=np.float64), xs[0], xs[-1])
+        edge_y = np.interp(edges, xs, ys)
+        lo = np.minimum(edge_y[:-1], edge_y[1:])
+        hi = np.maximum(edge_y[:-1], edge_y[1:])
+        # Vertices (peaks, vertical jumps) inside a column extend its range
+        vertex_columns = np.floor(xs).astype(np.int64) - c0
+        np.minimum.at(lo, vertex_columns, ys)
+        np.maximum.at(hi, vertex_columns, ys)
+
+        # Pad by the line width measured across the curve (capped for near-vertical columns)
+        slope = (edge_y[1:] - edge_y[:-1]) / np.maximum(edges[1:] - edges[:-1], 1e-9)
+        pad = half * np.minimum(np.sqrt(1.0 + slope * slope), 2.0)
+        lo, hi = lo - pad, hi + pad
+        # Widen near-vertical columns sideways by the same half width
+        steep = slope * slope > 3.0
+        base_lo, base_hi = np.where(steep, lo, np.inf), np.where(steep, hi, -np.inf)
+        for shift in range(1, int(half) + 1):
+            np.minimum(lo[:-shift], base_lo[shift:], out=lo[:-shift])
+            np.minimum(lo[shift:], base_lo[:-shift], out=lo[shift:])
+            np.maximum(hi[:-shift], base_hi[shift:], out=hi[:-shift])
+            np.maximum(hi[shift:], base_hi[:-shift], out=hi[shift:])
+
+        keep = (columns >= cx0) & (columns < cx1)
+        if dash is not None:
+            arc = np.cumsum(np.sqrt(1.0 + np.minimum(slope * slope, 1e6)))
+            keep &= (arc % (dash[0] + dash[1])) < dash[0]
+        columns, lo, hi = columns[keep], np.maximum(lo[keep], cy0), np.minimum(hi[keep], cy1)
+
+        first = np.floor(lo).astype(np.int64)
+        counts = np.maximum(np.ceil(hi).astype(np.int64) - first, 0)
+        total = int(counts.sum())
+        if total == 0:
+            return
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        rows = np.repeat(first, counts) + offsets
+        coverage = np.clip(
+            np.minimum(rows + 1, np.repeat(hi, counts)) - np.maximum(rows, np.repeat(lo, counts)), 0.0, 1.0
+        )
+        self.blend_pixels(rows * self.width + np.repeat(columns, counts), coverage, color, alpha)
+
+    def markers(self, px, py, radius, color, alpha=1.0, edgecolor=None, edgewidth=0.0, clip=None):
+        """Filled, anti-aliased circles of `radius` pixels, optionally with an edge ring."""
+        px = np.asarray(px, dtype=np.float64)
+        py = np.asarray(py, dtype=np.float64)
+        finite = np.isfinite(px) & np.isfinite(py)
+        if edgecolor is not None and edgewidth > 0:
+            self._discs(px[finite], py[finite], radius + edgewidth / 2.0, edgecolor, alpha, clip)
+            radius = max(radius - edgewidth / 2.0, 0.5)
+        self._discs(px[finite], py[finite], radius, color, alpha, clip)
+
+    def _discs(self, px, py, radius, color, alpha, clip):
+        if len(px) == 0:
+            return
+        cx0, cy0, cx1, cy1 = clip if clip is not None else (0, 0, self.width, self.height)
+        reach = int(math.ceil(radius + 1))
+        offsets = np.arange(-reach, reach + 1)
+        base_x = np.floor(px).astype(np.int64)
+        base_y = np.floor(py).astype(np.int64)
+        cols = base_x[:, None, None] + offsets[None, None, :]
+        rows = base_y[:, None, None] + offsets[None, :, None]
+        dist = np.hypot(cols + 0.5 - px[:, None, None], rows + 0.5 - py[:, None, None])
+        coverage = np.clip(radius + 0.5 - dist, 0.0, 1.0)
+        inside = (coverage > 0) & (cols >= cx0) & (cols < cx1) & (rows >= cy0) & (rows < cy1)
+        inside &= (cols >= 0) & (rows >= 0)
+        cols, rows = np.broadcast_to(cols, inside.shape)[inside], np.broadcast_to(rows, inside.shape)[inside]
+        self.blend_pixels(rows * self.width + cols, coverage[inside], color, alpha)
+
+
+# ---------------------------------------------------------------------------
+# PlotSpec -> raster
+# ---------------------------------------------------------------------------
+
+def nice_ticks(lo, hi, target=6):
+    """Round tick values (steps of 1, 2, 2.5 or 5 x 10^k) covering [lo, hi]."""
+    span = hi - lo
+    if not np.isfinite(span) or span <= 0:
+        return np.array([lo]), 1.0
+    raw = span / target
+    magnitude = 10.0 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 2.5, 5, 10) if m * magnitude >= raw * 0.999)
+    first = math.ceil(lo / step - 1e-9) * step
+    ticks = np.arange(first, hi + step * 1e-9, step)
+    return ticks, step
+
+
+def tick_label(value, step):
+    decimals = max(0, -int(math.floor(math.log10(step) + 1e-9)))
+    if abs(round(step * 10 ** decimals) - step * 10 ** decimals) > 1e-6:
+        decimals += 1
+    text = f"{value:.{decimals}f}"
+    return "0" if text.lstrip("-").strip("0.") == "" and decimals == 0 else text
+
+
+def _dash(style, width):
+    pattern = LINE_STYLES.get(style)
+    if pattern is None:
+        return None
+    scale = max(width, 1.0) * PX_PER_POINT
+    return (max(1.0, pattern[0] * scale), max(1.0, pattern[1] * scale))
+
+
+# Static layers (background, spans, grid, frame, ticks, labels, title) kept per
+# layout; each is a full image, so only a few are kept
+MAX_STATIC_LAYERS = 4
+
+_STATIC_LAYERS = OrderedDict()
+_STATIC_LAYERS_LOCK = threading.Lock()
+
+
+def _static_layer(spec, xlim, ylim):
+    """
+    (pixels, plot box) of everything in a preview that does not depend on the
+    plotted data: background, shaded spans, grid, frame, ticks, tick labels,
+    axis labels and title. Re-rendering the same node with new values reuses
+    it, so a render only draws the curves, markers and text on top.
+    """
+    key = (spec.size, spec.antialias, spec.facecolor, spec.axes_facecolor, xlim, ylim,
+           spec.title, spec.xlabel, spec.ylabel, spec.title_size, spec.label_size, spec.grid,
+           tuple(tuple(span.values()) for span in spec.spans))
+    with _STATIC_LAYERS_LOCK:
+        layer = _STATIC_LAYERS.get(key)
+        if layer is not None:
+            _STATIC_LAYERS.move_to_end(key)
+            return layer
+
+    width, height = spec.size
+    canvas = RasterCanvas(width, height, None, spec.antialias)
+    (xmin, xmax), (ymin, ymax) = xlim, ylim
+    xticks, xstep = nice_ticks(xmin, xmax)
+    yticks, ystep = nice_ticks(ymin, ymax)
+
+    title_px = _points(spec.title_size)
+    label_px = _points(spec.label_size)
+    tick_px = _points(10)
+    ytick_labels = [tick_label(v, ystep) for v in yticks]
+    ytick_width = max((text_mask(label, tick_px).shape[1] for label in ytick_labels), default=0)
+
+    top = 12 + (text_mask(spec.title, title_px, True).shape[0] + 8 if spec.title else 0)
+    left = 10 + (label_px + 10 if spec.ylabel else 0) + ytick_width + 8
+    bottom = 10 + tick_px + 10 + (label_px + 8 if spec.xlabel else 0)
+    right = 20
+    x0, y0, x1, y1 = left, top, width - right, height - bottom
+
+    sx = (x1 - x0) / (xmax - xmin)
+    sy = (y1 - y0) / (ymax - ymin)
+    to_x = lambda v: x0 + (float(v) - xmin) * sx
+    to_y = lambda v: y1 - (float(v) - ymin) * sy
+
+    # Margins get the figure color; spans are drawn first, over a uniform
+    # background, so they are composited on one row and the plot area is
+    # written once - every pixel is written exactly once here
+    canvas.fill_rect(0, 0, width, y0, spec.facecolor)
+    canvas.fill_rect(0, y1, width, height, spec.facecolor)
+    canvas.fill_rect(0, y0, x0, y1, spec.facecolor)
+    canvas.fill_rect(x1, y0, width, y1, spec.facecolor)
+    row = canvas._color_row(spec.axes_facecolor, x1 - x0)
+    for span in spec.spans:
+        a = max(int(round(to_x(span["x0"]))) - x0, 0)
+        b = min(int(round(to_x(span["x1"]))) - x0, x1 - x0)
+        if b > a:
+            row[a:b] += (np.asarray(to_rgb(span["color"]), dtype=np.float32) - row[a:b]) * np.float32(span["alpha"])
+    canvas.pixels[y0:y1, x0:x1] = row
+
+    if spec.grid:
+        grid_dash = _dash("--", 0.8)
+        for v in xticks:
+            canvas.vline(to_x(v), y0, y1, GRID_COLOR, GRID_ALPHA, 1.0, grid_dash)
+        for v in yticks:
+            canvas.hline(to_y(v), x0, x1, GRID_COLOR, GRID_ALPHA, 1.0, grid_dash)
+
+    # Ticks and labels sit outside the plot box, so nothing drawn later covers them
+    for v in xticks:
+        x = to_x(v)
+        canvas.fill_rect(round(x), y1, round(x) + 1, y1 + 4, "black")
+        canvas.text(x, y1 + 6, tick_label(v, xstep), tick_px, ha="center")
+    for v, label in zip(yticks, ytick_labels):
+        y = to_y(v)
+        canvas.fill_rect(x0 - 4, round(y), x0, round(y) + 1, "black")
+        canvas.text(x0 - 7, y, label, tick_px, ha="right", va="center")
+
+    if spec.title:
+        canvas.text((x0 + x1) / 2, 8, spec.title, title_px, ha="center", bold=True)
+    if spec.xlabel:
+        canvas.text((x0 + x1) / 2, y1 + 10 + tick_px + 6, spec.xlabel, label_px, ha="center", bold=True)
+    if spec.ylabel:
+        canvas.text(8, (y0 + y1) / 2, spec.ylabel, label_px, va="center", bold=True, rotate=True)
+
+    canvas.pixels.flags.writeable = False
+    layer = (canvas.pixels, (x0, y0, x1, y1))
+    with _STATIC_LAYERS_LOCK:
+        _STATIC_LAYERS[key] = layer
+        _STATIC_LAYERS.move_to_end(key)
+        while len(_STATIC_LAYERS) > MAX_STATIC_LAYERS:
+            _STATIC_LAYERS.popitem(last=False)
+    return layer
+
+
+def render_raster(spec):
+    """Draw a PlotSpec into a numpy RGB buffer and return it as an IMAGE tensor."""
+    width, height = spec.size
+    xlim, ylim = spec.data_limits()
+    (xmin, xmax), (ymin, ymax) = xlim, ylim
+    static, clip = _static_layer(spec, xlim, ylim)
+    x0, y0, x1, y1 = clip
+
+    canvas = RasterCanvas(width, height, None, spec.antialias)
+    np.copyto(canvas.pixels, static)
+
+    sx = (x1 - x0) / (xmax - xmin)
+    sy = (y1 - y0) / (ymax - ymin)
+    to_x = lambda v: x0 + (np.asarray(v, dtype=np.float64) - xmin) * sx
+    to_y = lambda v: y1 - (np.asarray(v, dtype=np.float64) - ymin) * sy
+
+    for line in spec.hlines:
+        canvas.hline(float(to_y(line["value"])), x0, x1, line["color"], line["alpha"],
+                     line["width"] * PX_PER_POINT, _dash(line["style"], line["width"]))
+    for line in spec.vlines:
+        canvas.vline(float(to_x(line["value"])), y0, y1, line["color"], line["alpha"],
+                     line["width"] * PX_PER_POINT, _dash(line["style"], line["width"]))
+
+    for line in spec.lines:
+        canvas.polyline(to_x(line["x"]), to_y(line["y"]), line["color"], line["width"] * PX_PER_POINT,
+                        line["alpha"], _dash(line["style"], line["width"]), clip)
+
+    for points in spec.points:
+        # matplotlib marker size is an area in points^2
+        radius = math.sqrt(points["s"]) / 2.0 * PX_PER_POINT
+        canvas.markers(to_x(points["x"]), to_y(points["y"]), radius, points["color"], points["alpha"],
+                       points["edgecolor"], points["edgewidth"] * PX_PER_POINT, clip)
+
+    for note in spec.annotations:
+        mask = text_mask(note["text"], _points(note["size"]))
+        h, w = mask.shape
+        cx = float(to_x(note["x"]))
+        bottom_y = float(to_y(note["y"])) - note["offset"] * PX_PER_POINT
+        pad = 5
+        canvas.fill_rect(cx - w / 2 - pad, bottom_y - h - 2 * pad, cx + w / 2 + pad, bottom_y, note["facecolor"], 0.8)
+        canvas.rect_outline(cx - w / 2 - pad, bottom_y - h - 2 * pad, cx + w / 2 + pad, bottom_y, note["edgecolor"])
+        canvas.text(cx - w / 2, bottom_y - h - pad, note["text"], _points(note["size"]))
+
+    text_boxes = []
+    for item in spec.texts:
+        mask = text_mask(item["text"], _points(item["size"]))
+        h, w = mask.shape
+        tx = x0 + item["x"] * (x1 - x0)
+        ty = y1 - item["y"] * (y1 - y0)
+        tx -= w / 2 if item["ha"] == "center" else w if item["ha"] == "right" else 0
+        ty -= h / 2 if item["va"] == "center" else h if item["va"] == "bottom" else 0
+        if item["box"]:
+            pad = 6
+            canvas.fill_rect(tx - pad, ty - pad, tx + w + pad, ty + h + pad, item["box"], item["box_alpha"])
+            text_boxes.append((tx - pad, ty - pad, tx + w + pad, ty + h + pad))
+        canvas.text(tx, ty, item["text"], _points(item["size"]), item["color"])
+
+    # The frame stays on top of the data, as matplotlib's spines do
+    canvas.rect_outline(x0, y0, x1 + 1, y1 + 1, "black")
+
+    if spec.legend:
+        _draw_legend(canvas, spec, clip, to_x, to_y, text_boxes)
+
+    return canvas.to_tensor()
+
+
+def _draw_legend(canvas, spec, clip, to_x, to_y, avoid):
+    entries = [("line", line) for line in spec.lines if line["label"]]
+    entries += [("points", points) for points in spec.points if points["label"]]
+    if not entries:
+        return
+    size = _points(spec.legend_size)
+    masks = [text_mask(item["label"], size) for _, item in entries]
+    row = max(max(mask.shape[0] for mask in masks), 12) + 4
+    sample = 28
+    box_w = 10 + sample + 8 + max(mask.shape[1] for mask in masks) + 10
+    box_h = 8 + row * len(entries) + 4
+
+    # "best": the corner box covering the fewest data points and text boxes
+    x0, y0, x1, y1 = clip
+    margin = 8
+    corners = [
+        (x1 - margin - box_w, y0 + margin), (x0 + margin, y0 + margin),
+        (x0 + margin, y1 - margin - box_h), (x1 - margin - box_w, y1 - margin - box_h),
+    ]
+    xs = np.concatenate([to_x(s["x"]) for s in spec.lines + spec.points])
+    ys = np.concatenate([to_y(s["y"]) for s in spec.lines + spec.points])
+
+    def cost(corner):
+        bx, by = corner
+        hits = np.count_nonzero((xs >= bx) & (xs <= bx + box_w) & (ys >= by) & (ys <= by + box_h))
+        for ax0, ay0, ax1, ay1 in avoid:
+            if ax0 < bx + box_w and bx < ax1 and ay0 < by + box_h and by < ay1:
+                hits += len(xs) + 1
+        return hits
+
+    bx, by = min(corners, key=cost)
+    canvas.fill_rect(bx, by, bx + box_w, by + box_h, "white", 0.8)
+    canvas.rect_outline(bx, by, bx + box_w, by + box_h, "#cccccc")
+    for i, ((kind, item), mask) in enumerate(zip(entries, masks)):
+        cy = by + 6 + i * row + row / 2
+        if kind == "line":
+            canvas.hline(cy, bx + 10, bx + 10 + sample, item["color"], item["alpha"],
+                         item["width"] * PX_PER_POINT, _dash(item["style"], item["width"]))
+        else:
+            radius = min(math.sqrt(item["s"]) / 2.0 * PX_PER_POINT, row / 2 - 1)
+            canvas.markers([bx + 10 + sample / 2], [cy], radius, item["color"], item["alpha"],
+                           item["edgecolor"], item["edgewidth"] * PX_PER_POINT)
+        canvas.text(bx + 10 + sample + 8, cy, item["label"], size, va="center")
+
+
+def render_message(message, size=(800, 400), color="red", box="wheat"):
+    """A plain image with a boxed, centered message (used for errors)."""
+    canvas = RasterCanvas(size[0], size[1])
+    mask = text_mask(message, _points(14))
+    h, w = mask.shape
+    x, y = (size[0] - w) / 2, (size[1] - h) / 2
+    canvas.fill_rect(x - 14, y - 14, x + w + 14, y + h + 14, box, 0.8)
+    canvas.text(x, y, message, _points(14), color)
+    return canvas.to_tensor()
+
+
+# ---------------------------------------------------------------------------
+# PlotSpec -> matplotlib
+# ---------------------------------------------------------------------------
+
+class PreviewWorkerPool:
+    """
+    Persistent worker processes running preview_worker.py. Each worker renders
+    one plot state at a time with its own matplotlib, so renders from several
+    threads run in parallel on other cores, and the calling thread waits on a
+    pipe without holding the GIL. Workers start on first use. A worker that
+    dies, or does not answer within `timeout` seconds, is killed and its slot
+    is freed for a new worker; the render it was given falls back to the
+    calling thread, as does a render that waits `timeout` seconds for a free
+    worker.
+    """
+
+    WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preview_worker.py")
+
+    def __init__(self, size, timeout=PREVIEW_WORKER_TIMEOUT):
+        self.size = max(1, int(size))
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.restarts = 0
+        self.fallbacks = 0
+
+    def _start_worker(self):
+        env = dict(os.environ, MPLBACKEND="Agg")
+        return subprocess.Popen(
+            [sys.executable, self.WORKER_SCRIPT],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+            cwd=os.path.dirname(self.WORKER_SCRIPT),
+            creationflags=getattr(subprocess, "CREATE_NO_WINDOW", 0),
+        )
+
+    def _acquire(self):
+        """An idle or newly started worker, or None if none is free within `timeout`."""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if len(self._workers) < self.size:
+                        worker = self._start_worker()
+                        self._workers.append(worker)
+                        return worker
+                try:
+                    worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    return None
+            # None is put by _discard: a slot is free, so loop round and start a worker
+            if worker is not None:
+                return worker
+
+    def _discard(self, worker):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self.restarts += 1
+        worker.kill()
+        # Wake one waiting render so it starts a replacement in the freed slot
+        self._idle.put(None)
+
+    def _fallback(self, state, reason):
+        with self._lock:
+            self.fallbacks += 1
+        print(f"[Warning] Preview worker {reason}, rendering in-process")
+        return draw_matplotlib(state)
+
+    def render(self, state):
+        """(H, W, 3) uint8 RGB for a PlotSpec state."""
+        try:
+            worker = self._acquire()
+        except OSError as e:
+            return self._fallback(state, f"could not start ({e})")
+        if worker is None:
+            return self._fallback(state, f"not free after {self.timeout:g}s")
+
+        # A worker that misses the deadline is killed, which ends the read below with EOFError
+        watchdog = threading.Timer(self.timeout, worker.kill)
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            send_frame(worker.stdin, state)
+            reply = receive_frame(worker.stdout)
+        except (OSError, EOFError, ValueError) as e:
+            self._discard(worker)
+            return self._fallback(state, f"failed ({e})")
+        finally:
+            watchdog.cancel()
+        self._idle.put(worker)
+
+        if reply[0] != "ok":
+            raise RuntimeError(f"Preview worker: {reply[1]}")
+        _, height, width, data = reply
+        with self._lock:
+            self.rendered += 1
+        return np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3)
+
+    def shutdown(self, timeout=5.0):
+        """Close every worker's stdin (ending its loop) and wait for it to exit."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            try:
+                worker.stdin.close()
+                worker.wait(timeout)
+            except Exception:
+                worker.kill()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "max_workers": self.size,
+                "rendered": self.rendered,
+                "restarts": self.restarts,
+                "fallbacks": self.fallbacks,
+            }
+
+
+PREVIEW_POOL = PreviewWorkerPool(PREVIEW_WORKERS) if PREVIEW_WORKERS > 0 else None
+if PREVIEW_POOL is not None:
+    atexit.register(PREVIEW_POOL.shutdown)
+
+
+def render_matplotlib(spec):
+    """Render a PlotSpec with matplotlib, in PREVIEW_POOL when it is enabled."""
+    state = spec.state()
+    if PREVIEW_POOL is not None:
+        return _rgb_to_tensor(PREVIEW_POOL.render(state))
+    # Scaled straight from the figure's Agg buffer into the tensor's storage
+    return draw_matplotlib(state, _rgb_to_tensor)
+
+
+def _rgb_to_tensor(rgb):
+    return torch.from_numpy(np.divide(rgb, np.float32(255.0), dtype=np.float32))[None,]
@@ -0,0 +1,187 @@
+# preview_worker.py
+# matplotlib side of the preview renderer. draw_matplotlib() turns a plot
+# state (PlotSpec.state(): plain values and float64 arrays) into RGB pixels;
+# it runs in-process, or in worker processes started by
+# preview_render.PreviewWorkerPool, which run this file as a script:
+#
+#   python preview_worker.py
+#
+# A worker reads length-prefixed pickled states from stdin and answers each
+# with ("ok", height, width, rgb_bytes) or ("error", message) on stdout. It
+# only needs numpy and matplotlib - torch is never imported.
+#
+# Figures are built with matplotlib's object-oriented API (no pyplot) and
+# kept per layout: the next render with the same size and series counts
+# updates the existing artists with set_data() and reads the Agg buffer
+# directly, so there is no figure construction and no PNG encode/decode.
+
+import pickle
+import struct
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+_FRAME_HEADER = struct.Struct("<Q")
+
+
+def send_frame(stream, obj):
+    data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_FRAME_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def receive_frame(stream):
+    """The next pickled object on `stream`; raises EOFError when the other side is gone."""
+    header = stream.read(_FRAME_HEADER.size)
+    if len(header) < _FRAME_HEADER.size:
+        raise EOFError("Preview worker pipe closed")
+    (length,) = _FRAME_HEADER.unpack(header)
+    data = stream.read(length)
+    if len(data) < length:
+        raise EOFError("Preview worker pipe closed mid-frame")
+    return pickle.loads(data)
+
+
+# Reusable figures kept (one per layout, most recently used last)
+MAX_FIGURES = 8
+
+_FIGURES = OrderedDict()
+_FIGURES_LOCK = threading.Lock()
+
+
+def _layout_key(state):
+    """Figures are reusable between states with the same size and the same series counts."""
+    return (tuple(state["size"]), state["dpi"], len(state["lines"]), len(state["points"]))
+
+
+class ReusableFigure:
+    """
+    An Agg Figure/Axes pair with one persistent artist per line and scatter
+    series. render() restyles those artists and swaps in new data; spans,
+    reference lines, annotations, text and the legend are cheap and are
+    rebuilt each time. Not thread-safe on its own - hold `lock` around
+    render() and while reading the returned pixels.
+    """
+
+    def __init__(self, state):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        width, height = state["size"]
+        self.figure = Figure(figsize=(width / state["dpi"], height / state["dpi"]), dpi=state["dpi"])
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.lines = [self.ax.plot([], [])[0] for _ in state["lines"]]
+        self.points = [self.ax.scatter([], [], zorder=5) for _ in state["points"]]
+        self.transient = []
+        self.lock = threading.Lock()
+
+    def render(self, state):
+        """Draw `state`; returns a (H, W, 3) uint8 view of the Agg buffer (valid until the next render)."""
+        import matplotlib
+
+        ax = self.ax
+        for artist in self.transient:
+            artist.remove()
+        self.transient = []
+
+        self.figure.patch.set_facecolor(state["facecolor"])
+        ax.set_facecolor(state["axes_facecolor"])
+        for line, spec in zip(self.lines, state["lines"]):
+            line.set_data(spec["x"], spec["y"])
+            line.set(color=spec["color"], linestyle=spec["style"], linewidth=spec["width"],
+                     alpha=spec["alpha"], label=spec["label"])
+        for points, spec in zip(self.points, state["points"]):
+            points.set_offsets(np.column_stack((spec["x"], spec["y"])))
+            points.set_sizes([spec["s"]])
+            points.set_facecolor(spec["color"])
+            points.set_edgecolor(spec["edgecolor"] or "face")
+            points.set_linewidth(spec["edgewidth"] or matplotlib.rcParams["lines.linewidth"])
+            points.set_alpha(spec["alpha"])
+            points.set_label(spec["label"])
+
+        for span in state["spans"]:
+            self.transient.append(ax.axvspan(span["x0"], span["x1"], alpha=span["alpha"], color=span["color"], zorder=0))
+        for line in state["hlines"]:
+            self.transient.append(ax.axhline(y=line["value"], color=line["color"], linestyle=line["style"],
+                                             alpha=line["alpha"], linewidth=line["width"]))
+        for line in state["vlines"]:
+            self.transient.append(ax.axvline(x=line["value"], color=line["color"], linestyle=line["style"],
+                                             alpha=line["alpha"], linewidth=line["width"]))
+        for note in state["annotations"]:
+            self.transient.append(ax.annotate(
+                note["text"], (note["x"], note["y"]), xytext=(0, note["offset"]), textcoords='offset points',
+                ha='center', fontsize=note["size"],
+                bbox=dict(boxstyle='round,pad=0.5', facecolor=note["facecolor"], alpha=0.8, edgecolor=note["edgecolor"])))
+        for item in state["texts"]:
+            self.transient.append(ax.text(
+                item["x"], item["y"], item["text"], transform=ax.transAxes, ha=item["ha"], va=item["va"],
+                fontsize=item["size"], color=item["color"],
+                bbox=dict(boxstyle='round', facecolor=item["box"], alpha=item["box_alpha"]) if item["box"] else None))
+
+        ax.set_xlabel(state["xlabel"], fontsize=state["label_size"], fontweight='bold')
+        ax.set_ylabel(state["ylabel"], fontsize=state["label_size"], fontweight='bold')
+        ax.set_title(state["title"], fontsize=state["title_size"], fontweight='bold')
+        if state["grid"]:
+            ax.grid(True, alpha=0.3, linestyle='--')
+        else:
+            ax.grid(False)
+        if state["legend"] and any(s["label"] for s in state["lines"] + state["points"]):
+            ax.legend(loc='best', fontsize=state["legend_size"], framealpha=0.9)
+        elif ax.get_legend() is not None:
+            ax.get_legend().remove()
+        ax.set_xlim(*state["xlim"])
+        ax.set_ylim(*state["ylim"])
+
+        self.figure.tight_layout()
+        self.canvas.draw()
+        width, height = self.canvas.get_width_height()
+        rgba = np.frombuffer(self.canvas.buffer_rgba(), dtype=np.uint8).reshape(height, width, 4)
+        return rgba[:, :, :3]
+
+
+def draw_matplotlib(state, finish=np.array):
+    """
+    Render a plot state with matplotlib (imported on first use). `finish` gets
+    the (H, W, 3) uint8 view of the shared figure's pixel buffer while the
+    figure is still locked and must copy what it needs; the default returns a
+    plain array.
+    """
+    key = _layout_key(state)
+    with _FIGURES_LOCK:
+        figure = _FIGURES.get(key)
+        if figure is None:
+            figure = _FIGURES[key] = ReusableFigure(state)
+            while len(_FIGURES) > MAX_FIGURES:
+                _FIGURES.popitem(last=False)
+        else:
+            _FIGURES.move_to_end(key)
+
+    with figure.lock:
+        return finish(figure.render(state))
+
+
+def serve(stdin=None, stdout=None):
+    """Worker loop: render states from stdin until it is closed."""
+    stdin = stdin or sys.stdin.buffer
+    stdout = stdout or sys.stdout.buffer
+    # Anything printed while rendering must not end up in the reply stream
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            state = receive_frame(stdin)
+        except EOFError:
+            return
+        try:
+            reply = draw_matplotlib(state, lambda rgb: ("ok", rgb.shape[0], rgb.shape[1], rgb.tobytes()))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        send_frame(stdout, reply)
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,349 @@
+# schedule_io.py
+# Binary keyframe schedule files and the node that loads them.
+#
+# Raw format (.sched), little-endian, memory-mappable:
+#   32-byte header: magic b"CWSCHED\0", uint32 version, uint32 count,
+#                   uint32 flags, 12 reserved bytes
+#   float32 percents[count], float32 strengths[count], int32 guarantee_steps[count]
+#   int32 image_indices[count] (only with FLAG_IMAGE_INDICES; -1 = no image)
+# The same arrays can also be written as an uncompressed .npz, which is
+# portable but is read into memory rather than mapped.
+#
+# Files are replaced atomically. A raw file that is still memory-mapped can't
+# be replaced on Windows; the export is then kept under a numbered name.
+#
+# Exports are written by a background ExportQueue so nodes return without
+# waiting on disk (or network-mounted) I/O.
+
+import atexit
+import csv
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    from .keyframe_group import ArrayKeyframeGroup, read_image_indices
+except Exception:
+    from keyframe_group import ArrayKeyframeGroup, read_image_indices
+
+
+SCHEDULE_MAGIC = b"CWSCHED\0"
+SCHEDULE_VERSION = 1
+FLAG_IMAGE_INDICES = 1
+SCHEDULE_FORMATS = ("raw", "npz")
+SCHEDULE_EXTENSIONS = {"raw": ".sched", "npz": ".npz"}
+
+_HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("version", "<u4"), ("count", "<u4"), ("flags", "<u4"), ("reserved", "V12"),
+])
+
+
+def curve_output_dir():
+    """ComfyUI's output/curves directory, where curve exports are written and loaded from."""
+    return os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        "output", "curves"
+    )
+
+
+def schedule_path(filename, fmt="raw"):
+    """Resolve an export name (extension optional, relative to curve_output_dir) to a file path."""
+    if not os.path.splitext(filename)[1]:
+        filename += SCHEDULE_EXTENSIONS[fmt]
+    return filename if os.path.isabs(filename) else os.path.join(curve_output_dir(), filename)
+
+
+def _free_path(path):
+    """`path` with the first unused -1, -2, ... suffix before the extension."""
+    root, ext = os.path.splitext(path)
+    number = 1
+    while os.path.exists(f"{root}-{number}{ext}"):
+        number += 1
+    return f"{root}-{number}{ext}"
+
+
+@contextmanager
+def _replace_atomically(path):
+    """
+    Yield a binary file in the target's directory that replaces `path` once
+    the block completes, and a one-item list holding the path actually written.
+    The old file is never truncated in place, so a LoadCurveSchedule that still
+    has it memory-mapped keeps reading the old (intact) contents instead of
+    hitting SIGBUS. Where the mapped file can't be replaced (Windows), the new
+    file is kept next to it under a numbered name and a warning is printed.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(path)[1],
+                                    dir=os.path.dirname(path) or ".")
+    written = [path]
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f, written
+        try:
+            os.replace(tmp_path, path)
+        except PermissionError as e:
+            written[0] = _free_path(path)
+            os.replace(tmp_path, written[0])
+            print(f"[Warning] Could not replace {path} ({e}); it may still be loaded. Saved to {written[0]} instead")
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def save_schedule(path, percents, strengths, guarantee_steps=None, fmt="raw", image_indices=None):
+    """
+    Write a schedule as raw (memory-mappable) or npz; returns the path written.
+    `image_indices` optionally stores each keyframe's batch image index (-1 = none).
+    """
+    percents = np.ascontiguousarray(percents, dtype="<f4")
+    strengths = np.ascontiguousarray(strengths, dtype="<f4")
+    if guarantee_steps is None:
+        guarantee_steps = np.ones(len(percents), dtype="<i4")
+    guarantee_steps = np.ascontiguousarray(guarantee_steps, dtype="<i4")
+    arrays = {"percents": percents, "strengths": strengths, "guarantee_steps": guarantee_steps}
+    if image_indices is not None:
+        arrays["image_indices"] = np.ascontiguousarray(image_indices, dtype="<i4")
+    if len({len(array) for array in arrays.values()}) > 1:
+        raise ValueError("Schedule arrays must all have the same length")
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if fmt == "npz":
+        with _replace_atomically(path) as (f, written):
+            np.savez(f, **arrays)
+        return written[0]
+    if fmt != "raw":
+        raise ValueError(f"Unknown schedule format '{fmt}' (expected one of {SCHEDULE_FORMATS})")
+
+    header = np.zeros((), dtype=_HEADER_DTYPE)
+    header["magic"] = SCHEDULE_MAGIC
+    header["version"] = SCHEDULE_VERSION
+    header["count"] = len(percents)
+    header["flags"] = FLAG_IMAGE_INDICES if image_indices is not None else 0
+    with _replace_atomically(path) as (f, written):
+        f.write(header.tobytes())
+        for array in arrays.values():
+            f.write(array.tobytes())
+    return written[0]
+
+
+def load_schedule(path, mmap=False):
+    """
+    Read (percents, strengths, guarantee_steps, image_indices) from a schedule
+    file; image_indices is None when the file has none. Raw files are
+    memory-mapped read-only with mmap=True (a mapped file can't be replaced by
+    a re-export on Windows until it is released); npz files are read in full.
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            image_indices = data["image_indices"] if "image_indices" in data.files else None
+            return data["percents"], data["strengths"], data["guarantee_steps"], image_indices
+
+    with open(path, "rb") as f:
+        raw_header = f.read(_HEADER_DTYPE.itemsize)
+    if len(raw_header) < _HEADER_DTYPE.itemsize or raw_header[:len(SCHEDULE_MAGIC)] != SCHEDULE_MAGIC:
+        raise ValueError(f"{path} is not a curve schedule file")
+    header = np.frombuffer(raw_header, dtype=_HEADER_DTYPE)[0]
+    if header["version"] != SCHEDULE_VERSION:
+        raise ValueError(f"{path} has unsupported schedule version {header['version']}")
+    count = int(header["count"])
+    columns = (("<f4", "<f4", "<i4", "<i4") if header["flags"] & FLAG_IMAGE_INDICES
+               else ("<f4", "<f4", "<i4"))
+    expected = _HEADER_DTYPE.itemsize + 4 * len(columns) * count
+    if os.path.getsize(path) < expected:
+        raise ValueError(f"{path} is truncated ({os.path.getsize(path)} of {expected} bytes)")
+
+    offset = _HEADER_DTYPE.itemsize
+    if mmap and count:
+        arrays = [
+            np.memmap(path, dtype=dtype, mode="r", offset=offset + 4 * i * count, shape=(count,))
+            for i, dtype in enumerate(columns)
+        ]
+    else:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            arrays = [np.fromfile(f, dtype=dtype, count=count) for dtype in columns]
+    return tuple(arrays) + (None,) * (4 - len(arrays))
+
+
+def save_keyframe_group(path, keyframe_group, fmt="raw"):
+    """
+    Write an ArrayKeyframeGroup (including any upstream / default keyframes) to
+    a schedule file, with the keyframes' batch image indices if they have any.
+    """
+    if type(keyframe_group) is ArrayKeyframeGroup and not keyframe_group.is_materialized:
+        image_indices = keyframe_group.image_indices
+    else:
+        # Chained / merged groups and edited keyframes carry their indices on the objects
+        image_indices = read_image_indices(keyframe_group.keyframes)
+    return save_schedule(path, keyframe_group.percents, keyframe_group.strengths,
+                         keyframe_group.guarantee_steps, fmt, image_indices)
+
+
+def load_keyframe_group(path, mmap=False):
+    """An ArrayKeyframeGroup that wraps the (optionally mapped) schedule arrays without copying them."""
+    return ArrayKeyframeGroup.from_arrays(*load_schedule(path, mmap=mmap))
+
+
+def save_curve_csv(path, percents, strengths):
+    """Write percent/strength rows as CSV; returns the path written."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["percent", "strength", "step"])
+        writer.writerows(
+            (f"{p:.6f}", f"{s:.6f}", i) for i, (p, s) in enumerate(zip(percents, strengths))
+        )
+    return path
+
+
+# ---------------------------------------------------------------------------
+# Background export queue
+# ---------------------------------------------------------------------------
+
+# Set CURVED_SCHEDULE_ASYNC_EXPORT=0 to write exports on the calling thread.
+ASYNC_EXPORT = os.environ.get("CURVED_SCHEDULE_ASYNC_EXPORT", "1") != "0"
+
+
+class ExportQueue:
+    """
+    Single background writer for curve exports. Jobs are keyed by output path:
+    submitting a path that is still pending replaces the older job, so rapid
+    re-runs of a node write the file once. Pending jobs are flushed at exit.
+    """
+
+    def __init__(self):
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        self._busy = False
+        self._thread = None
+        self.written = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def submit(self, path, write, label="Export"):
+        """Queue write() for `path`; returns immediately."""
+        with self._condition:
+            if path in self._pending:
+                self.coalesced += 1
+            self._pending[path] = (write, label)
+            self._pending.move_to_end(path)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="curve-export", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                path, (write, label) = self._pending.popitem(last=False)
+                self._busy = True
+            try:
+                written = write() or path
+                self.written += 1
+                print(f"[Curve Export] {label} saved to: {written}")
+            except Exception as e:
+                self.failed += 1
+                print(f"[Error] {label} to {path} failed: {e}")
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every queued export is written; returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "written": self.written,
+                "coalesced": self.coalesced,
+                "failed": self.failed,
+            }
+
+
+EXPORT_QUEUE = ExportQueue()
+atexit.register(EXPORT_QUEUE.flush, 30.0)
+
+
+def submit_export(path, write, label="Export"):
+    """Run write() on the export thread (or inline when async export is disabled)."""
+    if ASYNC_EXPORT:
+        EXPORT_QUEUE.submit(path, write, label)
+    else:
+        path = write() or path
+        print(f"[Curve Export] {label} saved to: {path}")
+    return path
+
+
+class LoadCurveSchedule:
+    """
+    Load a schedule exported by the Advanced Curved ControlNet Scheduler
+    (raw .sched or .npz) straight into a keyframe group.
+    """
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "filename": ("STRING", {
+                    "default": "curve_export",
+                    "tooltip": "Schedule file in output/curves (or an absolute path); .sched is assumed if no extension is given"
+                }),
+            },
+            "optional": {
+                "memory_map": ("BOOLEAN", {
+                    "default": False,
+                    "tooltip": "Memory-map raw .sched files instead of reading them into memory. While the mapped schedule is cached, re-exporting to the same file on Windows saves under a numbered name instead"
+                }),
+            }
+        }
+
+    RETURN_TYPES = ("TIMESTEP_KEYFRAME", "STRING",)
+    RETURN_NAMES = ("TIMESTEP_KF", "info",)
+    FUNCTION = "load_schedule"
+    CATEGORY = "conditioning/controlnet"
+
+    @classmethod
+    def IS_CHANGED(cls, filename, memory_map=False):
+        # Reload when the file is rewritten
+        try:
+            return os.path.getmtime(schedule_path(filename))
+        except OSError:
+            return float("nan")
+
+    def load_schedule(self, filename, memory_map=False):
+        path = schedule_path(filename)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Schedule file not found: {path}")
+
+        keyframe_group = load_keyframe_group(path, mmap=memory_map)
+        info = f"Loaded {len(keyframe_group)} keyframes from {os.path.basename(path)}"
+        if len(keyframe_group):
+            info += (f"\nRange: {float(keyframe_group.percents[0]):.3f}-{float(keyframe_group.percents[-1]):.3f}"
+                     f" | Strength: {float(np.min(keyframe_group.strengths)):.3f}-{float(np.max(keyframe_group.strengths)):.3f}")
+        return (keyframe_group, info)
+
+
+NODE_CLASS_MAPPINGS = {
+    "LoadCurveSchedule": LoadCurveSchedule
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "LoadCurveSchedule": "Load Curve Schedule"
+}
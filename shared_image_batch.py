@@ -0,0 +1,139 @@
+# shared_image_batch.py
+# One IMAGE batch shared by every keyframe that maps into it. The batch is
+# moved to the hint device in one transfer and resized once per size; each
+# keyframe then gets a view into that single moved/resized batch instead of
+# its own tensor.
+
+import threading
+from collections import OrderedDict
+
+import torch
+import torch.nn.functional as F
+
+
+# Resized copies kept per batch (each is a full batch at that size)
+MAX_RESIZED_COPIES = 4
+
+# Shared batches kept between runs (each holds its source tensor and copies)
+MAX_SHARED_BATCHES = 2
+
+HINT_DEVICES = ("keep", "cpu", "gpu")
+
+
+class SharedImageBatch:
+    """
+    A (K,H,W,C) image batch addressed by index.
+
+    `to(device, dtype)` moves the whole batch in one transfer and caches the
+    result per (device, dtype); `pin()` pins the host copy so those transfers
+    can run non-blocking; `resized(h, w, ...)` interpolates the whole batch
+    once and keeps the last few sizes. Thread-safe.
+    """
+
+    def __init__(self, images):
+        self.source = images
+        if images.dim() == 3:
+            images = images.unsqueeze(0)
+        self.images = images
+        self._device_copies = {}
+        self._resized = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.images.shape[0]
+
+    @staticmethod
+    def _key(device, dtype):
+        return (str(torch.device(device)) if device is not None else None, dtype)
+
+    def pin(self):
+        """Pin the host batch in page-locked memory (no-op off CPU or without CUDA)."""
+        with self._lock:
+            if self.images.device.type == "cpu" and torch.cuda.is_available() and not self.images.is_pinned():
+                self.images = self.images.pin_memory()
+                self._device_copies.clear()
+                self._resized.clear()
+        return self
+
+    def to(self, device=None, dtype=None):
+        """The whole batch on `device` / as `dtype`, transferred once and cached."""
+        if device is None and dtype is None:
+            return self.images
+        key = self._key(device, dtype)
+        with self._lock:
+            moved = self._device_copies.get(key)
+            if moved is None:
+                non_blocking = self.images.device.type == "cpu" and self.images.is_pinned()
+                moved = self.images.to(device=device, dtype=dtype, non_blocking=non_blocking)
+                self._device_copies[key] = moved
+            return moved
+
+    def resized(self, height, width, device=None, dtype=None, mode="bilinear"):
+        """The whole batch resized to (height, width), computed once per size/device/mode."""
+        key = (int(height), int(width), mode) + self._key(device, dtype)
+        with self._lock:
+            cached = self._resized.get(key)
+            if cached is not None:
+                self._resized.move_to_end(key)
+                return cached
+
+        source = self.to(device, dtype)
+        if tuple(source.shape[1:3]) == (int(height), int(width)):
+            result = source
+        else:
+            align = False if mode in ("bilinear", "bicubic") else None
+            result = F.interpolate(
+                source.movedim(-1, 1), size=(int(height), int(width)), mode=mode, align_corners=align
+            ).movedim(1, -1)
+
+        with self._lock:
+            self._resized[key] = result
+            self._resized.move_to_end(key)
+            while len(self._resized) > MAX_RESIZED_COPIES:
+                self._resized.popitem(last=False)
+        return result
+
+    def clear_cache(self):
+        """Drop every device and resized copy (the source batch is kept)."""
+        with self._lock:
+            self._device_copies.clear()
+            self._resized.clear()
+
+    def __repr__(self):
+        return f"SharedImageBatch({tuple(self.images.shape)}, cached={len(self._device_copies) + len(self._resized)})"
+
+
+_SHARED_BATCHES = OrderedDict()
+_SHARED_BATCHES_LOCK = threading.Lock()
+
+
+def shared_image_batch(images):
+    """
+    The SharedImageBatch wrapping `images`. ComfyUI hands a cached node output
+    back as the same tensor, so a rerun reuses the batch's moved and resized
+    copies instead of transferring again.
+    """
+    key = id(images)
+    with _SHARED_BATCHES_LOCK:
+        batch = _SHARED_BATCHES.get(key)
+        if batch is not None and batch.source is images:
+            _SHARED_BATCHES.move_to_end(key)
+            return batch
+        batch = _SHARED_BATCHES[key] = SharedImageBatch(images)
+        _SHARED_BATCHES.move_to_end(key)
+        while len(_SHARED_BATCHES) > MAX_SHARED_BATCHES:
+            _SHARED_BATCHES.popitem(last=False)
+        return batch
+
+
+def resolve_hint_device(name):
+    """torch device for a HINT_DEVICES choice; None keeps the batch where it is."""
+    if name == "cpu":
+        return torch.device("cpu")
+    if name == "gpu":
+        try:
+            import comfy.model_management
+            return comfy.model_management.get_torch_device()
+        except Exception:
+            return torch.device("cuda") if torch.cuda.is_available() else None
+    return None